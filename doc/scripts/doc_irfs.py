@@ -40,12 +40,12 @@ aeff.vignetting.plot(show=False)
 save_current_figure('aeff_vignetting.png', OUTPUT_FOLDER, clear=False)
 
 plt.figure('Edisp matrix')
-edisp.matrix.plot(show=False)
+edisp.matrix.generator.plot(show=False)
 save_current_figure('edisp_matrix.png', OUTPUT_FOLDER, clear=False)
 
 plt.figure('Edisp slice')
 _e = 6.
-edisp.matrix.vslice(_e).plot(show=False, label='E = %.2f keV' % _e)
+edisp.matrix.generator.vslice(_e).plot(show=False, label='E = %.2f keV' % _e)
 plt.axis([0, 256, None, None])
 plt.legend(bbox_to_anchor=(0.45, 0.75))
 save_current_figure('edisp_slice.png', OUTPUT_FOLDER, clear=False)
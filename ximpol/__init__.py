@@ -47,6 +47,15 @@ XIMPOL_TOOLS = os.path.join(XIMPOL_BASE, 'tools')
 XIMPOL_UTILS = os.path.join(XIMPOL_ROOT, 'utils')
 
 
+"""Folder for the persistent cache of the tables derived from the IRFs (this
+can be overridden through the XIMPOL_CACHE environment variable, and setting
+the variable to an empty string disables the cache altogether).
+"""
+XIMPOL_CACHE = os.environ.get('XIMPOL_CACHE',
+                              os.path.join(os.path.expanduser('~'), '.ximpol',
+                                           'cache'))
+
+
 """Version information.
 """
 XIMPOL_VERSION_FILE_PATH = os.path.join(XIMPOL_ROOT, '__version__.py')
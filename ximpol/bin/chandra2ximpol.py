@@ -103,7 +103,7 @@ def load_chandra_arf(arf_file):
     _x = 0.5*(tbdata.field('ENERG_LO') + tbdata.field('ENERG_HI'))
     _y = tbdata.field('SPECRESP')
     fmt = dict(xname='Energy', xunits='keV', yname='Effective area',
-               yunits='cm$^2$')
+               yunits='cm$^2$', optimize=True)
     return xInterpolatedUnivariateSplineLinear(_x, _y, **fmt)
 
 def time_scaling(scale, col_mc_energy, col_time, col_mc_ra, col_mc_dec):
@@ -215,7 +215,7 @@ def chandra2ximpol(file_path, **kwargs):
     event_list.set_column('MC_ENERGY', col_mc_energy)
     col_pha = edisp.matrix.rvs(col_mc_energy)
     event_list.set_column('PHA', col_pha)
-    col_energy = edisp.ebounds(col_pha)
+    col_energy = edisp.ebounds.energy(col_pha)
     event_list.set_column('ENERGY',col_energy)
     event_list.set_column('MC_RA', col_mc_ra)
     event_list.set_column('MC_DEC', col_mc_dec)
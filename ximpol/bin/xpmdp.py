@@ -24,12 +24,10 @@ import os
 import numpy
 import imp
 
-from ximpol.irf import load_arf, load_mrf
-from ximpol.srcmodel.spectrum import xCountSpectrum
+from ximpol.irf import xIrfSet
+from ximpol.irf.fold import xForwardFolder
 from ximpol.srcmodel.roi import xPeriodicPointSource
 from ximpol.utils.logging_ import logger, startmsg, abort
-from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
-from ximpol.core.spline import xInterpolatedBivariateSplineLinear
 
 
 EBIN_ALGS = ['FILE', 'LIN', 'LOG', 'LIST']
@@ -102,8 +100,8 @@ def xpmdp(**kwargs):
     """Calculate the MDP.
     """
     logger.info('Loading the instrument response functions...')
-    aeff = load_arf(kwargs['irfname'])
-    modf = load_mrf(kwargs['irfname'])
+    irfs = xIrfSet(kwargs['irfname'])
+    folder = xForwardFolder(irfs.aeff, irfs.edisp, irfs.modf)
     module_name = os.path.basename(kwargs['configfile']).replace('.py', '')
     ROI_MODEL = imp.load_source(module_name, kwargs['configfile']).ROI_MODEL
     logger.info(ROI_MODEL)
@@ -123,41 +121,38 @@ def xpmdp(**kwargs):
     # This is copied from roi.py and should probably be factored out.
     # Again, the ROI class should be able to sum the count spectra of all the
     # component and expose the result.
-    sources = ROI_MODEL.values()
+    sources = list(ROI_MODEL.values())
     if len(sources) > 1:
         abort('Multiple sources not implemented, yet.')
     source = sources[0]
     if isinstance(source, xPeriodicPointSource):
-        psamples = numpy.linspace(kwargs['phasemin'], kwargs['phasemax'], 100)
-        logger.info('Sampling phases: %s' % psamples)
-        count_spectrum = xCountSpectrum(source.energy_spectrum, aeff, psamples,
-                                        scale=observation_time)
-        time_integrated_spectrum = count_spectrum.build_time_integral()
+        samples = source.sampling_phase(irfs.aeff, kwargs['phasemin'],
+                                        kwargs['phasemax'])
+        logger.info('Sampling phases: %d points in [%s, %s]' %\
+                    (len(samples), samples[0], samples[-1]))
+        scale = observation_time
     else:
-        tsamples = source.sampling_time(kwargs['tstart'], kwargs['tstop'])
-        logger.info('Sampling times: %s' % tsamples)
-        count_spectrum = xCountSpectrum(source.energy_spectrum, aeff, tsamples)
-        time_integrated_spectrum = count_spectrum.build_time_integral()
+        samples = source.sampling_time(kwargs['tstart'], kwargs['tstop'],
+                                       irfs.aeff)
+        logger.info('Sampling times: %d points in [%s, %s]' %\
+                    (len(samples), samples[0], samples[-1]))
+        scale = 1.
 
     # Thuis should be a callable method in the binning module.
     ebinning =_make_binning(kwargs['ebinalg'], kwargs['emin'], kwargs['emax'],
                             kwargs['ebins'], kwargs['ebinning'])
 
-    # And this might be implemented in the irf.mrf module.
-    _x = time_integrated_spectrum.x
-    _y = time_integrated_spectrum.y*modf(_x)
-    mu_spectrum = xInterpolatedUnivariateSplineLinear(_x, _y)
-
-    for _emin, _emax in zip(ebinning[:-1], ebinning[1:]) +\
-        [(ebinning[0], ebinning[-1])]:
-        num_counts = count_spectrum.num_expected_counts(emin=_emin, emax=_emax)
-        mu_average = mu_spectrum.integral(_emin, _emax)/num_counts
-        mdp = 4.29/mu_average/numpy.sqrt(num_counts)
-        logger.info('%.2f--%.2f keV: %d counts in %d s, mu %.3f, MDP %.2f%%' %\
-                    (_emin, _emax, num_counts, observation_time, mu_average,
-                     100*mdp))
-
-
+    # Fold the source spectrum through the instrument response, for all the
+    # energy bins and for the whole energy range.
+    for _ebinning in [ebinning, [ebinning[0], ebinning[-1]]]:
+        _counts, _mu, _mdp = folder.mdp99(source.energy_spectrum, samples,
+                                          _ebinning, scale=scale)
+        for _emin, _emax, num_counts, mu_average, mdp in\
+            zip(_ebinning[:-1], _ebinning[1:], _counts, _mu, _mdp):
+            logger.info('%.2f--%.2f keV: %d counts in %d s, mu %.3f, '\
+                        'MDP %.2f%%' % (_emin, _emax, num_counts,
+                                        observation_time, mu_average,
+                                        100*mdp))
 
 
 if __name__=='__main__':
@@ -25,7 +25,7 @@ import numpy
 import imp
 
 from ximpol.irf import load_irfs
-from ximpol.evt.event import xMonteCarloEventList
+from ximpol.evt.event import xMonteCarloEventList, xMonteCarloEventFileWriter
 from ximpol.utils.profile import xChrono
 from ximpol.utils.os_ import mkdir
 from ximpol.utils.logging_ import logger, startmsg
@@ -33,6 +33,21 @@ from ximpol import XIMPOL_IRF, XIMPOL_DATA
 from ximpol.srcmodel.spectrum import xCountSpectrum
 
 
+"""Rough estimate of the peak memory (in bytes) per generated event, including
+all the temporary arrays involved in the generation.
+
+Each event takes DTYPE.itemsize bytes in the structured array of the event
+list, and we allow for two more copies of it (the merged, time-ordered list
+and the block being converted to the FITS layout by the writer), one float64
+temporary per column (the columns are generated as separate arrays before
+being stored) and four more float64 temporaries (the random numbers and the
+intermediate results of the samplers). This amounts to about 250 bytes,
+in line with the measured peak memory of the simulation.
+"""
+MEMORY_PER_EVENT = 3*xMonteCarloEventList.DTYPE.itemsize +\
+                   8*(len(xMonteCarloEventList.DTYPE.names) + 4)
+
+
 """Command-line switches.
 """
 import ast
@@ -53,11 +68,64 @@ PARSER.add_argument('--tstart', type=float, default=0.,
                     help='the start time (MET in s) of the simulation')
 PARSER.add_argument('--seed', type=int, default=0,
                     help='the random seed for the simulation')
+PARSER.add_argument('--jobs', type=int, default=1,
+                    help='the number of parallel processes for the generation')
+PARSER.add_argument('--time-slices', type=int, default=1,
+                    help='the number of time slices for the generation')
+PARSER.add_argument('--chunk-size', type=int, default=None,
+                    help='the approximate number of events per time slice')
+PARSER.add_argument('--max-memory', type=float, default=None,
+                    help='the approximate memory budget (in MB) for the events')
 PARSER.add_argument('--clobber', type=ast.literal_eval, choices=[True, False],
                     default=True,
                     help='overwrite or do not overwrite existing output files')
 
 
+def chunk_size_from_args(**kwargs):
+    """Return the target number of events for each chunk of the simulation,
+    based on the chunk_size and max_memory command-line switches (or None,
+    if neither is set).
+
+    The memory budget has to accommodate the slices being generated (one
+    per job), the one being handed to the writer and those waiting in the
+    writer queue.
+
+    Note that the time slices have all the same length, and the chunk size is
+    only met on average: for strongly variable sources (e.g., flares) the
+    slices around the peak hold more events, and the memory budget can be
+    exceeded.
+    """
+    chunk_size = kwargs.get('chunk_size')
+    max_memory = kwargs.get('max_memory')
+    if max_memory is not None:
+        num_chunks = max(kwargs.get('jobs', 1), 1) + 3
+        _size = int(max_memory*1.e6/(num_chunks*MEMORY_PER_EVENT))
+        if chunk_size is None or _size < chunk_size:
+            chunk_size = _size
+    if chunk_size is not None:
+        chunk_size = max(chunk_size, 1)
+    return chunk_size
+
+
+def num_slices_from_args(roi_model, aeff, **kwargs):
+    """Return the number of time slices for the simulation, based on the
+    time_slices, chunk_size and max_memory command-line switches.
+
+    If a chunk size is set (or implied by the memory budget), the number of
+    time slices is increased, if necessary, so that each slice holds at most
+    chunk_size events on average.
+    """
+    num_slices = kwargs.get('time_slices', 1)
+    chunk_size = chunk_size_from_args(**kwargs)
+    if chunk_size is not None:
+        num_events = roi_model.num_expected_events(aeff, kwargs['tstart'],
+                                                   kwargs['tstop'])
+        num_slices = max(num_slices, int(numpy.ceil(num_events/chunk_size)))
+        logger.info('%.1f events expected, %d events per chunk: %d slices.' %\
+                    (num_events, chunk_size, num_slices))
+    return num_slices
+
+
 class xSimulationInfo:
 
     """Empty container to pass along all the relevant information about the
@@ -99,8 +167,6 @@ def xpobssim(**kwargs):
         logger.info('Simulation stop time set to %s...' % tstop)
     gti_list = [(kwargs['tstart'], tstop)]
     kwargs['tstop'] = tstop
-    event_list = ROI_MODEL.rvs_event_list(aeff, psf, modf, edisp, **kwargs)
-    logger.info('Done %s.' % chrono)
     simulation_info = xSimulationInfo()
     simulation_info.gti_list = gti_list
     simulation_info.roi_model = ROI_MODEL
@@ -109,7 +175,27 @@ def xpobssim(**kwargs):
     simulation_info.psf = psf
     simulation_info.modf = modf
     simulation_info.edisp = edisp
-    event_list.write_fits(kwargs['outfile'], simulation_info)
+    num_slices = num_slices_from_args(ROI_MODEL, aeff, **kwargs)
+    if num_slices > 1:
+        # Stream the time slices to the output file as they come.
+        event_lists = ROI_MODEL.rvs_event_list_slices(aeff, psf, modf, edisp,
+                                                      num_slices, **kwargs)
+        # Get the first slice (which forks the worker processes, if any)
+        # before the writer opens the output file and starts its thread.
+        event_list = next(event_lists)
+        writer = xMonteCarloEventFileWriter(kwargs['outfile'],
+                                            simulation_info, threaded=True)
+        try:
+            writer.write(event_list)
+            for event_list in event_lists:
+                writer.write(event_list)
+        finally:
+            writer.close()
+        logger.info('Done %s.' % chrono)
+    else:
+        event_list = ROI_MODEL.rvs_event_list(aeff, psf, modf, edisp, **kwargs)
+        logger.info('Done %s.' % chrono)
+        event_list.write_fits(kwargs['outfile'], simulation_info)
     logger.info('All done %s!' % chrono)
     return kwargs['outfile']
 
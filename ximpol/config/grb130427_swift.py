@@ -131,11 +131,6 @@ grb = xPointSource('GRB', GRB_RA, GRB_DEC, energy_spectrum, polarization_degree,
                    min_validity_time=integral_flux_spline.xmin(),
                    max_validity_time=integral_flux_spline.xmax())
 
-def sampling_time(tstart, tstop):
-    return numpy.logspace(numpy.log10(tstart), numpy.log10(tstop), 100)
-
-grb.sampling_time = sampling_time
-
 
 ROI_MODEL.add_source(grb)
 
@@ -67,7 +67,8 @@ def parse(file_path, emin=1., emax=15., flux_scale=6.0067e-2):
 energy, flux, degree, angle = parse(data_file_path)
 fmt = dict(xname='Energy', xunits='keV', yname='Flux',
            yunits='cm$^{-2}$ s$^{-1}$ keV$^{-1}$')
-spectral_model = xInterpolatedUnivariateSplineLinear(energy, flux, **fmt)
+spectral_model = xInterpolatedUnivariateSplineLinear(energy, flux, optimize=True,
+                                                    **fmt)
 fmt = dict(xname='Energy', xunits='keV', yname='Polarization degree')
 pol_degree = xInterpolatedUnivariateSplineLinear(energy, degree, **fmt)
 fmt = dict(xname='Energy', xunits='keV', yname='Polarization angle',
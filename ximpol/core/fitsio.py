@@ -22,7 +22,12 @@
 
 
 import time
+import threading
 import numpy
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from  astropy.io import fits
 
@@ -68,6 +73,11 @@ FITS_TO_NUMPY_TYPE_DICT = {
     }
 
 
+"""Size of the FITS logical records (in bytes).
+"""
+FITS_BLOCK_SIZE = 2880
+
+
 class xHDUBase:
 
     """Base class for FITS HDU.
@@ -182,7 +192,7 @@ class xBinTableHDUBase(fits.BinTableHDU, xHDUBase):
         # columns, if any (could not find a way to do this on the columns
         # directly).
         for i, col in enumerate(self.columns):
-            if _kwcomments.has_key(col.name):
+            if col.name in _kwcomments:
                 comment = _kwcomments[col.name]
                 self.set_keyword_comment('TTYPE%d' % (i + 1), comment)
 
@@ -211,6 +221,150 @@ class xBinTableHDUBase(fits.BinTableHDU, xHDUBase):
         return '%s\n%s' % (repr(self.header), self.data)
 
 
+def write_header(file_obj, header):
+    """Write a FITS header (padded to the next logical record) to an open
+    file object.
+
+    Return the position in the file where the header starts.
+    """
+    offset = file_obj.tell()
+    file_obj.write(header.tostring().encode('ascii'))
+    return offset
+
+
+class xBinTableStreamWriter:
+
+    """Write a binary table extension to an open file one block of rows at a
+    time, without ever holding the full table in memory.
+
+    The header is written upfront with NAXIS2 = 0 and patched with the
+    actual number of rows when the writer is closed. If threaded is True,
+    the blocks are converted to the FITS layout and written to disk by a
+    background thread, so that the I/O overlaps with whatever the caller
+    is doing in the meantime (e.g., generating the next block). The thread
+    is only started with the first call to write(), so that the process
+    can still be safely forked (e.g., to create a pool of workers) after
+    the writer has been created.
+
+    Arguments
+    ---------
+    file_obj : file object
+        The output file, open in binary mode and positioned at the end of the
+        previous HDU.
+
+    table_hdu : :py:class:`ximpol.core.fitsio.xBinTableHDUBase` instance
+        An empty table of the appropriate class, providing the header and the
+        column layout.
+
+    threaded : bool
+        Write the data in a background thread.
+
+    max_queue_size : int
+        The maximum number of blocks waiting to be written when running in
+        threaded mode (write() blocks when the queue is full, which bounds
+        the memory footprint).
+    """
+
+    def __init__(self, file_obj, table_hdu, threaded=False, max_queue_size=2):
+        """Constructor.
+        """
+        self.file_obj = file_obj
+        self.header = table_hdu.header.copy()
+        assert self.header['NAXIS2'] == 0
+        self.names = table_hdu.columns.names
+        self.dtype = numpy.dtype(table_hdu.data.dtype.descr).newbyteorder('>')
+        self.num_rows = 0
+        self.header_offset = write_header(self.file_obj, self.header)
+        self.header_size = self.file_obj.tell() - self.header_offset
+        self.error = None
+        self.threaded = threaded
+        self.max_queue_size = max_queue_size
+        self.thread = None
+
+    def __start_thread(self):
+        """Start the background writing thread.
+        """
+        self.queue = queue.Queue(self.max_queue_size)
+        self.thread = threading.Thread(target=self.__run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __run(self):
+        """Main loop of the background writing thread.
+        """
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            # After an error we keep on emptying the queue, so that write()
+            # never blocks, and the exception is raised in the main thread.
+            if self.error is None:
+                try:
+                    self.__write_block(data)
+                except Exception as e:
+                    self.error = e
+
+    def __write_block(self, data):
+        """Convert a block of rows to the FITS layout and write it to file.
+        """
+        if len(data) > 0:
+            num_rows = len(data[0])
+        else:
+            num_rows = 0
+        block = numpy.empty(num_rows, self.dtype)
+        for name, column in zip(self.names, data):
+            assert len(column) == num_rows
+            block[name] = column
+        self.file_obj.write(block.tobytes())
+        self.num_rows += num_rows
+
+    def __check_error(self):
+        """Raise in the main thread any error from the writing thread.
+        """
+        if self.error is not None:
+            raise self.error
+
+    def write(self, data):
+        """Append a block of rows to the table.
+
+        Arguments
+        ---------
+        data : list of arrays
+            The columns of the block, in the order of the DATA_SPECS of the
+            table class.
+        """
+        assert(len(data) == len(self.names))
+        self.__check_error()
+        if self.threaded and self.thread is None:
+            self.__start_thread()
+        if self.thread is None:
+            self.__write_block(data)
+        else:
+            self.queue.put(data)
+
+    def close(self):
+        """Flush the pending blocks, pad the data to the end of the last
+        logical record and patch the number of rows in the header.
+
+        The file object is left open and positioned at the end of the
+        extension, ready for the next HDU to be written.
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            self.threaded = False
+        self.__check_error()
+        data_size = self.num_rows*self.dtype.itemsize
+        self.file_obj.write(b'\0'*(-data_size % FITS_BLOCK_SIZE))
+        end_offset = self.file_obj.tell()
+        self.header['NAXIS2'] = self.num_rows
+        self.file_obj.seek(self.header_offset)
+        write_header(self.file_obj, self.header)
+        # Updating NAXIS2 in place must not change the size of the header.
+        assert self.file_obj.tell() == self.header_offset + self.header_size
+        self.file_obj.seek(end_offset)
+
 
 def main():
     """
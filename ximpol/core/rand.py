@@ -25,6 +25,64 @@ import numpy
 
 from ximpol.core.spline import xInterpolatedUnivariateSpline
 from ximpol.core.spline import xInterpolatedBivariateSplineLinear
+from ximpol.core.spline import meshgrid_eval
+
+
+def random_generator(seed=None, spawn_key=()):
+    """Return a numpy random number generator, independent from the global
+    numpy random state, for a given seed and spawn key.
+
+    Generators created with the same seed and different spawn keys (e.g.,
+    the identifiers of the different sources in a ROI model) are
+    statistically independent streams, which can be used to generate the
+    events for the corresponding components in any order (or in parallel)
+    in a reproducible fashion.
+
+    All the random samplers in ximpol accept an optional `rng` argument,
+    which can be either a generator returned by this function or None, in
+    which case the global numpy random state is used. (Only the methods
+    that `numpy.random.Generator`, `numpy.random.RandomState` and the
+    `numpy.random` module have in common are used.)
+
+    Arguments
+    ---------
+    seed : int or None
+        The seed for the random number generator (None means fresh,\
+        unpredictable entropy from the operating system).
+
+    spawn_key : tuple of ints
+        The spawn key identifying the child stream.
+
+    Note
+    ----
+    numpy.random.SeedSequence and numpy.random.Generator are only available
+    in numpy 1.17 and later. For older versions we fall back to a
+    numpy.random.RandomState seeded with a hash of the seed and the spawn key.
+    """
+    spawn_key = tuple(spawn_key)
+    try:
+        _seq = numpy.random.SeedSequence(seed, spawn_key=spawn_key)
+        return numpy.random.Generator(numpy.random.PCG64(_seq))
+    except AttributeError:
+        if seed is None:
+            return numpy.random.RandomState()
+        return numpy.random.RandomState(hash((seed,) + spawn_key) % 2**32)
+
+
+def linear_segment_ppf(x0, x1, pdf0, pdf1, r):
+    """Invert exactly the cdf of a piecewise-linear pdf within a segment.
+
+    Return the values x in [x0, x1] such that the integral of the pdf
+    (linearly interpolated between pdf0 at x0 and pdf1 at x1) between x0
+    and x is equal to r. This amounts to solving a quadratic equation, and
+    all the arguments can be arrays of the same shape.
+    """
+    _h = x1 - x0
+    _slope = (pdf1 - pdf0)/_h
+    _r = numpy.clip(r, 0., None)
+    _den = pdf0 + numpy.sqrt(numpy.clip(pdf0**2 + 2.*_slope*_r, 0., None))
+    _dx = numpy.where(_den > 0., 2.*_r/numpy.where(_den > 0., _den, 1.), 0.)
+    return x0 + numpy.clip(_dx, 0., _h)
 
 
 class xUnivariateGenerator(xInterpolatedUnivariateSpline):
@@ -69,10 +127,14 @@ class xUnivariateGenerator(xInterpolatedUnivariateSpline):
         """
         return self(rv)
 
-    def rvs(self, size=1):
+    def rvs(self, size=1, rng=None):
         """Return random variates of arbitrary size.
+
+        (See `random_generator()` for the meaning of the `rng` argument.)
         """
-        return self.ppf(numpy.random.sample(size))
+        if rng is None:
+            rng = numpy.random
+        return self.ppf(rng.uniform(size=size))
 
 
 class xUnivariateGeneratorLinear(xUnivariateGenerator):
@@ -170,9 +232,19 @@ class xUnivariateAuxGenerator(xInterpolatedBivariateSplineLinear):
     `pdf` can be either a callable or an arraf shape (aux.size, rv.size).
     If `pdf` is a callable, than a meshgrid is created and the callable is
     evaluated on the meshgrid itself.
+
+    By default the random variates are extracted through the vertical ppf
+    of the underlying bivariate spline, which is interpolated bilinearly
+    across the aux axis. If `exact` is True, they are extracted instead from
+    the exact mixture of the two rows of the pdf table bracketing each value
+    of the auxiliary variable (i.e., from the linear interpolation of the pdf
+    along the aux axis), see `rvs_exact()`.
     """
+
+    __vppf = None
+
     def __init__(self, aux, rv, pdf, auxname='aux', auxunits=None, rvname='rv',
-                 rvunits=None, pdfname=None, pdfunits=None):
+                 rvunits=None, pdfname=None, pdfunits=None, exact=False):
         """Constructor.
         """
         if pdfname is None:
@@ -180,13 +252,48 @@ class xUnivariateAuxGenerator(xInterpolatedBivariateSplineLinear):
         if pdfunits is None and rvunits is not None:
             pdfunits = '1/%s' % rvunits
         if hasattr(pdf, '__call__'):
-            _rv, _aux = numpy.meshgrid(rv, aux)
-            pdf = pdf(_rv, _aux)
+            pdf = meshgrid_eval(pdf, rv, aux)
         xInterpolatedBivariateSplineLinear.__init__(self, aux, rv, pdf,
                                                     auxname, auxunits,
                                                     rvname, rvunits,
                                                     pdfname, pdfunits)
-        self.vppf = self.build_vppf()
+        self.exact = exact
+        if self.exact:
+            self.build_row_tables()
+
+    @property
+    def vppf(self):
+        """The vertical ppf of the underlying spline (see `build_vppf()`).
+
+        This is built the first time it is needed, i.e., never when the
+        random variates are extracted in exact mode.
+        """
+        if self.__vppf is None:
+            self.__vppf = self.build_vppf()
+        return self.__vppf
+
+    def build_row_tables(self):
+        """Build the per-row cumulative tables used by `rvs_exact()`.
+
+        For each row of the pdf table (i.e., for each value of the auxiliary
+        variable on the grid) we store the integral of the row and the
+        corresponding normalized cumulative distribution, offset by the row
+        index, so that all the rows can be inverted at once with a single
+        `numpy.searchsorted()` call on the flattened table. Rows with null
+        integral are replaced by a uniform distribution (note that their
+        weight in the mixture is zero anyway, unless both the bracketing
+        rows are null).
+        """
+        _pdf = numpy.array(self.zgrid)
+        _cdf = self.cumulative_rows.copy()
+        self.row_norm = _cdf[:, -1].copy()
+        _null = self.row_norm <= 0.
+        _pdf[_null] = 1.
+        _cdf[_null] = self.y - self.y[0]
+        self.row_pdf = _pdf
+        self.row_cdf = _cdf
+        _offset = numpy.arange(_cdf.shape[0]).reshape((-1, 1))
+        self.flat_cdf = (_cdf/_cdf[:, -1:] + _offset).ravel()
 
     def pdf(self, aux, rv):
         """Return the pdf value(s) at the point(s) (rv, aux).
@@ -199,11 +306,124 @@ class xUnivariateAuxGenerator(xInterpolatedBivariateSplineLinear):
         """
         return self.vslice(aux)
 
-    def rvs(self, aux):
+    def rvs(self, aux, rng=None):
         """Return random variates for a given array of values of the auxiliary
         variable.
+
+        (See `random_generator()` for the meaning of the `rng` argument.)
+        """
+        if self.exact:
+            return self.rvs_exact(aux, rng)
+        if rng is None:
+            rng = numpy.random
+        return self.vppf(aux, rng.uniform(size=len(aux)))
+
+    def rvs_exact(self, aux, rng=None):
+        """Return random variates for a given array of values of the auxiliary
+        variable, sampling exactly the pdf linearly interpolated along the
+        aux axis.
+
+        Each value of the auxiliary variable is assigned to the two bracketing
+        rows of the pdf table (i and i + 1) and, since the interpolated pdf
+        is a mixture of the two rows with weights proportional to
+        (1 - w)*N_i and w*N_(i + 1) (w being the fractional position between
+        the two rows and N the row integrals), one of the two rows is picked
+        at random with the appropriate probability and the random variate is
+        extracted from it by inverting the row cdf. The pdf is piecewise
+        linear in each row, so that the inversion is done exactly solving
+        the corresponding quadratic equation within each segment.
+
+        The values of the auxiliary variable outside the grid are clipped
+        to the grid boundaries.
+        """
+        if not hasattr(self, 'flat_cdf'):
+            self.build_row_tables()
+        if rng is None:
+            rng = numpy.random
+        aux = numpy.asarray(aux, dtype=float)
+        _size = len(aux)
+        _nrows, _ncols = self.row_cdf.shape
+        # Bucket the events between the rows of the table.
+        _i = numpy.searchsorted(self.x, aux, side='right') - 1
+        _i = numpy.clip(_i, 0, _nrows - 2)
+        _w = (aux - self.x[_i])/(self.x[_i + 1] - self.x[_i])
+        _w = numpy.clip(_w, 0., 1.)
+        # Pick the row from the mixture.
+        _n0 = (1. - _w)*self.row_norm[_i]
+        _n1 = _w*self.row_norm[_i + 1]
+        _ntot = _n0 + _n1
+        _p1 = numpy.where(_ntot > 0., _n1/numpy.where(_ntot > 0., _ntot, 1.),
+                          _w)
+        _row = _i + (rng.uniform(size=_size) < _p1)
+        # Locate the segment in the (flattened) row cdf.
+        _u = rng.uniform(size=_size)
+        _k = numpy.searchsorted(self.flat_cdf, _row + _u, side='right') - 1
+        _k = numpy.clip(_k - _row*_ncols, 0, _ncols - 2)
+        # And invert the cdf exactly within the segment.
+        _r = _u*self.row_cdf[_row, -1] - self.row_cdf[_row, _k]
+        return linear_segment_ppf(self.y[_k], self.y[_k + 1],
+                                  self.row_pdf[_row, _k],
+                                  self.row_pdf[_row, _k + 1], _r)
+
+
+class xAliasGenerator:
+
+    """Random number generator for a discrete distribution over the
+    indices 0..n-1, with probabilities proportional to a given array of
+    non-negative weights, based on the alias method.
+
+    The alias table is built once (in a handful of vectorized passes), and
+    each random index only costs two uniform random numbers and a couple of
+    lookups, independently of n, i.e., there is no searchsorted over the
+    cumulative weights.
+
+    Args
+    ----
+    weights : array
+        The (non-negative) weights. Multi-dimensional arrays are flattened.
+    """
+
+    def __init__(self, weights):
+        """Constructor.
+        """
+        _w = numpy.asarray(weights, dtype=float).ravel()
+        assert len(_w) > 0 and _w.sum() > 0
+        self.size = len(_w)
+        _p = _w*self.size/_w.sum()
+        self.prob = numpy.ones(self.size)
+        self.alias = numpy.arange(self.size)
+        small = numpy.flatnonzero(_p < 1.)
+        large = numpy.flatnonzero(_p >= 1.)
+        while len(small) > 0 and len(large) > 0:
+            # Hand each small entry over to the large entry whose slot in
+            # the cumulative surplus contains the end of its slot in the
+            # cumulative deficit. (A large entry can be overdrawn by less
+            # than one unit this way, in which case it turns small.) Since
+            # the total surplus and deficit are equal, all the small entries
+            # are taken care of at each pass, up to round-off errors.
+            _deficit = 1. - _p[small]
+            _idx = numpy.searchsorted(numpy.cumsum(_p[large] - 1.),
+                                      numpy.cumsum(_deficit))
+            _idx = numpy.clip(_idx, 0, len(large) - 1)
+            self.prob[small] = _p[small]
+            self.alias[small] = large[_idx]
+            _p[large] -= numpy.bincount(_idx, _deficit, len(large))
+            _p[large] = numpy.clip(_p[large], 0., None)
+            _turned = _p[large] < 1.
+            small = large[_turned]
+            large = large[~_turned]
+
+    def rvs(self, size=1, rng=None):
+        """Return an array of random indices of arbitrary size.
+
+        (See `random_generator()` for the meaning of the `rng` argument.)
         """
-        return self.vppf(aux, numpy.random.sample(len(aux)))
+        if rng is None:
+            rng = numpy.random
+        _i = (rng.uniform(size=size)*self.size).astype(int)
+        _i = numpy.clip(_i, 0, self.size - 1)
+        _u = rng.uniform(size=size)
+        return numpy.where(_u < self.prob[_i], _i, self.alias[_i])
 
 
 def main():
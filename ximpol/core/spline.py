@@ -28,17 +28,184 @@ from scipy.interpolate import RectBivariateSpline
 from ximpol.utils.logging_ import logger
 
 
+"""Backend for the linear (k = 1) interpolated univariate splines.
+
+With the 'numpy' backend the evaluation and the integration of the linear
+splines (both univariate and bivariate) are done in pure numpy (with the
+cumulative segment integrals precomputed at construction time), while with
+the 'fitpack' backend they are delegated to scipy/FITPACK. The backend is read
+when the splines are created, see `set_linear_spline_backend()`.
+"""
+LINEAR_SPLINE_BACKENDS = ['numpy', 'fitpack']
+LINEAR_SPLINE_BACKEND = 'numpy'
+
+
+def set_linear_spline_backend(backend):
+    """Set the backend for all the linear interpolated univariate splines
+    created from now on.
+    """
+    global LINEAR_SPLINE_BACKEND
+    assert(backend in LINEAR_SPLINE_BACKENDS)
+    LINEAR_SPLINE_BACKEND = backend
+
+
 def interpolate(xa, ya, xb, yb, x):
     """Simple two-point linear interpolation/extrapolation.
     """
     return ya + (yb - ya)/(xb - xa)*(x - xa)
 
-def optimize_grid_linear(x, y, tolerance=1e-4):
+def grid_step(x, tolerance=1e-3):
+    """Return the step of the grid x if the grid points are equally spaced,
+    and None otherwise.
+
+    The grid is considered equally spaced if all the points are within a
+    given fraction of the step from the corresponding nodes of the uniform
+    grid with the same end points (note that checking the single spacings
+    is not enough, as small deviations can add up along the grid).
+    """
+    _x = numpy.asarray(x, dtype=float)
+    _step = (_x[-1] - _x[0])/(len(_x) - 1.)
+    _nodes = _x[0] + _step*numpy.arange(len(_x))
+    if _step > 0 and abs(_x - _nodes).max() <= tolerance*_step:
+        return _step
+    return None
+
+def grid_segment(x, grid, step=None):
+    """Return the index of the segment of a (sorted) grid for the point(s)
+    x, with the points outside the grid assigned to the first or last segment.
+
+    If `step` is not None, the grid is assumed to be equally spaced and the
+    index is calculated in O(1) with index arithmetic (and corrected by one
+    unit, where necessary, to account for rounding and small irregularities
+    of the grid), otherwise a binary search is performed.
+    """
+    _imax = len(grid) - 2
+    if step is None:
+        _index = numpy.searchsorted(grid, x, side='right') - 1
+        return numpy.clip(_index, 0, _imax)
+    _index = numpy.clip((x - grid[0])/step, 0, _imax).astype(int)
+    _index -= (x < grid[_index])*(_index > 0)
+    _index += (x >= grid[_index + 1])*(_index < _imax)
+    return _index
+
+def meshgrid_eval(function, x, y):
+    """Evaluate a function of two variables on the grid of points spanned
+    by x and y, i.e., return the equivalent of function(*numpy.meshgrid(x, y))
+    as an array of shape (y.size, x.size).
+
+    The function is first called on the broadcastable arrays x[newaxis, :] and
+    y[:, newaxis], so that the terms depending on one variable only are
+    evaluated on the corresponding one-dimensional grid (e.g., a
+    time-independent spectrum is only evaluated on the energy grid, and not
+    on the full time-energy grid). If the output is not a two-dimensional
+    array (or a scalar) that can be broadcast to the shape of the grid,
+    the function is evaluated on the full meshgrid instead.
+
+    Note that the output might be a read-only, broadcast view.
+    """
+    _x = numpy.asarray(x, dtype=float)
+    _y = numpy.asarray(y, dtype=float)
+    _shape = (_y.size, _x.size)
+    _z = numpy.asarray(function(_x[numpy.newaxis, :], _y[:, numpy.newaxis]),
+                       dtype=float)
+    if _z.ndim in (0, 2):
+        try:
+            return numpy.broadcast_to(_z, _shape)
+        except ValueError:
+            pass
+    _x, _y = numpy.meshgrid(_x, _y)
+    return numpy.asarray(function(_x, _y), dtype=float).reshape(_shape)
+
+def cumulative_trapz(x, y):
+    """Return the cumulative integral of a set of (x, y) points, calculated
+    with the trapezoidal rule and starting from zero at x[0].
+
+    Note that this is the exact integral of the linear spline going through
+    the input points, so it can be used to build cdfs and ppfs in a single
+    numpy pass, without calling the spline integral() method point by point.
+
+    Args
+    ----
+    x : array
+        The input x-array (assumed to be sorted).
+
+    y : array
+        The input y-array. This can also be a two-dimensional array of shape\
+        (n, x.size), in which case the integration is performed along the\
+        last axis, i.e., independently for each row.
+    """
+    _cum = numpy.cumsum(0.5*(y[..., 1:] + y[..., :-1])*numpy.diff(x), axis=-1)
+    _zeros = numpy.zeros(y.shape[:-1] + (1,))
+    return numpy.concatenate((_zeros, _cum), axis=-1)
+
+def linear_primitive(x, y, cumulative, t):
+    """Return the integral between x[0] and t (clamped to the grid bounds)
+    of the piecewise linear function(s) going through the points (x, y),
+    given the corresponding cumulative integrals on the grid (see
+    `cumulative_trapz()`).
+
+    y can be two-dimensional, in which case the integration is performed
+    along the last axis and t must be a scalar.
+    """
+    t = min(max(float(t), x[0]), x[-1])
+    _i = min(max(x.searchsorted(t, 'right') - 1, 0), len(x) - 2)
+    _dt = t - x[_i]
+    _slope = (y[..., _i + 1] - y[..., _i])/(x[_i + 1] - x[_i])
+    return cumulative[..., _i] + _dt*(y[..., _i] + 0.5*_slope*_dt)
+
+def ppf_rows(cdf, x, q):
+    """Invert a set of cumulative distribution functions, tabulated on a
+    common grid of points, onto a common grid of quantiles.
+
+    All the rows are inverted at once: the cdf values of the i-th row are
+    shifted by 2i, so that the flattened table is monotonic and a single
+    call to numpy.searchsorted() is enough to locate all the quantiles.
+    For flat portions of the cdf the first grid point is picked, consistently
+    with what the `build_ppf()` method of the univariate splines does.
+
+    Args
+    ----
+    cdf : array
+        A two-dimensional array of shape (n, x.size) with the cdf values\
+        (normalized between 0 and 1) for each row.
+
+    x : array
+        The grid of points where the cdfs are tabulated.
+
+    q : array
+        The common grid of quantiles, in [0--1].
+
+    Returns
+    -------
+    array
+        A two-dimensional array of shape (n, q.size) with the ppf values.
+    """
+    num_rows, num_cols = cdf.shape
+    _rows = numpy.arange(num_rows)[:, numpy.newaxis]
+    _offset = 2.*_rows
+    _index = numpy.searchsorted((cdf + _offset).ravel(), q + _offset)
+    _index = numpy.clip(_index - num_cols*_rows, 1, num_cols - 1)
+    _c0 = cdf[_rows, _index - 1]
+    _dc = cdf[_rows, _index] - _c0
+    _valid = _dc > 0.
+    _frac = numpy.where(_valid, (q - _c0)/numpy.where(_valid, _dc, 1.), 0.)
+    return x[_index - 1] + _frac*(x[_index] - x[_index - 1])
+
+def optimize_grid_linear(x, y, tolerance=1e-4, relative=True):
     """Optimize a pair of (x, y) arrays for the corresponding spline
     definition.
 
-    This loops over the input arrays and removes unnecessary data points
-    to minimize the length of the arrays necessary to the spline definition.
+    This removes unnecessary data points to minimize the length of the arrays
+    necessary to the spline definition, guaranteeing that the linear
+    interpolation of the optimized arrays does not differ from any of the
+    original y values by more than the given tolerance.
+
+    The reduction is a Douglas-Peucker-like refinement (with the error
+    measured along the y axis): starting from the two end points, at each
+    pass the worst-approximated point of each segment exceeding the tolerance
+    is added to the knot set. All the segments are refined at once with
+    numpy operations, and the number of passes scales (in the typical case)
+    with the logarithm of the number of points.
 
     Args
     ----
@@ -49,36 +216,37 @@ def optimize_grid_linear(x, y, tolerance=1e-4):
         The input y-array.
 
     tolerance : float
-        The maximum relative difference between the generic yi value and the\
-        estrapolation of the two previous optimized data points for the point\
-        i to be removed.
+        The maximum difference between the generic yi value and the\
+        linear interpolation of the optimized data points.
+
+    relative : bool
+        If `True`, the tolerance is interpreted as the maximum relative\
+        difference, otherwise as the maximum absolute difference.
     """
     assert(len(x) == len(y))
     logger.info('Optimizing grid with %d starting points...' % len(x))
-    # Start a new series with the first two points of the input arrays.
-    _x = [x[0], x[1]]
-    _y = [y[0], y[1]]
-    # Loop over the points 3 ... (N - 1).
-    for i, (_xi, _yi) in enumerate(zip(x, y)[2:-1]):
-        # Extrapolate the last two points of the new series to xi and
-        # see how far we are from the actual yi.
-        delta = interpolate(_x[-2], _y[-2], _x[-1], _y[-1], _xi) - _yi
-        if abs(delta/_yi) > tolerance:
-            # If the difference is larger than the tolerance, add a point.
-            # (This has the drawback that we tend to add pairs of point at
-            # each change of slope.)
-            _x.append(_xi)
-            _y.append(_yi)
-            # Interpolate the points last and (last - 2) to (last - 1).
-            delta = interpolate(_x[-3], _y[-3], _x[-1], _y[-1], _x[-2]) - _y[-2]
-            if abs(delta/_y[-2]) < tolerance:
-                # If the penultimate point was not necessary, remove it.
-                _x.remove(_x[-2])
-                _y.remove(_y[-2])
-    # Append the last point of the original array to the list.
-    _x.append(x[-1])
-    _y.append(y[-1])
-    _x, _y = numpy.array(_x), numpy.array(_y)
+    x = numpy.asarray(x)
+    y = numpy.asarray(y)
+    _keep = numpy.zeros(len(x), dtype=bool)
+    _keep[0] = _keep[-1] = True
+    _scale = abs(y) if relative else numpy.ones(len(y))
+    while True:
+        _index = numpy.flatnonzero(_keep)
+        _err = abs(numpy.interp(x, x[_index], y[_index]) - y)
+        _err = numpy.where(_err > tolerance*_scale, _err, 0.)
+        # Find the worst-approximated point in each segment.
+        _max = numpy.maximum.reduceat(_err, _index[:-1])
+        _segment = numpy.searchsorted(_index, numpy.arange(len(x)),
+                                      side='right') - 1
+        _segment = numpy.clip(_segment, 0, len(_index) - 2)
+        _worst = (_err > 0.)*(_err == _max[_segment])
+        if not _worst.any():
+            break
+        # Only take the first candidate within each segment.
+        _new = numpy.flatnonzero(_worst)
+        _first = numpy.unique(_segment[_new], return_index=True)[1]
+        _keep[_new[_first]] = True
+    _x, _y = x[_keep], y[_keep]
     logger.info('Done, %d points remaining.' % len(_x))
     return _x, _y
 
@@ -231,22 +399,26 @@ class xUnivariateSplineBase:
         """Create the cumulative distribution function.
 
         Note that the cdf is built using a linear interpolated spline, no matter
-        what the class of the original spline is.
+        what the class of the original spline is. The cumulative integral is
+        calculated with the trapezoidal rule on the spline grid, which is exact
+        for linear splines.
         """
         _x = self.x
-        _y = numpy.array([self.integral(0, _xp) for _xp in _x])/self.norm()
+        _y = cumulative_trapz(_x, self(_x))
+        _y /= _y[-1]
         return xInterpolatedUnivariateSplineLinear(_x, _y)
 
     def build_ppf(self):
         """Create the percent point function (or inverse of the cdf).
 
         Note that the cdf is built using a linear interpolated spline, no matter
-        what the class of the original spline is.
+        what the class of the original spline is. (See the note in
+        `build_cdf()` about how the cumulative integral is calculated.)
         """
         _y = self.x
-        _x = numpy.array([self.integral(0, _xp) for _xp in _y])
+        _x = cumulative_trapz(_y, self(_y))
         _x, _mask = numpy.unique(_x, return_index=True)
-        _x/= self.norm()
+        _x/= _x[-1]
         _y = _y[_mask]
         fmt = dict(xname='Normalized integral', yname=self.xname,
                    yunits=self.xunits)
@@ -336,7 +508,154 @@ class xInterpolatedUnivariateSpline(xUnivariateSplineBase,
         """Constructor.
         """
         xUnivariateSplineBase.__init__(self, x, y, xname, xunits, yname, yunits)
-        InterpolatedUnivariateSpline.__init__(self, self.x, self.y, w, bbox, k)
+        self.numpy_backend = k == 1 and LINEAR_SPLINE_BACKEND == 'numpy' and\
+                             bbox[0] is None and bbox[1] is None and w is None
+        self.fitpack_ready = not self.numpy_backend
+        self.bbox = bbox
+        self.k = k
+        if self.numpy_backend:
+            # Precompute the slopes and the cumulative integrals of all the
+            # segments.
+            _x = numpy.asarray(self.x, dtype=float)
+            _y = numpy.asarray(self.y, dtype=float)
+            self.slope = numpy.diff(_y)/numpy.diff(_x)
+            self.cumulative = cumulative_trapz(_x, _y)
+            self.step = grid_step(_x)
+        else:
+            InterpolatedUnivariateSpline.__init__(self, self.x, self.y, w,
+                                                  bbox, k)
+
+    def setup_fitpack(self):
+        """Initialize the underlying FITPACK spline, if this has not been
+        done already.
+
+        With the numpy backend this only happens when a functionality that
+        the backend does not implement (e.g., the derivative spline or the
+        roots) is requested for the first time.
+        """
+        if not self.fitpack_ready:
+            InterpolatedUnivariateSpline.__init__(self, self.x, self.y, None,
+                                                  self.bbox, self.k)
+            self.fitpack_ready = True
+
+    def derivative(self, n=1):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.derivative(self, n)
+
+    def antiderivative(self, n=1):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.antiderivative(self, n)
+
+    def derivatives(self, x):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.derivatives(self, x)
+
+    def roots(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.roots(self)
+
+    def get_knots(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.get_knots(self)
+
+    def get_coeffs(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.get_coeffs(self)
+
+    def get_residual(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return InterpolatedUnivariateSpline.get_residual(self)
+
+    def segment(self, x):
+        """Return the index of the segment of the underlying grid for the
+        point(s) x (points outside the grid are assigned to the first or
+        last segment).
+        """
+        return grid_segment(x, self.x, self.step)
+
+    def __call__(self, x, nu=0, ext=None):
+        """Overloaded method.
+
+        With the numpy backend the spline is evaluated with `numpy.interp()`
+        (or with direct index arithmetic, if the grid is equally spaced)
+        and extrapolated linearly outside the grid (the same way FITPACK
+        does), otherwise the call is delegated to FITPACK. (This is also the
+        case if an extrapolation mode other than 0, or 'extrapolate', is
+        requested through the `ext` argument.)
+        """
+        if not self.numpy_backend or ext not in (None, 0, 'extrapolate'):
+            self.setup_fitpack()
+            return InterpolatedUnivariateSpline.__call__(self, x, nu, ext)
+        x = numpy.asarray(x, dtype=float)
+        if nu == 1:
+            return self.slope[self.segment(x)]
+        if nu > 1:
+            return numpy.zeros(x.shape)
+        if self.step is not None:
+            _index = self.segment(x)
+            return self.y[_index] + self.slope[_index]*(x - self.x[_index])
+        _val = numpy.interp(x, self.x, self.y)
+        _mask = x < self.x[0]
+        if _mask.any():
+            _val = numpy.where(_mask, self.y[0] + self.slope[0]*\
+                               (x - self.x[0]), _val)
+        _mask = x > self.x[-1]
+        if _mask.any():
+            _val = numpy.where(_mask, self.y[-1] + self.slope[-1]*\
+                               (x - self.x[-1]), _val)
+        return _val
+
+    def primitive(self, x):
+        """Return the integral of the spline between xmin() and x, with x
+        clamped to the spline domain (numpy backend only).
+        """
+        if numpy.isscalar(x):
+            # Fast path for scalars, avoiding the overhead of the numpy
+            # array machinery.
+            return linear_primitive(self.x, self.y, self.cumulative, x)
+        x = numpy.clip(numpy.asarray(x, dtype=float), self.x[0], self.x[-1])
+        _index = self.segment(x)
+        _dx = x - self.x[_index]
+        return self.cumulative[_index] +\
+            _dx*(self.y[_index] + 0.5*self.slope[_index]*_dx)
+
+    def integral(self, a, b):
+        """Overloaded method.
+
+        With the numpy backend the integral is calculated from the
+        precomputed cumulative integrals of the segments (i.e., with two binary
+        searches), otherwise the call is delegated to FITPACK. In both cases
+        the integration limits are clamped to the spline domain.
+
+        `a` and `b` can be arrays (of the same shape, or broadcastable to a
+        common shape), in which case an array with the integrals over all the
+        corresponding intervals is returned.
+        """
+        if numpy.isscalar(a) and numpy.isscalar(b):
+            if not self.numpy_backend:
+                return InterpolatedUnivariateSpline.integral(self, a, b)
+            return self.primitive(b) - self.primitive(a)
+        a, b = numpy.broadcast_arrays(numpy.asarray(a, dtype=float),
+                                      numpy.asarray(b, dtype=float))
+        if not self.numpy_backend:
+            _val = [InterpolatedUnivariateSpline.integral(self, _a, _b) for\
+                    _a, _b in zip(a.flat, b.flat)]
+            return numpy.array(_val).reshape(a.shape)
+        return self.primitive(b) - self.primitive(a)
 
 
 class xInterpolatedUnivariateSplineLinear(xInterpolatedUnivariateSpline):
@@ -375,6 +694,11 @@ class xInterpolatedUnivariateSplineLinear(xInterpolatedUnivariateSpline):
         The tolerance for the input array optimization. (If `optimize` is\
         `False`, this has no effect.)
 
+    relative : bool
+        If `True`, the tolerance for the input array optimization is\
+        relative, otherwise it is absolute. (If `optimize` is `False`, this\
+        has no effect.)
+
     Example
     -------
     >>> from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
@@ -386,12 +710,12 @@ class xInterpolatedUnivariateSplineLinear(xInterpolatedUnivariateSpline):
     """
 
     def __init__(self, x, y, xname=None, xunits=None, yname=None, yunits=None,
-                 optimize=False, tolerance=1e-4):
+                 optimize=False, tolerance=1e-4, relative=True):
         """ Constructor.
         """
         if optimize:
             oldx, oldy = x, y
-            x, y = optimize_grid_linear(x, y, tolerance)
+            x, y = optimize_grid_linear(x, y, tolerance, relative)
         xInterpolatedUnivariateSpline.__init__(self, x, y, None, [None, None],
                                                1, xname, xunits, yname, yunits)
         if optimize:
@@ -502,6 +826,12 @@ class xInterpolatedBivariateSplineLinear(xBivariateSplineBase,
                                          RectBivariateSpline):
 
     """Bivariate linear interpolated spline on a rectangular grid.
+
+    With the numpy backend (see `set_linear_spline_backend()`) the spline is
+    evaluated and integrated in pure numpy, with O(1) index arithmetic along
+    the axes with equally spaced grid points, otherwise the calls are
+    delegated to FITPACK. In both cases the spline is not extrapolated
+    outside the grid, i.e., the coordinates are clamped to the grid bounds.
     """
 
     def __init__(self, x, y, z, xname=None, xunits=None, yname=None,
@@ -513,9 +843,59 @@ class xInterpolatedBivariateSplineLinear(xBivariateSplineBase,
             z = z(_x, _y)
         xBivariateSplineBase.__init__(self, x, y, z, xname, xunits, yname,
                                       yunits, zname, zunits)
-        RectBivariateSpline.__init__(self, x, y, z,
-                                     bbox=[None, None, None, None],
-                                     kx=1, ky=1, s=0)
+        self.numpy_backend = LINEAR_SPLINE_BACKEND == 'numpy'
+        self.fitpack_ready = False
+        self.zgrid = numpy.asarray(z, dtype=float)
+        self.cumulative_rows = cumulative_trapz(numpy.asarray(y, float),
+                                                self.zgrid)
+        if self.numpy_backend:
+            self.xstep = grid_step(x)
+            self.ystep = grid_step(y)
+        else:
+            self.setup_fitpack()
+
+    def setup_fitpack(self):
+        """Initialize the underlying FITPACK spline, if this has not been
+        done already.
+
+        With the numpy backend this only happens when a functionality that
+        the backend does not implement (e.g., the partial derivatives) is
+        requested for the first time.
+        """
+        if not self.fitpack_ready:
+            RectBivariateSpline.__init__(self, self.x, self.y, self.zgrid,
+                                         bbox=[None, None, None, None],
+                                         kx=1, ky=1, s=0)
+            self.fitpack_ready = True
+
+    def ev(self, xi, yi, dx=0, dy=0):
+        """Overloaded method.
+        """
+        return self(xi, yi, dx=dx, dy=dy, grid=False)
+
+    def partial_derivative(self, dx, dy):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return RectBivariateSpline.partial_derivative(self, dx, dy)
+
+    def get_knots(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return RectBivariateSpline.get_knots(self)
+
+    def get_coeffs(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return RectBivariateSpline.get_coeffs(self)
+
+    def get_residual(self):
+        """Overloaded method (initializing FITPACK, if necessary).
+        """
+        self.setup_fitpack()
+        return RectBivariateSpline.get_residual(self)
 
     def __call__(self, x, y, dx=0, dy=0, grid=False):
         """Overloaded __call__method.
@@ -523,8 +903,79 @@ class xInterpolatedBivariateSplineLinear(xBivariateSplineBase,
         Here we basically override the default value of the `grid` parameter
         from `True` to `False`, since we're typically interested in evaluating
         the splined at given physical coordinates, rather than grid points.
+
+        The derivatives (dx > 0 or dy > 0) are always delegated to FITPACK.
         """
-        return RectBivariateSpline.__call__(self, x, y, None, dx, dy, grid)
+        if not self.numpy_backend or dx != 0 or dy != 0:
+            self.setup_fitpack()
+            return RectBivariateSpline.__call__(self, x, y, dx=dx, dy=dy,
+                                                grid=grid)
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        if grid:
+            x, y = numpy.meshgrid(x, y, indexing='ij')
+        x = numpy.clip(x, self.x[0], self.x[-1])
+        y = numpy.clip(y, self.y[0], self.y[-1])
+        _i = grid_segment(x, self.x, self.xstep)
+        _j = grid_segment(y, self.y, self.ystep)
+        _tx = (x - self.x[_i])/(self.x[_i + 1] - self.x[_i])
+        _ty = (y - self.y[_j])/(self.y[_j + 1] - self.y[_j])
+        _z0 = self.zgrid[_i, _j] + _ty*(self.zgrid[_i, _j + 1] -\
+                                        self.zgrid[_i, _j])
+        _z1 = self.zgrid[_i + 1, _j] + _ty*(self.zgrid[_i + 1, _j + 1] -\
+                                            self.zgrid[_i + 1, _j])
+        return _z0 + _tx*(_z1 - _z0)
+
+    def integral(self, xa, xb, ya, yb):
+        """Overloaded method.
+
+        With the numpy backend the integral of each row of the grid between
+        ya and yb is calculated from the precomputed cumulative integrals,
+        and the resulting (piecewise linear) function of x is integrated
+        between xa and xb, which is exact for a bilinear spline. The
+        integration limits are clamped to the spline domain.
+        """
+        if not self.numpy_backend:
+            return RectBivariateSpline.integral(self, xa, xb, ya, yb)
+        _rows = self.integral_rows(ya, yb)
+        _x = numpy.asarray(self.x, dtype=float)
+        _cols = cumulative_trapz(_x, _rows)
+        return float(linear_primitive(_x, _rows, _cols, xb) -\
+                     linear_primitive(_x, _rows, _cols, xa))
+
+    def integral_rows(self, ymin=None, ymax=None):
+        """Return the integrals between ymin and ymax of all the vertical
+        slices of the spline at the x values of the grid (i.e., of all the
+        rows of the underlying z array), in a single vectorized call.
+
+        The integration limits are clamped to the spline domain and default
+        to the spline bounds.
+        """
+        if ymin is None:
+            ymin = self.ymin()
+        if ymax is None:
+            ymax = self.ymax()
+        _y = numpy.asarray(self.y, dtype=float)
+        return linear_primitive(_y, self.zgrid, self.cumulative_rows, ymax) -\
+            linear_primitive(_y, self.zgrid, self.cumulative_rows, ymin)
+
+    def integral_cols(self, xmin=None, xmax=None):
+        """Return the integrals between xmin and xmax of all the horizontal
+        slices of the spline at the y values of the grid (i.e., of all the
+        columns of the underlying z array), in a single vectorized call.
+
+        The integration limits are clamped to the spline domain and default
+        to the spline bounds.
+        """
+        if xmin is None:
+            xmin = self.xmin()
+        if xmax is None:
+            xmax = self.xmax()
+        _x = numpy.asarray(self.x, dtype=float)
+        _z = self.zgrid.transpose()
+        _cumulative = cumulative_trapz(_x, _z)
+        return linear_primitive(_x, _z, _cumulative, xmax) -\
+            linear_primitive(_x, _z, _cumulative, xmin)
 
     def vslice(self, x):
         """Return a vertical slice at a given x of the bivariate spline.
@@ -557,21 +1008,31 @@ class xInterpolatedBivariateSplineLinear(xBivariateSplineBase,
     def build_vppf(self):
         """Create the vertical percent point function (or inverse of cdf).
 
+        The pdf is taken from the grid of values the spline is built from,
+        the cdfs of all the vertical slices are calculated at once with the
+        trapezoidal rule and inverted simultaneously onto a common grid of
+        quantiles (see `ppf_rows()`), so that the whole thing is a handful
+        of numpy operations, independently of the size of the x grid.
+        (Vertical slices with a null integral are treated as uniform.)
+
         Warning
         -------
         This really, really need to be fixed. Instead of grabbing a vertical
-        slice at xmean, we should pass an argument to the function so that
-        the subclasses can implement whatever is right for them.
+        slice at xmean to define the quantile grid, we should pass an argument
+        to the function so that the subclasses can implement whatever is
+        right for them.
         """
         _xmean = 0.5*(self.xmin() + self.xmax())
-        _refppf = self.vslice(_xmean).build_ppf()
+        _refcdf = cumulative_trapz(self.y, self(_xmean, self.y))
+        _refcdf = numpy.unique(_refcdf)
+        _refcdf /= _refcdf[-1]
         _x = self.x.copy()
-        _y = _refppf.x
-        _z = numpy.zeros(shape = (_x.size, _y.size))
-        for i, _xp in enumerate(_x):
-            _ppf = self.vslice(_xp).build_ppf()
-            for j, _yp in enumerate(_y):
-                _z[i, j] = _ppf(_yp)
+        _y = _refcdf
+        _cdf = cumulative_trapz(self.y, numpy.asarray(self.z, dtype=float))
+        _null = _cdf[:, -1] <= 0.
+        _cdf[_null] = self.y - self.y[0]
+        _cdf /= _cdf[:, -1:]
+        _z = ppf_rows(_cdf, self.y, _y)
         fmt = dict(yname='Normalized integral', xname=self.xname,
                    xunits=self.xunits, zname=self.yname, zunits=self.yunits)
         return xInterpolatedBivariateSplineLinear(_x, _y, _z, **fmt)
@@ -108,6 +108,27 @@ class xEventBinningBase:
         assert bin_edges.ndim == 1
         return (bin_edges[1:] - bin_edges[:-1])
 
+    @classmethod
+    def digitize(cls, vector, bin_edges):
+        """Return the (zero-based) bin index for each element of an array.
+
+        The bins follow the same convention as `numpy.histogram()`, i.e.,
+        all the bins are half-open on the right, except for the last one,
+        which is closed. Values outside the binning get an index of -1.
+
+        Arguments
+        ---------
+        vector : array
+            The input values.
+
+        bin_edges : 1-d array of length (n + 1).
+            The array with the bin edges.
+        """
+        index = numpy.searchsorted(bin_edges, vector, side='right') - 1
+        index[vector == bin_edges[-1]] = len(bin_edges) - 2
+        index[index >= len(bin_edges) - 1] = -1
+        return index
+
     @classmethod
     def equipopulated_binning(cls, num_bins, vector, min_value=None,
                               max_value=None):
@@ -585,38 +606,53 @@ class xEventBinningMCUBE(xEventBinningBase):
         phibinning = numpy.linspace(0, 2*numpy.pi, self.get('phibins') + 1)
         return (ebinning, phibinning)
 
-    def bin_(self):
-        """Overloaded method.
+    def make_data(self):
+        """Calculate the content of the modulation cube.
+
+        All the columns of the MCUBE (PHI_HIST, COUNTS, ENERGY_MEAN,
+        EFFECTIVE_MU and MDP) are calculated from the same set of events,
+        i.e., those falling within both the energy and the phi binning, with
+        the same edge convention as `numpy.histogram()` (all bins are
+        half-open on the right, except for the last one, which is closed).
+        COUNTS is therefore always equal to the sum of PHI_HIST over phi.
+
+        Return the list of the columns of the MCUBE extension.
         """
         from ximpol.irf import load_mrf
         from ximpol.irf.mrf import mdp99
         modf = load_mrf(self.event_file.irf_name())
-        evt_header = self.event_file.hdu_list['PRIMARY'].header
         if self.get('mc'):
             energy = self.event_data['MC_ENERGY']
         else:
             energy = self.event_data['ENERGY']
         phi = self.event_data['PE_ANGLE']
-        phi_hist, xedges, yedges = numpy.histogram2d(energy, phi,
-                                                     bins=self.make_binning())
+        ebinning, phibinning = self.make_binning()
+        num_ebins = len(ebinning) - 1
+        num_phibins = len(phibinning) - 1
+        emin, emax = ebinning[:-1], ebinning[1:]
+        # Assign each event to its energy and phi bins in a single pass
+        # (with the same convention as numpy.histogram, i.e., the last bin
+        # is closed on the right) and accumulate everything with bincount.
+        eidx = self.digitize(energy, ebinning)
+        phiidx = self.digitize(phi, phibinning)
+        _mask = (eidx >= 0)*(phiidx >= 0)
+        eidx = eidx[_mask]
+        phiidx = phiidx[_mask]
+        _energy = energy[_mask]
+        phi_hist = numpy.bincount(eidx*num_phibins + phiidx,
+                                  minlength=num_ebins*num_phibins)
+        phi_hist = phi_hist.reshape((num_ebins, num_phibins))
+        ncounts = numpy.bincount(eidx, minlength=num_ebins)
+        emean = numpy.bincount(eidx, _energy, num_ebins)/ncounts
+        effmu = numpy.bincount(eidx, modf(_energy), num_ebins)/ncounts
+        mdp = mdp99(effmu, ncounts)
+        return [emin, emax, emean, effmu, ncounts, mdp, phi_hist]
+
+    def bin_(self):
+        """Overloaded method.
+        """
+        data = self.make_data()
         primary_hdu = self.build_primary_hdu()
-        emin, emax = xedges[:-1], xedges[1:]
-        emean = []
-        effmu = []
-        ncounts = []
-        mdp = []
-        for _emin, _emax in zip(emin, emax):
-            _mask = (energy > _emin)*(energy < _emax)
-            _energy = energy[_mask]
-            _emean = numpy.mean(_energy)
-            _effmu = modf.weighted_average(_energy)
-            _ncounts = len(_energy)
-            _mdp = mdp99(_effmu, _ncounts)
-            emean.append(_emean)
-            effmu.append(_effmu)
-            ncounts.append(_ncounts)
-            mdp.append(_mdp)
-        data = [emin, emax, emean, effmu, ncounts, mdp, phi_hist]
         xBinTableHDUMCUBE.set_phi_spec(self.get('phibins'))
         mcube_hdu = xBinTableHDUMCUBE(data)
         mcube_hdu.setup_header(self.event_file.primary_keywords())
@@ -670,10 +706,15 @@ class xBinnedModulationCube(xBinnedFileBase):
 
     def fit(self):
         """Fit the azimuthal distribution for all the energy bins.
+
+        All the energy slices are fitted at once, see
+        `xAzimuthalResponseGenerator.fit_histograms()`.
         """
-        self.fit_results = []
-        for i in range(len(self)):
-            self.fit_bin(i)
+        self.fit_results = xAzimuthalResponseGenerator.fit_histograms(
+            self.phi_y, self.phi_binning)
+        for _fit_results, _emean in zip(self.fit_results, self.emean):
+            _fit_results.set_polarization(self.modf(_emean))
+            logger.info(_fit_results)
 
     def plot_bin(self, i, show=True, fit=True):
         """Plot the azimuthal distribution for the i-th energy slice.
@@ -27,6 +27,7 @@ from astropy.io import fits
 
 from ximpol.utils.logging_ import logger
 from ximpol.core.fitsio import xPrimaryHDU, xBinTableHDUBase
+from ximpol.core.fitsio import xBinTableStreamWriter, write_header
 from ximpol.core.fitsio import FITS_TO_NUMPY_TYPE_DICT
 
 
@@ -97,17 +98,32 @@ class xBinTableHDURoiTable(xBinTableHDUBase):
     ]
 
 
-class xMonteCarloEventList(dict):
+class xMonteCarloEventList:
 
     """Class describing a Monte Carlo event list.
+
+    The events are stored in a single numpy structured array, with one field
+    for each column of the EVENTS extension of the output files, and the
+    columns are accessed by name (e.g., `event_list['TIME']`) as views of the
+    underlying array. The array can be allocated with some spare capacity,
+    which grows geometrically when other event lists are appended, so that
+    the cost of building an event list piece by piece is linear in the total
+    number of events.
+
+    Arguments
+    ---------
+    capacity : int
+        The number of events to allocate the storage for.
     """
 
-    def __init__(self):
+    DTYPE = numpy.dtype([(name, FITS_TO_NUMPY_TYPE_DICT[dtype]) for\
+                         name, dtype in\
+                         xBinTableHDUMonteCarloEvents.spec_names_and_types()])
+
+    def __init__(self, capacity=0):
         """Constructor.
         """
-        for name, dtype in xBinTableHDUMonteCarloEvents.spec_names_and_types():
-            dtype = FITS_TO_NUMPY_TYPE_DICT[dtype]
-            self[name] = numpy.array([], dtype)
+        self.data = numpy.zeros(capacity, self.DTYPE)
         self.length = 0
 
     def __len__(self):
@@ -115,6 +131,40 @@ class xMonteCarloEventList(dict):
         """
         return self.length
 
+    def capacity(self):
+        """Return the number of events the event list can hold without
+        reallocating the underlying storage.
+        """
+        return len(self.data)
+
+    def reserve(self, capacity):
+        """Make sure that the event list can hold (at least) `capacity` events.
+
+        When a reallocation is needed, the capacity is (at least) doubled,
+        so that the amortized cost of appending events is constant.
+        """
+        if capacity <= self.capacity():
+            return
+        capacity = max(capacity, 2*self.capacity())
+        data = numpy.zeros(capacity, self.DTYPE)
+        data[:self.length] = self.data[:self.length]
+        self.data = data
+
+    def keys(self):
+        """Return the column names.
+        """
+        return list(self.DTYPE.names)
+
+    def __iter__(self):
+        """Iterate over the column names (much like a dictionary).
+        """
+        return iter(self.DTYPE.names)
+
+    def __getitem__(self, name):
+        """Return a given column (as a view on the underlying storage).
+        """
+        return self.data[name][:self.length]
+
     def set_column(self, name, data):
         """Set a column array.
 
@@ -125,33 +175,113 @@ class xMonteCarloEventList(dict):
 
         data : array or number
             The actual data to put in the column. (If `data` is a number,\
-            an array of the proper length is automatically created, assuming\
+            the column is filled with this value, assuming\
             that the `lenght` class member is defined.)
         """
-        assert self.has_key(name)
-        dtype = self[name].dtype
-        if isinstance(data, numbers.Number):
-            data = numpy.full(self.length, data, dtype)
-        if self.length > 0:
-            assert(len(data) == self.length)
-        else:
-            self.length = len(data)
-        self[name] = data
+        assert name in self.DTYPE.names
+        if not isinstance(data, numbers.Number):
+            if self.length > 0:
+                assert(len(data) == self.length)
+            else:
+                self.reserve(len(data))
+                self.length = len(data)
+        self.data[name][:self.length] = data
+
+    def __iadd__(self, other):
+        """Append another event list in place.
+        """
+        length = self.length + len(other)
+        self.reserve(length)
+        self.data[self.length:length] = other.data[:len(other)]
+        self.length = length
+        return self
 
     def __add__(self, other):
         """Concatenate two event lists.
         """
-        _list = xMonteCarloEventList()
-        for name in xBinTableHDUMonteCarloEvents.spec_names():
-            _list.set_column(name,numpy.append(self[name], other[name]))
+        _list = xMonteCarloEventList(len(self) + len(other))
+        _list += self
+        _list += other
+        return _list
+
+    @classmethod
+    def concatenate(cls, event_lists):
+        """Concatenate an iterable of event lists, in the order they come.
+
+        This is meant for event lists covering consecutive time intervals,
+        where the result is time-ordered with no need for sorting.
+        """
+        _list = cls()
+        for event_list in event_lists:
+            _list += event_list
+        return _list
+
+    @classmethod
+    def merge(cls, event_lists):
+        """Merge a sequence of time-ordered event lists into a single
+        time-ordered event list.
+
+        The lists are merged pairwise, in a balanced tree, so that each event
+        is moved log2(k) times for k input lists, with no global sort
+        involved. Events with the same time retain the order of the input
+        lists, i.e., the result is the same as a stable sort of the
+        concatenated lists.
+        """
+        event_lists = list(event_lists)
+        if len(event_lists) == 0:
+            return cls()
+        while len(event_lists) > 1:
+            _lists = []
+            for i in range(0, len(event_lists) - 1, 2):
+                _lists.append(cls.__merge_pair(*event_lists[i:i + 2]))
+            if len(event_lists) % 2:
+                _lists.append(event_lists[-1])
+            event_lists = _lists
+        return event_lists[0]
+
+    @classmethod
+    def __merge_pair(cls, first, second):
+        """Merge two time-ordered event lists.
+
+        The position of each event of the second list in the merged list
+        is its index, plus the number of events of the first list with a
+        time smaller or equal to its own. All the remaining slots are taken,
+        in order, by the events of the first list.
+        """
+        _list = cls(len(first) + len(second))
+        _list.length = len(first) + len(second)
+        _index = numpy.searchsorted(first['TIME'], second['TIME'],
+                                    side='right')
+        _index += numpy.arange(len(second))
+        _mask = numpy.ones(_list.length, bool)
+        _mask[_index] = False
+        _list.data[_index] = second.data[:len(second)]
+        _list.data[_mask] = first.data[:len(first)]
         return _list
 
     def sort(self):
         """Sort the event list based on the event time.
         """
-        _index = numpy.argsort(self['TIME'])
-        for name in xBinTableHDUMonteCarloEvents.spec_names():
-            self.set_column(name, self[name][_index])
+        _index = numpy.argsort(self['TIME'], kind='mergesort')
+        self.data[:self.length] = self.data[:self.length][_index]
+
+    def write_chunk(self, file_path):
+        """Write the event list to a (temporary) binary numpy .npy file.
+
+        This is used to pass around the partial event lists (e.g., for
+        different time slices) without going through FITS.
+        """
+        numpy.save(file_path, self.data[:self.length])
+
+    @classmethod
+    def read_chunk(cls, file_path):
+        """Read an event list written with `write_chunk()`.
+        """
+        event_list = cls()
+        event_list.data = numpy.load(file_path)
+        assert event_list.data.dtype == cls.DTYPE
+        event_list.length = len(event_list.data)
+        return event_list
 
     def write_fits(self, file_path, simulation_info):
         """Write the event list and associated ancillary information to file.
@@ -164,42 +294,101 @@ class xMonteCarloEventList(dict):
         simulation_info :
             A generic container with all the relevant information about the
             simulation.
+        """
+        writer = xMonteCarloEventFileWriter(file_path, simulation_info)
+        writer.write(self)
+        writer.close()
+
+
+class xMonteCarloEventFileWriter:
+
+    """Streaming writer for the Monte Carlo event files.
+
+    The event lists passed to write() are appended to the EVENTS extension
+    as they come, so that arbitrarily long simulations can be written in
+    constant memory, provided that they are generated in chunks (e.g., in
+    consecutive time slices). The GTI and ROITABLE extensions are written
+    when the writer is closed.
+
+    Arguments
+    ---------
+    file_path : str
+        The path to the output file.
+
+    simulation_info :
+        A generic container with all the relevant information about the
+        simulation.
+
+    threaded : bool
+        If True, the event data are written to disk in a background thread.
+
+    Warning
+    -------
+    The information about the detector and telescope should be in the
+    primary header of the IRF tables, and that's where we should be
+    retrieving it from. (See issue #49.)
+    """
 
-        Warning
-        -------
-        The information about the detector and telescope should be in the
-        primary header of the IRF tables, and that's where we should be
-        retrieving it from. (See issue #49.)
+    def __init__(self, file_path, simulation_info, threaded=False):
+        """Constructor.
         """
-        primary_hdu = xPrimaryHDU()
+        self.file_path = file_path
+        self.simulation_info = simulation_info
         roi_model = simulation_info.roi_model
-        irf_name = simulation_info.irf_name
         ebounds_header = simulation_info.edisp.hdu_list['EBOUNDS'].header
-        gti_list = simulation_info.gti_list
         keywords = [
             ('ROIRA'   , roi_model.ra , 'right ascension of the ROI center'),
             ('ROIDEC'  , roi_model.dec, 'declination of the ROI center'),
             ('EQUINOX' , 2000.        , 'equinox for RA and DEC'),
-            ('IRFNAME' , irf_name     , 'name of the IRFs used for the MC'),
+            ('IRFNAME' , simulation_info.irf_name,
+             'name of the IRFs used for the MC'),
             ('TELESCOP', ebounds_header['TELESCOP']),
             ('INSTRUME', ebounds_header['INSTRUME']),
             ('DETNAM'  , ebounds_header['DETNAM']),
             ('DETCHANS', ebounds_header['DETCHANS'])
         ]
+        primary_hdu = xPrimaryHDU()
         primary_hdu.setup_header(keywords)
-        data = [self[name] for name in\
+        self.file_obj = open(file_path, 'wb')
+        write_header(self.file_obj, primary_hdu.header)
+        self.event_writer = xBinTableStreamWriter(self.file_obj,
+                                                  xBinTableHDUMonteCarloEvents(),
+                                                  threaded)
+
+    def write(self, event_list):
+        """Append an event list to the EVENTS extension.
+
+        Note that the event lists are expected to come in time order.
+        """
+        data = [event_list[name] for name in\
                 xBinTableHDUMonteCarloEvents.spec_names()]
-        event_hdu = xBinTableHDUMonteCarloEvents(data)
-        _start = numpy.array([gti[0] for gti in gti_list])
-        _stop = numpy.array([gti[1] for gti in gti_list])
-        gti_hdu = xBinTableHDUGTI([_start, _stop])
-        _src_id = numpy.array([src.identifier for src in roi_model.values()])
-        _src_name = numpy.array([src.name for src in roi_model.values()])
-        roi_hdu = xBinTableHDURoiTable([_src_id, _src_name])
-        hdu_list = fits.HDUList([primary_hdu, event_hdu, gti_hdu, roi_hdu])
-        hdu_list.info()
-        hdu_list.writeto(file_path, clobber=True)
-        logger.info('Event list written to %s...' % file_path)
+        self.event_writer.write(data)
+
+    def __write_table(self, table_hdu, data):
+        """Write a (small) binary table extension in one go.
+        """
+        writer = xBinTableStreamWriter(self.file_obj, table_hdu)
+        writer.write(data)
+        writer.close()
+
+    def close(self):
+        """Finalize the EVENTS extension, write the GTI and ROITABLE
+        extensions and close the output file.
+        """
+        try:
+            self.event_writer.close()
+            gti_list = self.simulation_info.gti_list
+            _start = numpy.array([gti[0] for gti in gti_list])
+            _stop = numpy.array([gti[1] for gti in gti_list])
+            self.__write_table(xBinTableHDUGTI(), [_start, _stop])
+            roi_model = self.simulation_info.roi_model
+            _src_id = numpy.array([src.identifier for src in roi_model.values()])
+            _src_name = numpy.array([src.name for src in roi_model.values()])
+            self.__write_table(xBinTableHDURoiTable(), [_src_id, _src_name])
+        finally:
+            self.file_obj.close()
+        logger.info('%d events written to %s...' %\
+                    (self.event_writer.num_rows, self.file_path))
 
 
 class xEventFile:
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU GengReral Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Unbinned polarization analysis based on the Stokes parameters.
+"""
+
+import numpy
+
+from ximpol.utils.logging_ import logger
+from ximpol.evt.event import xEventFile
+
+
+class xStokesAccumulator:
+
+    """Mergeable accumulator for the unbinned (event-by-event) Stokes
+    parameter analysis of the azimuthal angle distribution.
+
+    For each event with photoelectron emission angle :math:`\\phi_k` and
+    modulation factor :math:`\\mu_k` (evaluated at the event energy) we
+    define the normalized Stokes parameters
+
+    .. math::
+        q_k = \\frac{2\\cos(2\\phi_k)}{\\mu_k}, \\quad
+        u_k = \\frac{2\\sin(2\\phi_k)}{\\mu_k},
+
+    whose averages over the event sample are unbiased estimators of
+    :math:`P \\cos(2\\psi)` and :math:`P \\sin(2\\psi)`, P and
+    :math:`\\psi` being the polarization degree and angle.
+
+    The accumulator only keeps track of a handful of sums for each bin
+    (number of events and sums of q, u, q^2, u^2, qu, 1/mu^2, mu and energy),
+    so that it can be filled with any number of chunks of events, and
+    accumulators filled with different chunks can be merged with the +
+    operator. The bin to which each event belongs is arbitrary (energy, time,
+    pulse phase or any other selection), and all the bins are filled at once
+    with `numpy.bincount()`.
+
+    Arguments
+    ---------
+    num_bins : int
+        The number of bins of the accumulator.
+    """
+
+    FIELDS = ['n', 'q', 'u', 'qq', 'uu', 'qu', 'inv_mu2', 'mu', 'energy']
+
+    def __init__(self, num_bins=1):
+        """Constructor.
+        """
+        self.num_bins = num_bins
+        for field in self.FIELDS:
+            setattr(self, field, numpy.zeros(num_bins))
+
+    def fill(self, phi, mu, energy=None, index=None):
+        """Fill the accumulator with a set of events.
+
+        Arguments
+        ---------
+        phi : array
+            The photoelectron emission angles (in radians).
+
+        mu : array
+            The modulation factor for each event.
+
+        energy : array, optional
+            The event energies (only used to calculate the average energy in
+            each bin).
+
+        index : array of int, optional
+            The bin index for each event (if None, all the events are assigned
+            to the first bin). Events with index outside the [0, num_bins)
+            range are ignored.
+        """
+        phi = numpy.asarray(phi, dtype=float)
+        mu = numpy.asarray(mu, dtype=float)*numpy.ones(phi.shape)
+        if energy is None:
+            energy = numpy.zeros(phi.shape)
+        if index is None:
+            index = numpy.zeros(phi.shape, dtype=int)
+        _mask = (index >= 0)*(index < self.num_bins)
+        if not _mask.all():
+            phi, mu, energy, index = phi[_mask], mu[_mask], energy[_mask],\
+                                     index[_mask]
+        _q = 2.*numpy.cos(2.*phi)/mu
+        _u = 2.*numpy.sin(2.*phi)/mu
+        _weights = {
+            'n': None,
+            'q': _q,
+            'u': _u,
+            'qq': _q**2,
+            'uu': _u**2,
+            'qu': _q*_u,
+            'inv_mu2': 1./mu**2,
+            'mu': mu,
+            'energy': energy
+        }
+        for field in self.FIELDS:
+            _sum = numpy.bincount(index, _weights[field], self.num_bins)
+            setattr(self, field, getattr(self, field) + _sum)
+
+    def __iadd__(self, other):
+        """Merge another accumulator into this one.
+        """
+        assert(self.num_bins == other.num_bins)
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    def __add__(self, other):
+        """Return the merge of two accumulators.
+        """
+        accumulator = xStokesAccumulator(self.num_bins)
+        accumulator += self
+        accumulator += other
+        return accumulator
+
+    def counts(self):
+        """Return the number of events in each bin.
+        """
+        return self.n
+
+    def __average(self, values):
+        """Return the average of a sum over the number of events in each bin
+        (nan for empty bins).
+        """
+        _n = numpy.where(self.n > 0, self.n, numpy.nan)
+        return values/_n
+
+    def emean(self):
+        """Return the average energy in each bin.
+        """
+        return self.__average(self.energy)
+
+    def effective_mu(self):
+        """Return the average modulation factor in each bin.
+        """
+        return self.__average(self.mu)
+
+    def stokes(self):
+        """Return the normalized Stokes parameters (Q, U) in each bin.
+        """
+        return self.__average(self.q), self.__average(self.u)
+
+    def stokes_covariance(self):
+        """Return the variances of the normalized Stokes parameters and
+        their covariance, (var_Q, var_U, cov_QU), in each bin.
+        """
+        _Q, _U = self.stokes()
+        _var_q = (self.__average(self.qq) - _Q**2)/self.n
+        _var_u = (self.__average(self.uu) - _U**2)/self.n
+        _cov_qu = (self.__average(self.qu) - _Q*_U)/self.n
+        return _var_q, _var_u, _cov_qu
+
+    def polarization_degree(self):
+        """Return the polarization degree in each bin.
+        """
+        _Q, _U = self.stokes()
+        return numpy.sqrt(_Q**2 + _U**2)
+
+    def polarization_degree_error(self):
+        """Return the error on the polarization degree in each bin.
+        """
+        _Q, _U = self.stokes()
+        _var_q, _var_u, _cov_qu = self.stokes_covariance()
+        _P2 = _Q**2 + _U**2
+        return numpy.sqrt((_Q**2*_var_q + _U**2*_var_u + 2*_Q*_U*_cov_qu)/_P2)
+
+    def polarization_angle(self):
+        """Return the polarization angle (in radians) in each bin.
+        """
+        _Q, _U = self.stokes()
+        return 0.5*numpy.arctan2(_U, _Q)
+
+    def polarization_angle_error(self):
+        """Return the error on the polarization angle (in radians) in each
+        bin.
+        """
+        _Q, _U = self.stokes()
+        _var_q, _var_u, _cov_qu = self.stokes_covariance()
+        _P2 = _Q**2 + _U**2
+        return 0.5*numpy.sqrt(_U**2*_var_q + _Q**2*_var_u -\
+                              2*_Q*_U*_cov_qu)/_P2
+
+    def mdp99(self):
+        """Return the minimum detectable polarization at the 99% confidence
+        level in each bin.
+
+        This is calculated as
+
+        .. math::
+            \\text{MDP}_{99} = 4.292 \\sqrt{\\frac{\\left<1/\\mu^2\\right>}{N}},
+
+        which reduces to the usual expression (see
+        `ximpol.irf.mrf.mdp99()`) for a constant modulation factor.
+        """
+        return 4.292*numpy.sqrt(self.__average(self.inv_mu2)/self.n)
+
+    def __str__(self):
+        """String formatting.
+        """
+        text = ''
+        for i in range(self.num_bins):
+            text += 'Bin %d: %d counts, <E> = %.3f keV, ' %\
+                    (i, self.n[i], self.emean()[i])
+            text += 'PD = %.4f +- %.4f, PA = %.2f +- %.2f deg, ' %\
+                    (self.polarization_degree()[i],
+                     self.polarization_degree_error()[i],
+                     numpy.degrees(self.polarization_angle()[i]),
+                     numpy.degrees(self.polarization_angle_error()[i]))
+            text += 'MDP99 = %.4f\n' % self.mdp99()[i]
+        return text.strip('\n')
+
+
+def stokes_analysis(file_path, binning, column='ENERGY', mc=False,
+                    modf=None):
+    """Run the unbinned Stokes analysis on an event file in a single pass
+    over the event columns, without writing any intermediate binned file.
+
+    Arguments
+    ---------
+    file_path : str
+        The path to the input event file.
+
+    binning : array
+        The bin edges for the column to be used for the binning.
+
+    column : str
+        The name of the column to be used for the binning (e.g., 'ENERGY',\
+        'TIME' or 'PHASE').
+
+    mc : bool
+        If True, the Monte Carlo energy is used to evaluate the modulation\
+        factor (and for the binning, if column is 'ENERGY').
+
+    modf : xModulationFactor object, optional
+        The modulation factor (if None, it is loaded based on the name of\
+        the IRFs in the event file).
+    """
+    event_file = xEventFile(file_path)
+    event_data = event_file.event_data
+    if modf is None:
+        from ximpol.irf import load_mrf
+        modf = load_mrf(event_file.irf_name())
+    if mc:
+        energy = event_data['MC_ENERGY']
+        if column == 'ENERGY':
+            column = 'MC_ENERGY'
+    else:
+        energy = event_data['ENERGY']
+    index = numpy.searchsorted(binning, event_data[column], side='right') - 1
+    # Events falling on the last bin edge belong to the last bin.
+    index[event_data[column] == binning[-1]] = len(binning) - 2
+    logger.info('Accumulating Stokes parameters for %d events...' %\
+                len(energy))
+    accumulator = xStokesAccumulator(len(binning) - 1)
+    accumulator.fill(event_data['PE_ANGLE'], modf(energy), energy, index)
+    logger.info(accumulator)
+    return accumulator
@@ -38,36 +38,118 @@ def irf_file_path(irf_name, irf_type, folder_path=None, check_file=True):
         check_input_file(file_path, irf_type)
     return file_path
 
+"""Registry of the IRF objects loaded so far.
+
+The objects are indexed by the full path (and modification time) of the
+underlying file, so that each IRF file is read and processed at most once per
+process, no matter how many times (and by whom) it is requested.
+"""
+IRF_REGISTRY = {}
+
+IRF_CLASSES = {
+    'arf': xEffectiveArea,
+    'psf': xPointSpreadFunction,
+    'mrf': xModulationFactor,
+    'rmf': xEnergyDispersion
+}
+
+def load_irf(irf_name, irf_type, folder_path=None):
+    """Load a given IRF component, or retrieve it from the registry if it has
+    already been loaded.
+
+    Arguments
+    ---------
+    irf_name : str
+        The name of the IRF set (e.g., 'xipe_baseline').
+
+    irf_type : str
+        The IRF type (one of 'arf', 'psf', 'mrf' or 'rmf').
+
+    folder_path : str
+        The path to the folder containing the IRF files (if None, the
+        default ximpol IRF folder is used).
+    """
+    file_path = irf_file_path(irf_name, irf_type, folder_path, check_file=True)
+    file_path = os.path.abspath(file_path)
+    key = (file_path, os.path.getmtime(file_path))
+    if key not in IRF_REGISTRY:
+        IRF_REGISTRY[key] = IRF_CLASSES[irf_type](file_path)
+    else:
+        logger.info('Reusing %s from the IRF registry...' % file_path)
+    return IRF_REGISTRY[key]
+
+def clear_irf_registry():
+    """Remove all the IRF objects from the registry.
+    """
+    IRF_REGISTRY.clear()
+
 def load_arf(irf_name, folder_path=None):
     """Facility to load the effective area for a given IRF set.
     """
-    file_path = irf_file_path(irf_name, 'arf', folder_path, check_file=True)
-    return xEffectiveArea(file_path)
+    return load_irf(irf_name, 'arf', folder_path)
 
 def load_psf(irf_name, folder_path=None):
     """Facility to load the point-spread function for a given IRF set.
     """
-    file_path = irf_file_path(irf_name, 'psf', folder_path, check_file=True)
-    return xPointSpreadFunction(file_path)
+    return load_irf(irf_name, 'psf', folder_path)
 
 def load_mrf(irf_name, folder_path=None):
     """Facility to load the modulation factor for a given IRF set.
     """
-    file_path = irf_file_path(irf_name, 'mrf', folder_path, check_file=True)
-    return xModulationFactor(file_path)
+    return load_irf(irf_name, 'mrf', folder_path)
 
 def load_rmf(irf_name, folder_path=None):
     """Facility to load the energy dispersion for a given IRF set.
     """
-    file_path = irf_file_path(irf_name, 'rmf', folder_path, check_file=True)
-    return xEnergyDispersion(file_path)
+    return load_irf(irf_name, 'rmf', folder_path)
+
+
+class xIrfSet:
+
+    """Lazy container for a full set of instrument response functions.
+
+    Each component (aeff, psf, modf and edisp) is only loaded (through the
+    IRF registry) the first time it is accessed.
+
+    Arguments
+    ---------
+    irf_name : str
+        The name of the IRF set (e.g., 'xipe_baseline').
+
+    folder_path : str
+        The path to the folder containing the IRF files (if None, the
+        default ximpol IRF folder is used).
+    """
+
+    IRF_TYPES = {
+        'aeff': 'arf',
+        'psf': 'psf',
+        'modf': 'mrf',
+        'edisp': 'rmf'
+    }
+
+    def __init__(self, irf_name, folder_path=None):
+        """Constructor.
+        """
+        self.irf_name = irf_name
+        self.folder_path = folder_path
+
+    def __getattr__(self, name):
+        """Load the IRF components on demand.
+
+        Note this is only called when the attribute is not found the usual
+        way, i.e., the first time each component is accessed.
+        """
+        if name not in self.IRF_TYPES:
+            raise AttributeError(name)
+        irf = load_irf(self.irf_name, self.IRF_TYPES[name], self.folder_path)
+        setattr(self, name, irf)
+        return irf
+
 
 def load_irfs(irf_name, folder_path=None):
     """Facility to load all the instrument response functions corresponding
     to a given set.
     """
-    aeff = load_arf(irf_name, folder_path)
-    psf = load_psf(irf_name, folder_path)
-    modf = load_mrf(irf_name, folder_path)
-    edisp = load_rmf(irf_name, folder_path)
-    return aeff, psf, modf, edisp
+    irfs = xIrfSet(irf_name, folder_path)
+    return irfs.aeff, irfs.psf, irfs.modf, irfs.edisp
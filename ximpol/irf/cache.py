@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU GengReral Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Persistent on-disk cache for the tables derived from the IRF files.
+
+The tables are stored as plain .npy files (so that they can be memory-mapped
+at load time) in a folder whose name is a content-addressed key, built from
+the checksum of the underlying IRF file, the ximpol version and a label
+identifying the specific table set. Any change to the IRF file or to the
+code version automatically results in a new key, so that stale tables are
+never picked up.
+"""
+
+
+import os
+import shutil
+import hashlib
+import numpy
+
+import ximpol
+from ximpol.__version__ import TAG
+from ximpol.utils.logging_ import logger
+
+
+def file_checksum(file_path, block_size=1048576):
+    """Return the sha1 checksum of the content of a file.
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as input_file:
+        block = input_file.read(block_size)
+        while block:
+            sha1.update(block)
+            block = input_file.read(block_size)
+    return sha1.hexdigest()
+
+
+def cache_key(file_path, label):
+    """Return the cache key for a set of tables derived from a given file.
+
+    Arguments
+    ---------
+    file_path : str
+        The path to the IRF file the tables are derived from.
+
+    label : str
+        A label identifying the table set (this should be changed whenever
+        the code generating the tables changes).
+    """
+    text = '%s-%s-%s' % (file_checksum(file_path), TAG, label)
+    return '%s_%s' % (label, hashlib.sha1(text.encode('utf-8')).hexdigest())
+
+
+def cache_folder():
+    """Return the path to the cache folder.
+
+    This is resolved at call time, so that the XIMPOL_CACHE environment
+    variable (or, if that is not set, the ximpol.XIMPOL_CACHE module
+    attribute) can be changed after the package has been imported.
+    """
+    return os.environ.get('XIMPOL_CACHE', ximpol.XIMPOL_CACHE)
+
+
+def load_tables(key, folder_path=None):
+    """Load a set of tables from the cache.
+
+    The arrays are memory-mapped in read-only mode. Return a dictionary
+    of arrays indexed by name, or None if the key is not in the cache.
+    Entries that cannot be read back (e.g., truncated files) are removed
+    and treated as a cache miss.
+    """
+    if folder_path is None:
+        folder_path = cache_folder()
+    if not folder_path:
+        return None
+    dir_path = os.path.join(folder_path, key)
+    if not os.path.isdir(dir_path):
+        return None
+    tables = {}
+    try:
+        for file_name in os.listdir(dir_path):
+            if file_name.endswith('.npy'):
+                name = file_name[:-4]
+                tables[name] = numpy.load(os.path.join(dir_path, file_name),
+                                          mmap_mode='r')
+    except (ValueError, IOError, OSError, EOFError) as e:
+        logger.warning('Corrupted IRF cache entry %s (%s), removing it.' %\
+                       (dir_path, e))
+        shutil.rmtree(dir_path, ignore_errors=True)
+        return None
+    return tables
+
+
+def save_tables(key, tables, folder_path=None):
+    """Save a set of tables to the cache.
+
+    The arrays are written to a temporary folder which is then atomically
+    renamed, so that concurrent processes never see partial entries. Any
+    failure (e.g., a read-only file system) is logged and otherwise ignored.
+    """
+    if folder_path is None:
+        folder_path = cache_folder()
+    if not folder_path:
+        return
+    dir_path = os.path.join(folder_path, key)
+    tmp_path = '%s.tmp%d' % (dir_path, os.getpid())
+    try:
+        if not os.path.exists(tmp_path):
+            os.makedirs(tmp_path)
+        for name, array in tables.items():
+            numpy.save(os.path.join(tmp_path, '%s.npy' % name), array)
+        os.rename(tmp_path, dir_path)
+        logger.info('IRF tables cached in %s.' % dir_path)
+    except (IOError, OSError) as e:
+        # Either the cache is not writable, or another process got there
+        # first---in both cases we just move on.
+        logger.warning('Could not cache IRF tables (%s).' % e)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def cached_tables(file_path, label, builder, folder_path=None):
+    """Return a set of tables derived from a given file, either from the cache
+    or by calling the builder function (in which case the tables are also
+    written to the cache).
+
+    Arguments
+    ---------
+    file_path : str
+        The path to the IRF file the tables are derived from.
+
+    label : str
+        A label identifying the table set.
+
+    builder : callable
+        A function, with no arguments, returning a dictionary of arrays.
+
+    folder_path : str
+        The path to the cache folder (if None, the folder returned by
+        cache_folder() is used; if empty, the cache is bypassed altogether).
+    """
+    if folder_path is None:
+        folder_path = cache_folder()
+    if not folder_path:
+        return builder()
+    key = cache_key(file_path, label)
+    tables = load_tables(key, folder_path)
+    if tables is not None:
+        logger.info('IRF tables loaded from cache (%s).' % key)
+        return tables
+    tables = builder()
+    save_tables(key, tables, folder_path)
+    return tables
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU GengReral Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Forward-folding of source models through the instrument response.
+"""
+
+
+import numpy
+from scipy import sparse
+
+from ximpol.core.spline import cumulative_trapz, meshgrid_eval
+from ximpol.irf.mrf import mdp99
+from ximpol.srcmodel.spectrum import is_time_independent
+
+
+class xForwardFolder:
+
+    """Forward-folding engine, calculating the expected counts for a given
+    source spectrum without generating any event.
+
+    The product of the effective area and the energy dispersion is stored as
+    a sparse matrix, with one row for each bin of true energy of the
+    response matrix and one column for each channel, with elements
+
+    .. math::
+        R_{ij} = A_{\\rm eff}(E_i) \\Delta E_i P(c_j | E_i)
+        \\quad [\\text{cm}^2~\\text{keV}],
+
+    :math:`P(c_j | E_i)` being the (normalized) probability for a photon in
+    the i-th true energy bin to end up in the j-th channel. The expected
+    counts in channel space are then given by the product of the transpose
+    of the response with the photon spectrum (integrated over the desired
+    time or phase interval) evaluated at the centers of the true energy bins.
+
+    Arguments
+    ---------
+    aeff : :py:class:`ximpol.irf.arf.xEffectiveArea` object.
+        The effective area.
+
+    edisp : :py:class:`ximpol.irf.rmf.xEnergyDispersion` object.
+        The energy dispersion.
+
+    modf : :py:class:`ximpol.irf.mrf.xModulationFactor` object, optional
+        The modulation factor (needed for the modulation-weighted counts and
+        the MDP).
+    """
+
+    def __init__(self, aeff, edisp, modf=None):
+        """Constructor.
+        """
+        sampler = edisp.matrix.sampler
+        self.modf = modf
+        self.energy_lo = sampler.energy_lo
+        self.energy_hi = sampler.energy_hi
+        self.energy = 0.5*(self.energy_lo + self.energy_hi)
+        self.energy_width = self.energy_hi - self.energy_lo
+        self.channel_energy = edisp.ebounds.channel_energy
+        num_chans = len(self.channel_energy)
+        self.exposure = numpy.clip(aeff(self.energy), 0., None)*\
+                        self.energy_width
+        _row = numpy.repeat(numpy.arange(sampler.num_rows()), sampler.row_size)
+        _data = sampler.probabilities()*self.exposure[_row]
+        _chans = sampler.channels - sampler.first_channel
+        self.response = sparse.csr_matrix((_data, _chans, sampler.row_start),
+                                          shape=(sampler.num_rows(), num_chans))
+
+    def photon_spectrum(self, energy_spectrum, t, tmin=None, tmax=None,
+                        scale=1.):
+        """Return the photon spectrum, integrated over a given time (or phase)
+        interval, at the centers of the true energy bins.
+
+        Arguments
+        ---------
+        energy_spectrum : callable
+            The source spectrum, with signature `energy_spectrum(E, t)`
+            (E and t are passed as broadcastable two-dimensional arrays,
+            see `ximpol.core.spline.meshgrid_eval()`).
+
+        t : array
+            The grid of time (or phase) values used for the integration.
+
+        tmin : float, optional
+            The minimum time (or phase) of the integration interval.
+
+        tmax : float, optional
+            The maximum time (or phase) of the integration interval.
+
+        scale : float
+            An overall scale factor (e.g., the number of periods, when
+            integrating over the phase of a periodic source).
+        """
+        t = numpy.asarray(t, dtype=float)
+        if tmin is None:
+            tmin = t[0]
+        if tmax is None:
+            tmax = t[-1]
+        _mask = (t > tmin)*(t < tmax)
+        t = numpy.concatenate(([tmin], t[_mask], [tmax]))
+        if is_time_independent(energy_spectrum, self.energy, t):
+            # Time-independent spectrum: evaluate on the energy grid only.
+            _S = meshgrid_eval(energy_spectrum, self.energy, t[:1])
+            return scale*(tmax - tmin)*_S[0]
+        _S = meshgrid_eval(energy_spectrum, self.energy, t)
+        return scale*cumulative_trapz(t, _S.transpose())[:, -1]
+
+    def true_counts(self, energy_spectrum, t, tmin=None, tmax=None,
+                    scale=1.):
+        """Return the expected counts in each bin of true energy.
+
+        See `photon_spectrum()` for the meaning of the arguments.
+        """
+        _S = self.photon_spectrum(energy_spectrum, t, tmin, tmax, scale)
+        return _S*self.exposure
+
+    def channel_counts(self, energy_spectrum, t, tmin=None, tmax=None,
+                       scale=1.):
+        """Return the expected counts in each channel (i.e., the expected
+        PHA spectrum).
+
+        See `photon_spectrum()` for the meaning of the arguments.
+        """
+        _S = self.photon_spectrum(energy_spectrum, t, tmin, tmax, scale)
+        return self.response.transpose().dot(_S)
+
+    def binned_counts(self, energy_spectrum, t, ebinning, tmin=None,
+                      tmax=None, scale=1., mc=False):
+        """Return the expected counts and the average modulation factor in
+        a set of energy bins.
+
+        Arguments
+        ---------
+        ebinning : array
+            The bin edges in (reconstructed) energy.
+
+        mc : bool
+            If True, the counts are binned in true energy (this is the
+            equivalent of using the MC_ENERGY column in the event binning).
+
+        See `photon_spectrum()` for the meaning of the other arguments.
+        """
+        if mc:
+            _energy = self.energy
+            _counts = self.true_counts(energy_spectrum, t, tmin, tmax, scale)
+        else:
+            _energy = self.channel_energy
+            _counts = self.channel_counts(energy_spectrum, t, tmin, tmax,
+                                          scale)
+        _index = numpy.searchsorted(ebinning, _energy, side='right') - 1
+        _mask = (_index >= 0)*(_index < len(ebinning) - 1)
+        _index = _index[_mask]
+        num_bins = len(ebinning) - 1
+        counts = numpy.bincount(_index, _counts[_mask], num_bins)
+        if self.modf is None:
+            return counts, None
+        _mu = self.modf(_energy[_mask])
+        effective_mu = numpy.bincount(_index, _counts[_mask]*_mu,
+                                      num_bins)/counts
+        return counts, effective_mu
+
+    def mdp99(self, energy_spectrum, t, ebinning, tmin=None, tmax=None,
+              scale=1., mc=False):
+        """Return the expected counts, the average modulation factor and the
+        MDP at the 99% confidence level in a set of energy bins.
+
+        See `binned_counts()` for the meaning of the arguments.
+        """
+        assert self.modf is not None
+        counts, effective_mu = self.binned_counts(energy_spectrum, t,
+                                                  ebinning, tmin, tmax,
+                                                  scale, mc)
+        return counts, effective_mu, mdp99(effective_mu, counts)
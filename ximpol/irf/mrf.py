@@ -31,7 +31,7 @@ from ximpol.core.spline import optimize_grid_linear
 def mdp99(eff_mu, num_sig, num_bkg=0.):
     """Return the MDP at the 99% confidence level.
     """
-    assert num_sig > 0
+    assert numpy.all(num_sig > 0)
     return 4.292/eff_mu*numpy.sqrt(num_sig + num_bkg)/num_sig
 
 
@@ -105,8 +105,14 @@ class xAzimuthalResponseGenerator(xUnivariateAuxGenerator):
         \\text{cdf}(\\phi) = \\frac{1}{2\\pi} \\left(
         \\phi + \\frac{\\xi}{2}\\sin{(2\\phi)} \\right),
 
-    and it is unfortunate that it cannot be inverted, otherwise we would
-    have no need to interpolate for generating random numbers according to
+    and, while it cannot be inverted analytically, the pdf is the mixture of
+    a uniform distribution (with weight :math:`1 - \\xi`) and of a
+    :math:`\\cos^2(\\phi)/\\pi` distribution (with weight :math:`\\xi`),
+    and the latter can be sampled exactly as the azimuthal angle of a
+    two-dimensional vector whose components are distributed as a chi with
+    three degrees of freedom (with a random sign) and as a standard normal,
+    respectively. This is what the `rvs_phi()` method is doing, so that no
+    interpolation table is needed for generating random numbers according to
     this distribution.
 
     .. image:: ../figures/test_azimuthal_resp_cdf.png
@@ -115,7 +121,9 @@ class xAzimuthalResponseGenerator(xUnivariateAuxGenerator):
     `xUnivariateAuxGenerator` where the azimuthal angle is our
     random variable and the visbility is our auxiliary variable. For any given
     value of the visibility, a vertical slice is providing the corresponding
-    one-dimensional pdf.
+    one-dimensional pdf. (Note that the underlying table is only used for
+    plotting and by the `rvs()` method inherited from the base class, while
+    `rvs_phi()` is a class method that does not need any table.)
 
     .. image:: ../figures/test_azimuthal_resp_generator.png
 
@@ -179,20 +187,23 @@ class xAzimuthalResponseGenerator(xUnivariateAuxGenerator):
         visibility : float or array
             The visibility of the modulation, in [0--1].
 
-        Warning
-        -------
-        We could overload the build_vpppf method for the class using this,
-        since we have an analytic expression. (This function is effectively
-        not used at the moment.)
+        Note
+        ----
+        This function is not used for generating random numbers, see
+        `rvs_phi()`.
         """
         return (phi + 0.5*visibility*numpy.sin(2.*phi))/(2*numpy.pi)
 
-    def rvs_phi(self, visibility, phase):
+    @classmethod
+    def rvs_phi(cls, visibility, phase, rng=None):
         """Generate random variates for any visibility and phase values.
 
-        This is essentially calling the underlying xUnivariateAuxGenerator.rvs()
-        method passing the visibility array as an argument and adding the phase
-        array (modulo 2pi) to the output.
+        The azimuthal angles are extracted exactly, with no interpolation
+        table, as a mixture of a uniform distribution and a
+        :math:`\\cos^2(\\phi)/\\pi` distribution with weights
+        :math:`1 - \\xi` and :math:`\\xi`, respectively (a negative
+        visibility is equivalent to a positive one with the phase shifted by
+        pi/2). The phase is then added (modulo 2pi) to the output.
 
         Arguments
         ---------
@@ -203,8 +214,26 @@ class xAzimuthalResponseGenerator(xUnivariateAuxGenerator):
         phase : float or array
             The phase of the modulation. (This can either be a vector or an
             array of the same length as `visibility`.)
+
+        rng : random number generator, optional
+            See `ximpol.core.rand.random_generator()` (if None, the global
+            numpy random state is used).
         """
-        return numpy.mod(self.rvs(visibility) + phase, 2*numpy.pi)
+        if rng is None:
+            rng = numpy.random
+        visibility = numpy.asarray(visibility, dtype=float)
+        _size = visibility.size
+        _negative = visibility < 0.
+        if _negative.any():
+            visibility = abs(visibility)
+            phase = phase + 0.5*numpy.pi*_negative
+        phi = rng.uniform(0., 2*numpy.pi, _size)
+        _mask = rng.uniform(size=_size) < visibility
+        _num = _mask.sum()
+        _x = numpy.sqrt(rng.chisquare(3, _num))
+        _x *= numpy.where(rng.uniform(size=_num) < 0.5, -1., 1.)
+        phi[_mask] = numpy.arctan2(rng.normal(size=_num), _x)
+        return numpy.mod(phi + phase, 2*numpy.pi)
 
     @classmethod
     def fit_function(cls, phi, visibility, phase, normalization):
@@ -216,43 +245,101 @@ class xAzimuthalResponseGenerator(xUnivariateAuxGenerator):
     @classmethod
     def fit_histogram(cls, histogram, fit_normalization=False):
         """Fit an azimuthal histogram.
+
+        This is a thin wrapper around `fit_histograms()` for a single
+        histogram, in the form returned by `matplotlib.pyplot.hist()`.
         """
-        from scipy.optimize import curve_fit
         _y, binning, patches = histogram
-        _x = 0.5*(binning[1:] + binning[:-1])
-        norm = _y.sum()*(binning[1] - binning[0])
-        if not fit_normalization:
-            p0 = (0.5, 0.5)
-            # Wrap the fit function, keeping the normalization frozen.
-            def f(phi, visibility, phase):
-                return cls.fit_function(phi, visibility, phase, norm)
+        return cls.fit_histograms(_y, binning, fit_normalization)[0]
+
+    @classmethod
+    def fit_histograms(cls, counts, binning, fit_normalization=False):
+        """Fit a set of azimuthal histograms sharing the same binning (e.g.,
+        all the energy slices of a modulation cube) at once.
+
+        The modulation curve
+        :math:`A\\left[1 + \\xi\\cos(2(\\phi - \\phi_0))\\right]` is linear in
+        the parameters :math:`(A, C, S) = (A, A\\xi\\cos 2\\phi_0,
+        A\\xi\\sin 2\\phi_0)`, so the fit reduces to a weighted linear
+        least-squares problem (with the model integrated over each bin and
+        weights given by the inverse of the bin contents) which is solved
+        for all the histograms with a single stack of 3 x 3 linear systems.
+        The visibility, the phase (in [0, pi)) and the normalization, along
+        with their covariance matrix, are derived from (A, C, S) through
+        the standard linear error propagation.
+
+        Arguments
+        ---------
+        counts : array
+            The histogram contents, with shape (num_histograms, num_bins)
+            (a one-dimensional array is treated as a single histogram).
+
+        binning : array
+            The bin edges (num_bins + 1 values) along the azimuthal angle.
+
+        fit_normalization : bool
+            If False, the overall normalization is frozen to the total
+            number of counts in each histogram.
+
+        Returns
+        -------
+        A list of `xModulationFitResults` objects, one for each histogram.
+        """
+        counts = numpy.atleast_2d(numpy.asarray(counts, dtype=float))
+        binning = numpy.asarray(binning, dtype=float)
+        _width = numpy.diff(binning)
+        _span = binning[-1] - binning[0]
+        # Design matrix: the integrals of 1, cos(2phi) and sin(2phi) over
+        # each bin.
+        _sin = numpy.sin(2*binning)
+        _cos = numpy.cos(2*binning)
+        design = numpy.vstack((_width, 0.5*numpy.diff(_sin),
+                               -0.5*numpy.diff(_cos))).transpose()
+        weights = 1./numpy.maximum(counts, 1.)
+        if fit_normalization:
+            _X = design
+            _y = counts
         else:
-            p0 = (0.5, 0.5, norm)
-            f = cls.fit_function
-        popt, pcov = curve_fit(f, _x, _y, p0, numpy.sqrt(_y))
-        if not fit_normalization:
-            # Add back the normalization to the parameter vector and covariance
-            # matrix.
-            popt = numpy.concatenate((popt, numpy.array([norm])))
-            pcov = numpy.vstack((pcov, numpy.array([[0., 0.]])))
-            pcov = numpy.hstack((pcov, numpy.array([[0., 0., 0.]]).transpose()))
-        _xs = numpy.linspace(0, 2*numpy.pi, 250)
-        _ys = cls.fit_function(_xs, *popt)/(binning[1] - binning[0])
-        spline = xInterpolatedUnivariateSplineLinear(_xs, _ys)
-        mask = _y > 0.
-        obs = _y[mask]
-        exp = []
-        for _min, _max in zip(binning[:-1], binning[1:]):
-            exp.append(spline.integral(_min, _max))
-        exp = numpy.array(exp)[mask]
-        chisquare = ((exp - obs)**2/exp).sum()
-        # Horrible hack.
-        if popt[0] < 0.:
-            popt[0] = -popt[0]
-            popt[1] += 0.5*numpy.pi
-        if popt[1] < 0.:
-            popt[1] += numpy.pi
-        return xModulationFitResults(popt, pcov, chisquare, len(mask))
+            _A = counts.sum(axis=1)/_span
+            _X = design[:, 1:]
+            _y = counts - numpy.outer(_A, design[:, 0])
+        _alpha = numpy.einsum('rj,jk,jl->rkl', weights, _X, _X)
+        _beta = numpy.einsum('rj,jk,rj->rk', weights, _X, _y)
+        _cov = numpy.linalg.inv(_alpha)
+        _par = numpy.einsum('rkl,rl->rk', _cov, _beta)
+        if fit_normalization:
+            _A, _C, _S = _par.transpose()
+        else:
+            _C, _S = _par.transpose()
+            _cov = numpy.concatenate((numpy.zeros((len(counts), 1, 2)), _cov),
+                                     axis=1)
+            _cov = numpy.concatenate((numpy.zeros((len(counts), 3, 1)), _cov),
+                                     axis=2)
+        _R = numpy.sqrt(_C**2 + _S**2)
+        visibility = _R/_A
+        phase = numpy.mod(0.5*numpy.arctan2(_S, _C), numpy.pi)
+        # Keep the normalization convention of fit_function(), i.e., the
+        # model evaluated at the bin centers gives the counts per bin.
+        _scale = 2*numpy.pi*(binning[1] - binning[0])
+        normalization = _scale*_A
+        # Jacobian of (visibility, phase, normalization) w.r.t. (A, C, S).
+        jac = numpy.zeros((len(counts), 3, 3))
+        jac[:, 0, 0] = -_R/_A**2
+        jac[:, 0, 1] = _C/(_R*_A)
+        jac[:, 0, 2] = _S/(_R*_A)
+        jac[:, 1, 1] = -0.5*_S/_R**2
+        jac[:, 1, 2] = 0.5*_C/_R**2
+        jac[:, 2, 0] = _scale
+        pcov = numpy.einsum('rik,rkl,rjl->rij', jac, _cov, jac)
+        # Chisquare, with the model integrated over each bin.
+        exp = numpy.outer(_A, design[:, 0]) + numpy.outer(_C, design[:, 1]) +\
+              numpy.outer(_S, design[:, 2])
+        mask = counts > 0.
+        chisquare = numpy.where(mask, (exp - counts)**2/exp, 0.).sum(axis=1)
+        ndof = mask.sum(axis=1) - _X.shape[1]
+        popt = numpy.vstack((visibility, phase, normalization)).transpose()
+        return [xModulationFitResults(*args) for args in\
+                zip(popt, pcov, chisquare, ndof)]
 
 
 class xModulationFitResults:
@@ -359,12 +446,11 @@ class xModulationFactor(xInterpolatedUnivariateSplineLinear):
     More interestingly, it can generate random `phi` values, given a vector
     of event energies and corresponding vectors (or simple floats) representing
     the polarization degree and angle corresponding to the energies themselves.
-    Internally, any `xModulationFactor` has an `xAzimuthalResponseGenerator`
-    object and when the `xModulationFactor.rvs_phi()` method is called,
+    When the `xModulationFactor.rvs_phi()` method is called,
     the polarization degree is multiplied by the modulation factor of the
     detector, evaluated at the right energy, and converted into a visibility
-    value, after which the underlying `xAzimuthalResponseGenerator.rvs_phi()`
-    is called.
+    value, after which the `xAzimuthalResponseGenerator.rvs_phi()` class
+    method is called.
 
     Example
     -------
@@ -394,9 +480,9 @@ class xModulationFactor(xInterpolatedUnivariateSplineLinear):
         fmt = dict(xname='Energy', xunits='keV', yname='Modulation factor',
                    optimize=True, tolerance=1e-4)
         xInterpolatedUnivariateSplineLinear.__init__(self, _x, _y, **fmt)
-        self.generator = xAzimuthalResponseGenerator()
 
-    def rvs_phi(self, energy, polarization_degree, polarization_angle):
+    def rvs_phi(self, energy, polarization_degree, polarization_angle,
+                rng=None):
         """Return random variates for a given array of values of energy,
         polarization degree and polarization angle.
 
@@ -413,9 +499,19 @@ class xModulationFactor(xInterpolatedUnivariateSplineLinear):
         polarization_angle : array or float
             The polarization angle, in radians. (This can either be a vector or
             an array of the same length as `energy`.)
+
+        rng : random number generator, optional
+            See `ximpol.core.rand.random_generator()` (if None, the global
+            numpy random state is used).
         """
+        if numpy.isscalar(polarization_degree) and polarization_degree == 0:
+            # Unpolarized radiation: no need to evaluate the modulation factor.
+            if rng is None:
+                rng = numpy.random
+            return rng.uniform(0., 2*numpy.pi, len(energy))
         visibility = self(energy)*polarization_degree
-        return self.generator.rvs_phi(visibility, polarization_angle)
+        return xAzimuthalResponseGenerator.rvs_phi(visibility,
+                                                   polarization_angle, rng)
 
     def weighted_average(self, energy):
         """Return the weighted average of the mudulation factor given an
@@ -444,8 +540,9 @@ def main():
     x = numpy.linspace(1, 10, 10)
     print(modf(x))
     modf.plot(overlay=True)
-    modf.generator.plot()
-    modf.generator.slice(0.5).plot()
+    generator = xAzimuthalResponseGenerator()
+    generator.plot()
+    generator.slice(0.5).plot()
 
 
 if __name__ == '__main__':
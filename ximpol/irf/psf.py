@@ -101,26 +101,31 @@ class xPointSpreadFunction(xUnivariateGenerator):
         xUnivariateGenerator.plot(self, num_points, overlay, logx, logy,
                                   show=show)
 
-    def delta(self, size=1):
+    def delta(self, size=1, rng=None):
         """Return an array of random offset (in ra, dec or L, B) due to the PSF.
 
         Note the output is converted in degrees.
+
+        (See `ximpol.core.rand.random_generator()` for the meaning of the `rng`
+        argument.)
         """
-        rho = self.rvs(size)/3600.
-        phi = numpy.random.uniform(0, 2*numpy.pi, size)
+        if rng is None:
+            rng = numpy.random
+        rho = self.rvs(size, rng)/3600.
+        phi = rng.uniform(0, 2*numpy.pi, size)
         return rho*numpy.cos(phi), rho*numpy.sin(phi)
 
-    def smear_single(self, ra, dec, num_times=1):
+    def smear_single(self, ra, dec, num_times=1, rng=None):
         """Smear a pair of coordinates for an arbitrary number of times.
         """
-        delta_ra, delta_dec = self.delta(size=num_times)
+        delta_ra, delta_dec = self.delta(num_times, rng)
         return ra + delta_ra/numpy.cos(numpy.radians(dec)), dec + delta_dec
 
-    def smear(self, ra, dec):
+    def smear(self, ra, dec, rng=None):
         """Smear a pair of arrays of coordinates.
         """
         assert(ra.size == dec.size)
-        delta_ra, delta_dec = self.delta(ra.size)
+        delta_ra, delta_dec = self.delta(ra.size, rng)
         return ra + delta_ra/numpy.cos(numpy.radians(dec)), dec + delta_dec
 
 
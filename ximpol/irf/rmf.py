@@ -74,14 +74,178 @@ class xBinTableHDUEBOUNDS(xBinTableHDUBase):
     ]
 
 
-class xEnergyDispersionMatrix(xUnivariateAuxGenerator):
+class xEnergyDispersionSampler:
+
+    """Exact sampler for the energy dispersion, built directly from the
+    compressed OGIP form of the MATRIX extension of a .rmf file.
+
+    Each row of the response matrix (i.e., each bin of true energy) is
+    stored as a list of channel groups, with the first channel and number of
+    channels for each group given in the F_CHAN and N_CHAN columns (with
+    N_GRP groups per row). Only the channel ranges with non-zero
+    probability are retained. The normalized cumulative channel
+    probabilities for all the rows are concatenated into a single flat array,
+    with an offset equal to the row index added to each row. This way,
+    the channels for an arbitrary array of energies are extracted with one
+    call to `numpy.searchsorted()`, after bucketing the events in rows of
+    true energy. No interpolation is involved: the channel c is drawn with
+    probability proportional to the matrix element of the corresponding row.
+
+    Arguments
+    ---------
+    hdu : FITS hdu
+       The MATRIX hdu in the .rmf FITS file.
+
+    file_path : str, optional
+       The path to the .rmf FITS file (if not None, the sampling tables are\
+       cached on disk, see `ximpol.irf.cache`).
+    """
+
+    CACHE_LABEL = 'rmf_sampler_v1'
+
+    def __init__(self, hdu, file_path=None):
+        """Constructor.
+        """
+        _matrix = hdu.data
+        self.energy_lo = numpy.array(_matrix['ENERG_LO'], dtype=float)
+        self.energy_hi = numpy.array(_matrix['ENERG_HI'], dtype=float)
+        # The F_CHAN values are absolute channel numbers, and the channel
+        # numbering starts from TLMIN for the F_CHAN column, if specified, and
+        # from zero otherwise (this is what the ximpol .rmf files assume,
+        # consistently with the EBOUNDS extension). The first channel is only
+        # needed to convert channels into indices in the channel space.
+        _col = _matrix.columns.names.index('F_CHAN') + 1
+        self.first_channel = hdu.header.get('TLMIN%d' % _col, 0)
+        if file_path is None:
+            tables = self.build_tables(hdu)
+        else:
+            from ximpol.irf.cache import cached_tables
+            tables = cached_tables(file_path, self.CACHE_LABEL,
+                                   lambda: self.build_tables(hdu))
+        self.row_size = tables['row_size']
+        self.row_start = tables['row_start']
+        self.channels = tables['channels']
+        self.row_norm = tables['row_norm']
+        self.flat_cdf = tables['flat_cdf']
+
+    @classmethod
+    def build_tables(cls, hdu):
+        """Build the sampling tables from the MATRIX hdu.
+
+        Return a dictionary of arrays, see `ximpol.irf.cache`.
+        """
+        _matrix = hdu.data
+        _num_grp = _matrix['N_GRP']
+        _f_chan = _matrix['F_CHAN']
+        _n_chan = _matrix['N_CHAN']
+        _data = _matrix['MATRIX']
+        _channels = []
+        _values = []
+        _row_size = []
+        for i in range(len(_matrix)):
+            _c, _v = cls.unpack_row(_num_grp[i], _f_chan[i], _n_chan[i],
+                                    _data[i])
+            _channels.append(_c)
+            _values.append(_v)
+            _row_size.append(len(_c))
+        row_size = numpy.array(_row_size)
+        row_start = numpy.concatenate(([0], numpy.cumsum(row_size)))
+        _values = numpy.concatenate(_values)
+        _row = numpy.repeat(numpy.arange(len(row_size)), row_size)
+        # Cumulative sums, normalized row by row, with the row offsets.
+        _cdf = numpy.cumsum(_values)
+        _cdf -= numpy.repeat(_cdf[row_start[:-1]] - _values[row_start[:-1]],
+                             row_size)
+        row_norm = _cdf[row_start[1:] - 1]
+        row_norm[row_norm <= 0.] = 1.
+        flat_cdf = _cdf/numpy.repeat(row_norm, row_size) + _row
+        return dict(row_size=row_size, row_start=row_start,
+                    channels=numpy.concatenate(_channels).astype(numpy.int16),
+                    row_norm=row_norm, flat_cdf=flat_cdf)
+
+    @classmethod
+    def unpack_row(cls, num_groups, first_chan, num_chans, values):
+        """Unpack a single row of a compressed OGIP matrix.
+
+        Return the (absolute) channel numbers and the matrix elements for all
+        the non-zero channel ranges in the row.
+        """
+        first_chan = numpy.atleast_1d(first_chan)[:num_groups]
+        num_chans = numpy.atleast_1d(num_chans)[:num_groups]
+        values = numpy.asarray(values, dtype=float)[:num_chans.sum()]
+        channels = numpy.concatenate([numpy.arange(_f, _f + _n) for _f, _n in\
+                                      zip(first_chan, num_chans)])
+        # Strip the zero entries at the two ends of the row.
+        _nonzero = numpy.nonzero(values > 0.)[0]
+        if len(_nonzero) > 0:
+            _slice = slice(_nonzero[0], _nonzero[-1] + 1)
+        else:
+            _slice = slice(0, 1)
+        return channels[_slice], values[_slice]
+
+    def num_rows(self):
+        """Return the number of rows (i.e., true energy bins) of the matrix.
+        """
+        return len(self.row_size)
+
+    def probabilities(self):
+        """Return the normalized matrix elements (i.e., the channel
+        probabilities for each row), in the same flat layout as the
+        `channels` array.
+        """
+        _row = numpy.repeat(numpy.arange(self.num_rows()), self.row_size)
+        _cdf = self.flat_cdf - _row
+        prob = numpy.array(_cdf)
+        prob[1:] -= _cdf[:-1]
+        prob[self.row_start[:-1]] = _cdf[self.row_start[:-1]]
+        return prob
+
+    def row_index(self, energy):
+        """Return the index of the true energy bin for a given array of
+        energies (values outside the matrix range are assigned to the first
+        or last row).
+        """
+        index = numpy.searchsorted(self.energy_lo, energy, side='right') - 1
+        return numpy.clip(index, 0, self.num_rows() - 1)
+
+    def rvs(self, energy, rng=None):
+        """Extract the channels for a given array of true energies.
+
+        Arguments
+        ---------
+        energy : array
+            The array of true energy values.
+
+        rng : random number generator, optional
+            See `ximpol.core.rand.random_generator()` (if None, the global
+            numpy random state is used).
+        """
+        if rng is None:
+            rng = numpy.random
+        row = self.row_index(energy)
+        _u = row + rng.uniform(size=row.shape)
+        index = numpy.searchsorted(self.flat_cdf, _u, side='right')
+        index = numpy.clip(index, self.row_start[row],
+                           self.row_start[row + 1] - 1)
+        return self.channels[index]
+
+
+class xEnergyDispersionMatrix:
 
     """Class encapsulating the energy dispersion matrix, as stored in the
     MATRIX extension of a .rmf file.
 
-    In order to streamline performance, the energy grid is down-sampled
-    to the value of the `num_aux_points` parameter, in such a way that
-    the xUnivariateAuxGenerator.build_vppf()` doesn't take forever.
+    The channels are extracted exactly from the compressed matrix, see
+    `xEnergyDispersionSampler`, which is the only thing built when the
+    object is created. The interpolating generator (an
+    `xUnivariateAuxGenerator` object), used for the analysis and the
+    visualization of the energy dispersion, is available through the
+    `generator` property, and is built the first time it is accessed.
+
+    Since the `xUnivariateAuxGenerator.build_vppf()` is vectorized, the
+    generator is built by default on the native energy grid of the matrix.
+    The energy grid can still be down-sampled to the value of the
+    `num_aux_points` parameter, if necessary.
 
     Arguments
     ---------
@@ -90,7 +254,10 @@ class xEnergyDispersionMatrix(xUnivariateAuxGenerator):
 
     num_aux_point : int
        The number of points that the energy dispersion matrix should be\
-       down-sampled to.
+       down-sampled to (if None, the native energy grid is used).
+
+    file_path : str, optional
+       The path to the .rmf FITS file, used for caching the sampling tables.
 
     Warning
     -------
@@ -110,30 +277,58 @@ class xEnergyDispersionMatrix(xUnivariateAuxGenerator):
     XSPEC.
     """
 
-    def __init__(self, hdu, num_aux_points=200):
+    __generator = None
+
+    def __init__(self, hdu, num_aux_points=None, file_path=None):
         """Constructor.
         """
-        # First build a bivariate spline with the full data grid.
-        _matrix = hdu.data
+        self.hdu = hdu
+        self.num_aux_points = num_aux_points
+        self.sampler = xEnergyDispersionSampler(hdu, file_path)
+
+    @property
+    def generator(self):
+        """The interpolating generator for the energy dispersion (see
+        `build_generator()`).
+
+        This is built the first time it is needed, i.e., never in the event
+        generation.
+        """
+        if self.__generator is None:
+            self.__generator = self.build_generator()
+        return self.__generator
+
+    def build_generator(self):
+        """Build the xUnivariateAuxGenerator object interpolating the energy
+        dispersion matrix.
+        """
+        _matrix = self.hdu.data
         _x = 0.5*(_matrix['ENERG_LO'] + _matrix['ENERG_HI'])
         _y = numpy.arange(0, len(_matrix['MATRIX'][0]), 1) - 0.5
         _z = _matrix['MATRIX']
-        _pdf = xInterpolatedBivariateSplineLinear(_y, _x, _z.transpose())
-        # Then initialize the actual xUnivariateAuxGenerator object
-        # with a down-sampled aux axis.
-        _aux = numpy.linspace(_pdf.ymin(), _pdf.ymax(), num_aux_points)
+        if self.num_aux_points is None:
+            # Use the matrix on its native grid.
+            _aux = _x
+            _pdf = _z
+        else:
+            # Build a bivariate spline with the full data grid and initialize
+            # the actual xUnivariateAuxGenerator object with a down-sampled
+            # aux axis.
+            _pdf = xInterpolatedBivariateSplineLinear(_y, _x, _z.transpose())
+            _aux = numpy.linspace(_pdf.ymin(), _pdf.ymax(),
+                                  self.num_aux_points)
         _rv = _y
         fmt = dict(auxname='Energy', auxunits='keV', rvname='Channel',
                    pdfname='Probability density')
-        xUnivariateAuxGenerator.__init__(self, _aux, _rv, _pdf, **fmt)
+        return xUnivariateAuxGenerator(_aux, _rv, _pdf, **fmt)
 
-    def rvs(self, aux):
-        """Overloaded method.
+    def rvs(self, aux, rng=None):
+        """Extract the channels for a given array of true energies.
 
-        We want to return an integer, here.
+        The channels are extracted from the compressed matrix, see
+        `xEnergyDispersionSampler.rvs()`.
         """
-        val = xUnivariateAuxGenerator.rvs(self, aux)
-        return  numpy.ndarray.astype(numpy.floor(val), numpy.int16)
+        return self.sampler.rvs(aux, rng)
 
 
 class xEnergyDispersionBounds(xInterpolatedUnivariateSplineLinear):
@@ -150,6 +345,17 @@ class xEnergyDispersionBounds(xInterpolatedUnivariateSplineLinear):
         _y = 0.5*(_bounds['E_MIN'] + _bounds['E_MAX'])
         fmt = dict(xname='Channel', yname='Energy', yunits='keV')
         xInterpolatedUnivariateSplineLinear.__init__(self, _x, _y, **fmt)
+        self.first_channel = _x[0]
+        self.channel_energy = numpy.array(_y, dtype=float)
+
+    def energy(self, channel):
+        """Return the central energy for an array of (integer) channels.
+
+        This is a direct lookup into the EBOUNDS table, and is the
+        preferred way to convert channels into energies in the event
+        generation.
+        """
+        return self.channel_energy[channel - self.first_channel]
 
 
 class xEnergyDispersion:
@@ -168,7 +374,8 @@ class xEnergyDispersion:
         logger.info('Reading energy dispersion data from %s...' % mrf_file_path)
         self.hdu_list = fits.open(mrf_file_path)
         self.hdu_list.info()
-        self.matrix = xEnergyDispersionMatrix(self.hdu_list['MATRIX'])
+        self.matrix = xEnergyDispersionMatrix(self.hdu_list['MATRIX'],
+                                              file_path=mrf_file_path)
         self.ebounds = xEnergyDispersionBounds(self.hdu_list['EBOUNDS'])
 
     def plot(self, show=True):
@@ -176,15 +383,16 @@ class xEnergyDispersion:
         """
         from ximpol.utils.matplotlib_ import pyplot as plt
         from ximpol.utils.matplotlib_ import context_two_by_two
-        emin = self.matrix.xmin()
-        emax = self.matrix.xmax()
+        generator = self.matrix.generator
+        emin = generator.xmin()
+        emax = generator.xmax()
 
         def _plot_vslice(energy, position):
             """Convenience function to plot a generic vertical slice of the
             energy dispersion.
             """
             ax = plt.subplot(2, 2, position)
-            vslice = self.matrix.vslice(energy)
+            vslice = generator.vslice(energy)
             vslice.plot(overlay=False, show=False)
             plt.text(0.1, 0.9, '$E = %.2f\\ \\rm{keV}$' % energy,
                      transform=ax.transAxes)
@@ -196,7 +404,7 @@ class xEnergyDispersion:
         with context_two_by_two():
             plt.figure(1)
             ax = plt.subplot(2, 2, 1)
-            self.matrix.plot(show=False)
+            generator.plot(show=False)
             ax = plt.subplot(2, 2, 2)
             self.ebounds.plot(overlay=False, show=False)
             _plot_vslice(emin + 0.333*(emax - emin), 3)
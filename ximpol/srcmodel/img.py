@@ -21,11 +21,17 @@ from astropy.io import fits
 from astropy.wcs import wcs
 import numpy
 
+from ximpol.core.rand import xAliasGenerator
 from ximpol.utils.logging_ import logger
 from ximpol.utils.matplotlib_ import pyplot as plt
 from ximpol.utils.matplotlib_ import context_no_grids
 
 
+"""Default tolerance (in degrees) for the linearized WCS transformation.
+"""
+DEFAULT_WCS_TOLERANCE = 1./3600.
+
+
 class xFITSImage:
 
     """Class describing a FITS image.
@@ -36,8 +42,13 @@ class xFITSImage:
         The path to the FITS file containing the image.
 
     build_cdf : bool
-        If True, build the cdf (i.e., equip the instance to generate random
-        numbers).
+        If True, build the alias table and the linearized WCS transformation
+        (i.e., equip the instance to generate random numbers).
+
+    wcs_tolerance : float
+        The maximum deviation (in degrees) between the linearized and the
+        full WCS transformation over the image for the former to be used
+        when generating random coordinates (see `build_linear_wcs()`).
 
     Warning
     -------
@@ -46,7 +57,8 @@ class xFITSImage:
     residual offset by 1 pixel that we should try and sort out.)
     """
 
-    def __init__(self, file_path, build_cdf=True):
+    def __init__(self, file_path, build_cdf=True,
+                 wcs_tolerance=DEFAULT_WCS_TOLERANCE):
         """Constructor.
         """
         logger.info('Reading FITS image from %s...' % file_path)
@@ -56,21 +68,85 @@ class xFITSImage:
         self.data = self.hdu_list['PRIMARY'].data.transpose()
         self.vmin=None
         self.vmax=None
+        self.linear_wcs = None
         if build_cdf:
             self.build_cdf()
+            self.build_linear_wcs(wcs_tolerance)
 
     def build_cdf(self):
-        """Build the cumulative distribution function.
+        """Build the alias table for the pixels with non-zero content.
 
         (This is used to extract random positions from the image when
-        simulating extended sources.)
+        simulating extended sources, see `ximpol.core.rand.xAliasGenerator`.)
         """
-        self.cdf = numpy.cumsum(self.data.ravel())
-        self.cdf /= self.cdf[-1]
-
-    def rvs_coordinates(self, size=1, randomize=True):
+        _data = self.data.ravel()
+        self.pixels = numpy.flatnonzero(_data > 0)
+        self.pixel_generator = xAliasGenerator(_data[self.pixels])
+
+    def build_linear_wcs(self, tolerance=DEFAULT_WCS_TOLERANCE):
+        """Build the local linearization of the WCS transformation around
+        the center of the image.
+
+        The Jacobian of the transformation is evaluated with finite
+        differences at the center of the image, and the linearized
+        transformation is validated against the full one on a grid of
+        points spanning the whole image (including the edges and the
+        corners). If the maximum angular deviation is larger than the
+        tolerance (in degrees), the linearization is discarded and the full
+        WCS transformation is used instead.
+        """
+        _nx, _ny = self.data.shape
+        _pix0 = numpy.array([0.5*(_nx - 1), 0.5*(_ny - 1)])
+        _world0 = self.wcs.wcs_pix2world(_pix0.reshape(1, 2), 1)[0]
+        _jacobian = numpy.zeros((2, 2))
+        for i in range(2):
+            _delta = numpy.zeros((2, 2))
+            _delta[:, i] = [0.5, -0.5]
+            _world = self.wcs.wcs_pix2world(_pix0 + _delta, 1)
+            _jacobian[:, i] = _world[0] - _world[1]
+        _jacobian[0] = (_jacobian[0] + 180.) % 360. - 180.
+        self.linear_wcs = (_pix0, _world0, _jacobian)
+        _x, _y = numpy.meshgrid(numpy.linspace(-0.5, _nx - 0.5, 9),
+                                numpy.linspace(-0.5, _ny - 0.5, 9))
+        _pix = numpy.vstack((_x.ravel(), _y.ravel())).transpose()
+        _ra, _dec = self.pix2world(_pix)
+        _world = self.wcs.wcs_pix2world(_pix, 1)
+        _dra = (_ra - _world[:, 0] + 180.) % 360. - 180.
+        _dra *= numpy.cos(numpy.radians(_world[:, 1]))
+        _err = numpy.sqrt(_dra**2 + (_dec - _world[:, 1])**2).max()
+        if _err > tolerance:
+            logger.info('Linearized WCS off by %.3e deg, using full WCS.' %\
+                        _err)
+            self.linear_wcs = None
+        else:
+            logger.info('Using the linearized WCS (max error %.3e deg).' %\
+                        _err)
+
+    def pix2world(self, pixel_crd):
+        """Convert an array of (fractional) pixel coordinates, with shape
+        (n, 2), to sky coordinates.
+
+        This is a pure numpy affine transformation if the linearized WCS
+        is available (see `build_linear_wcs()`), and goes through the full
+        WCS transformation otherwise.
+
+        Returns a tuple with the arrays of ra and dec.
+        """
+        if self.linear_wcs is None:
+            world_crd = self.wcs.wcs_pix2world(pixel_crd, 1)
+            return world_crd[:, 0], world_crd[:, 1]
+        _pix0, _world0, _jacobian = self.linear_wcs
+        world_crd = _world0 + numpy.dot(pixel_crd - _pix0, _jacobian.T)
+        return world_crd[:, 0] % 360., world_crd[:, 1]
+
+    def rvs_coordinates(self, size=1, randomize=True, rng=None):
         """Generate random coordinates based on the image map.
 
+        The pixels are extracted from the alias table (see `build_cdf()`)
+        and, if randomize is True, the positions are spread uniformly within
+        each pixel, in pixel space, before being converted to sky
+        coordinates (see `pix2world()`).
+
         Arguments
         ---------
         size : int
@@ -79,23 +155,18 @@ class xFITSImage:
         randomize : bool
             If true, the positions are randomized uniformely within each pixel.
 
-        Warning
-        -------
-        There must be a better way to do this. We should take a look at
-        how aplpy.FITSImage is doing this.
+        rng : random number generator, optional
+            See `ximpol.core.rand.random_generator()` (if None, the global\
+            numpy random state is used).
         """
-        u = numpy.random.rand(size)
-        pixel = numpy.searchsorted(self.cdf, u)
+        if rng is None:
+            rng = numpy.random
+        pixel = self.pixels[self.pixel_generator.rvs(size, rng)]
         row, col = numpy.unravel_index(pixel, self.data.shape)
-        pixel_crd = numpy.vstack((row, col)).transpose()
-        world_crd = self.wcs.wcs_pix2world(pixel_crd, 1)
-        ra, dec = world_crd[:, 0], world_crd[:, 1]
+        pixel_crd = numpy.vstack((row, col)).transpose().astype(float)
         if randomize:
-            delta_ra = 0.5*self.hdu_list['PRIMARY'].header['CDELT1']
-            delta_dec = 0.5*self.hdu_list['PRIMARY'].header['CDELT2']
-            ra += numpy.random.uniform(-delta_ra, delta_ra, size)
-            dec += numpy.random.uniform(-delta_dec, delta_dec, size)
-        return ra, dec
+            pixel_crd += rng.uniform(-0.5, 0.5, (size, 2))
+        return self.pix2world(pixel_crd)
 
     def __call__(self, row, column):
         """Return the value of the underlying map for a given pixel.
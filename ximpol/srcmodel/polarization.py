@@ -29,12 +29,23 @@ from ximpol.srcmodel.img import xFITSImage
 def constant(C):
     """Simple wrapper returning a constant, independently of the input
     arguments.
+
+    The constant is also attached to the function object, so that it can
+    be retrieved without calling the function (see `constant_value()`).
     """
     def _function(E, t, ra, dec):
         return C
+    _function.constant_value = C
     return _function
 
 
+def constant_value(function):
+    """Return the value of a function built with `constant()`, or None
+    for any other function.
+    """
+    return getattr(function, 'constant_value', None)
+
+
 class xPolarizationMap:
     """Read-mode interface for the polarization maps.
     """
@@ -17,18 +17,90 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
+import os
+import shutil
+import tempfile
 import numpy
 from collections import OrderedDict
 
 from ximpol.srcmodel.img import xFITSImage
-from ximpol.srcmodel.spectrum import xCountSpectrum
+from ximpol.srcmodel.spectrum import build_count_spectrum
+from ximpol.srcmodel.spectrum import adaptive_sampling_time
+from ximpol.srcmodel.polarization import constant_value
 from ximpol.evt.event import xMonteCarloEventList
 from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
+from ximpol.core.rand import random_generator
 from ximpol.utils.units_ import keV2erg, ergcms2mcrab
 from ximpol.utils.logging_ import logger
 
 
 DEFAULT_MAX_VALIDITY_TIME = 10000000.
+SAMPLING_TIME_RTOL = 1e-2
+SAMPLING_TIME_MAX_NUM_POINTS = 1000
+
+
+"""Context for the parallel event generation.
+
+This is set by the parent process right before the pool of worker processes
+is created, so that the (forked) workers inherit the ROI model and the IRFs
+instead of receiving a pickled copy of them with each task.
+"""
+_PARALLEL_CONTEXT = None
+
+
+def _rvs_source_event_list(args):
+    """Generate the event list for a single source in a worker process.
+
+    (This needs to be a module-level function, so that it can be dispatched
+    to the worker processes.)
+
+    Arguments
+    ---------
+    args : tuple
+        The index of the source in the ROI model and the random seed.
+    """
+    i, seed = args
+    roi_model, irfs, kwargs = _PARALLEL_CONTEXT
+    source = list(roi_model.values())[i]
+    rng = random_generator(seed, (source.identifier,))
+    return source.rvs_event_list(*irfs, rng=rng, **kwargs)
+
+
+def _rvs_slice_chunk(args):
+    """Generate the event list for a single time slice in a worker process
+    and write it to a temporary chunk file.
+
+    Arguments
+    ---------
+    args : tuple
+        The index of the slice, its start and stop times, the random seed
+        and the path to the folder for the chunk files.
+
+    Returns the path to the chunk file.
+    """
+    i, tmin, tmax, seed, chunk_folder = args
+    roi_model, irfs, kwargs = _PARALLEL_CONTEXT
+    event_list = roi_model.rvs_slice_event_list(*irfs, tmin=tmin, tmax=tmax,
+                                                seed=seed, slice_id=i,
+                                                **kwargs)
+    file_path = os.path.join(chunk_folder, 'slice_%06d.npy' % i)
+    event_list.write_chunk(file_path)
+    return file_path
+
+
+def _fork_context():
+    """Return the multiprocessing context for the fork start method, or None
+    if this is not available on the platform.
+    """
+    import multiprocessing
+    try:
+        return multiprocessing.get_context('fork')
+    except AttributeError:
+        # Python 2: fork is the only start method on POSIX systems.
+        return multiprocessing
+    except ValueError:
+        logger.warning('Fork start method not available, running serially.')
+        return None
 
 
 class xModelComponentBase:
@@ -101,11 +173,29 @@ class xModelComponentBase:
         _flux = keV2erg(_flux)
         return _flux
 
-    @classmethod
-    def sampling_time(cls, tstart, tstop):
+    def sampling_time(self, tstart, tstop, aeff):
+        """Return the grid of times used to tabulate the count spectrum of
+        the model component in the time interval [tstart, tstop].
+
+        The grid is refined adaptively until the energy-integrated rate
+        (folded with the effective area) is piecewise-linear within
+        SAMPLING_TIME_RTOL, so that its size tracks the variability of the
+        source (see `ximpol.srcmodel.spectrum.adaptive_sampling_time()`).
+        For time-independent spectra this is just [tstart, tstop].
         """
+        return adaptive_sampling_time(self.energy_spectrum, tstart, tstop,
+                                      aeff.x, aeff.y, SAMPLING_TIME_RTOL,
+                                      max_num_points=\
+                                      SAMPLING_TIME_MAX_NUM_POINTS)
+
+    def num_expected_events(self, aeff, tstart, tstop):
+        """Return the expected number of events from the model component in
+        the time interval [tstart, tstop].
         """
-        return numpy.linspace(tstart, tstop, 100)
+        tsamples = self.sampling_time(tstart, tstop, aeff)
+        count_spectrum = build_count_spectrum(self.energy_spectrum, aeff,
+                                              tsamples)
+        return count_spectrum.light_curve.norm()
 
     def set_energy_spectrum(self, energy_spectrum):
         """Set the energy spectrum for the model component.
@@ -145,7 +235,7 @@ class xModelComponentBase:
         self.set_polarization_degree(polarization_degree)
         self.set_polarization_angle(polarization_angle)
 
-    def rvs_sky_coordinates(self, size=1):
+    def rvs_sky_coordinates(self, size=1, rng=None):
         """Generate random coordinates for the model component.
 
         This is a do-nothing function and should be re-implemented by
@@ -155,6 +245,10 @@ class xModelComponentBase:
         ---------
         size : float
             The number of sky coordinate pairs to be generated.
+
+        rng : random number generator, optional
+            See `ximpol.core.rand.random_generator()` (if None, the global\
+            numpy random state is used).
         """
         pass
 
@@ -170,46 +264,68 @@ class xModelComponentBase:
         text += '\n    %s' % self.flux_label
         return text
 
-    def rvs_event_list(self, aeff, psf, modf, edisp, **kwargs):
+    def rvs_pe_angle(self, modf, energy, time, ra, dec, rng=None):
+        """Extract the photoelectron emission directions for a set of events.
+
+        The polarization degree and angle built with
+        `ximpol.srcmodel.polarization.constant()` are passed straight to the
+        modulation factor as scalars, without being evaluated on the event
+        arrays (and, for unpolarized components, the emission directions are
+        extracted uniformly, see `xModulationFactor.rvs_phi()`).
+        """
+        pol_degree = constant_value(self.polarization_degree)
+        if pol_degree is None:
+            pol_degree = self.polarization_degree(energy, time, ra, dec)
+        pol_angle = constant_value(self.polarization_angle)
+        if pol_angle is None:
+            pol_angle = self.polarization_angle(energy, time, ra, dec)
+        return modf.rvs_phi(energy, pol_degree, pol_angle, rng)
+
+    def rvs_event_list(self, aeff, psf, modf, edisp, rng=None, **kwargs):
         """Extract a random event list for the model component.
+
+        All the random numbers are drawn from the `rng` random number
+        generator (see `ximpol.core.rand.random_generator()`), or from the
+        global numpy random state if `rng` is None.
         """
+        if rng is None:
+            rng = numpy.random
         # Create the event list and the count spectrum.
         event_list = xMonteCarloEventList()
-        tsamples = self.sampling_time(kwargs['tstart'], kwargs['tstop'])
-        logger.info('Sampling times: %s' % tsamples)
-        count_spectrum = xCountSpectrum(self.energy_spectrum, aeff, tsamples)
+        tsamples = self.sampling_time(kwargs['tstart'], kwargs['tstop'], aeff)
+        logger.info('Sampling times: %d points in [%s, %s]' %\
+                    (len(tsamples), tsamples[0], tsamples[-1]))
+        count_spectrum = build_count_spectrum(self.energy_spectrum, aeff,
+                                              tsamples)
         # Extract the number of events to be generated based on the integral
         # of the light curve over the simulation time.
-        num_events = numpy.random.poisson(count_spectrum.light_curve.norm())
+        num_events = rng.poisson(count_spectrum.light_curve.norm())
         logger.info('About to generate %d events...' % num_events)
         # Extract the event times and sort them.
-        col_time = count_spectrum.light_curve.rvs(num_events)
+        col_time = count_spectrum.light_curve.rvs(num_events, rng)
         col_time.sort()
         event_list.set_column('TIME', col_time)
         # Extract the MC energies and smear them with the energy dispersion.
-        col_mc_energy = count_spectrum.rvs(col_time)
+        col_mc_energy = count_spectrum.rvs(col_time, rng)
         event_list.set_column('MC_ENERGY', col_mc_energy)
-        col_pha = edisp.matrix.rvs(col_mc_energy)
+        col_pha = edisp.matrix.rvs(col_mc_energy, rng)
         event_list.set_column('PHA', col_pha)
-        event_list.set_column('ENERGY', edisp.ebounds(col_pha))
+        event_list.set_column('ENERGY', edisp.ebounds.energy(col_pha))
         # Extract the MC sky positions and smear them with the PSF.
-        col_mc_ra, col_mc_dec = self.rvs_sky_coordinates(num_events)
+        col_mc_ra, col_mc_dec = self.rvs_sky_coordinates(num_events, rng)
         event_list.set_column('MC_RA', col_mc_ra)
         event_list.set_column('MC_DEC', col_mc_dec)
-        col_ra, col_dec = psf.smear(col_mc_ra, col_mc_dec)
+        col_ra, col_dec = psf.smear(col_mc_ra, col_mc_dec, rng)
         event_list.set_column('RA', col_ra)
         event_list.set_column('DEC', col_dec)
         # Extract the photoelectron emission directions.
-        pol_degree = self.polarization_degree(col_mc_energy, col_time,
-                                              col_mc_ra, col_mc_dec)
-        pol_angle = self.polarization_angle(col_mc_energy, col_time,
-                                              col_mc_ra, col_mc_dec)
-        col_pe_angle = modf.rvs_phi(col_mc_energy, pol_degree, pol_angle)
+        col_pe_angle = self.rvs_pe_angle(modf, col_mc_energy, col_time,
+                                         col_mc_ra, col_mc_dec, rng)
         event_list.set_column('PE_ANGLE', col_pe_angle)
         # Set the source ID.
         event_list.set_column('MC_SRC_ID', self.identifier)
         # Set the phase to rnd [0-1] for all non-periodic sources.
-        phase=numpy.random.uniform(0,1,len(col_pe_angle))
+        phase = rng.uniform(0, 1, len(col_pe_angle))
         event_list.set_column('PHASE', phase)
         return event_list
 
@@ -241,7 +357,7 @@ class xPointSource(xModelComponentBase):
         self.ra = ra
         self.dec = dec
 
-    def rvs_sky_coordinates(self, size=1):
+    def rvs_sky_coordinates(self, size=1, rng=None):
         """Generate random coordinates for the model component.
 
         This is returning an array of the proper length with identical values.
@@ -272,18 +388,59 @@ class xEphemeris:
         self.min_validity_time = min_validity_time
         self.max_validity_time = max_validity_time
 
+    def __nu(self, dt):
+        """Return the source frequency at a time dt past t0, with no check
+        on the validity interval.
+        """
+        return self.nu0 + self.nudot*dt + 0.5*self.nuddot*dt**2.
+
+    def __phase(self, dt):
+        """Return the absolute phase at a time dt past t0, with no check
+        on the validity interval.
+        """
+        return dt*(self.nu0 + dt*(0.5*self.nudot + dt*self.nuddot/6.))
+
     def nu(self, t):
-        """Return the source frequency at a given time.
+        """Return the source frequency at a given time (or array of times).
         """
-        assert (t >= self.min_validity_time) and (t <= self.max_validity_time)
-        dt = (t - self.t0)
-        return self.nu0 + self.nudot*dt + 0.5*self.nuddot*numpy.power(dt, 2.)
+        assert numpy.all(t >= self.min_validity_time) and\
+            numpy.all(t <= self.max_validity_time)
+        return self.__nu(t - self.t0)
 
     def period(self, t):
-        """Return the source period at a given time.
+        """Return the source period at a given time (or array of times).
         """
         return 1./self.nu(t)
 
+    def phase(self, t):
+        """Return the absolute phase (i.e., the number of cycles since t0,
+        including the fractional part) at a given time (or array of times).
+        """
+        return self.__phase(numpy.asarray(t, dtype=float) - self.t0)
+
+    def time(self, phase, guess=None, tolerance=1e-9, max_iterations=20):
+        """Return the time (or array of times) at which the source reaches
+        a given absolute phase, i.e., invert the `phase()` method.
+
+        The ephemeris polynomial is inverted with Newton iterations over the
+        whole array at once, starting from the guess times (if given) or from
+        the first-order solution. The iterations stop when all the
+        corrections are smaller than the tolerance (in seconds), or than
+        the floating-point resolution of the times themselves.
+        """
+        phase = numpy.asarray(phase, dtype=float)
+        if guess is None:
+            t = self.t0 + phase/self.nu0
+        else:
+            t = numpy.array(guess, dtype=float)
+        for i in range(max_iterations):
+            dt = t - self.t0
+            delta = (self.__phase(dt) - phase)/self.__nu(dt)
+            t = t - delta
+            if numpy.all(abs(delta) <= tolerance + 4*numpy.spacing(t)):
+                break
+        return t
+
     def __str__(self):
         """String formatting.
         """
@@ -306,58 +463,99 @@ class xPeriodicPointSource(xPointSource):
                               ephemeris.max_validity_time)
         self.ephemeris = ephemeris
 
-    def rvs_event_list(self, aeff, psf, modf, edisp, **kwargs):
+    def sampling_phase(self, aeff, phasemin=0., phasemax=1.):
+        """Return the grid of phases used to tabulate the count spectrum of
+        the source in the phase interval [phasemin, phasemax].
+
+        This is refined adaptively, in the same way as the grid of times for
+        non-periodic sources (see `xModelComponentBase.sampling_time()`).
+        """
+        return self.sampling_time(phasemin, phasemax, aeff)
+
+    def num_expected_events(self, aeff, tstart, tstop):
+        """Return the expected number of events from the source in the time
+        interval [tstart, tstop].
+        """
+        sampling_phase = self.sampling_phase(aeff)
+        count_spectrum = build_count_spectrum(self.energy_spectrum, aeff,
+                                              sampling_phase)
+        return (tstop - tstart)*count_spectrum.light_curve.norm()
+
+    def rvs_times(self, light_curve, tstart, tstop, rng=None):
+        """Extract the event phases and times in the interval [tstart, tstop)
+        for a given light curve (in phase) of the source.
+
+        The events are generated over the smallest set of full cycles
+        covering the interval, and those falling outside are thrown away.
+        The cycle of each event is picked by drawing a time uniformly over
+        these cycles and taking the cycle it falls into, so that the cycles
+        are weighted by their duration, and the phase within the cycle is
+        extracted from the light curve. The (cycle, phase) pairs are then
+        turned into times by inverting the ephemeris (see
+        `xEphemeris.time()`), which properly accounts for the frequency
+        derivatives.
+
+        Since the thinning of a Poisson process is a Poisson process, the
+        number of events in [tstart, tstop) is Poisson-distributed, with the
+        mean given by the light curve integrated over the interval itself
+        (and not just over the full cycles contained in it).
+
+        Returns a tuple with the arrays of phases and (unsorted) times.
+        """
+        if rng is None:
+            rng = numpy.random
+        first_cycle = numpy.floor(self.ephemeris.phase(tstart))
+        last_cycle = numpy.ceil(self.ephemeris.phase(tstop))
+        if last_cycle == first_cycle:
+            last_cycle += 1
+        tmin = self.ephemeris.time(first_cycle)
+        tmax = self.ephemeris.time(last_cycle)
+        num_events = rng.poisson((tmax - tmin)*light_curve.norm())
+        phase = light_curve.rvs(num_events, rng)
+        _t = rng.uniform(tmin, tmax, num_events)
+        cycle = numpy.clip(numpy.floor(self.ephemeris.phase(_t)), first_cycle,
+                           last_cycle - 1)
+        time = self.ephemeris.time(cycle + phase, guess=_t)
+        _mask = (time >= tstart)*(time < tstop)
+        return phase[_mask], time[_mask]
+
+    def rvs_event_list(self, aeff, psf, modf, edisp, rng=None, **kwargs):
         """Extract a random event list for the model component.
 
-        TODO: here we should pass the sampling phase, instead?
-
-        TODO: properly take into account the derivatives in the ephemeris.
+        The count spectrum is made in phase, and the event times are
+        generated according to the source ephemeris (see `rvs_times()`).
         """
+        if rng is None:
+            rng = numpy.random
         # Create the event list and the count spectrum.
         event_list = xMonteCarloEventList()
         # Mind the count spectrum is made in phase!
-        sampling_phase = numpy.linspace(0., 1., 100)
-        count_spectrum = xCountSpectrum(self.energy_spectrum, aeff,
-                                        sampling_phase)
-        # All this is not properly taking into account the ephemeris.
-        min_time = kwargs['tstart']
-        max_time = kwargs['tstop']
-        #min_time=sampling_time[0]
-        #max_time = sampling_time[-1]
-        delta_time = (max_time - min_time)
-        period = self.ephemeris.period(min_time)
-        # This is not accurate, as we are effectively discarding the last
-        # fractional period. Need to think about it.
-        num_periods = int(delta_time/period)
-        num_expected_events = delta_time*count_spectrum.light_curve.norm()
-        # Extract the number of events to be generated based on the integral
-        # of the light curve over the simulation time.
-        num_events = numpy.random.poisson(num_expected_events)
-        # Extract the event phases and sort them.
-        col_phase = count_spectrum.light_curve.rvs(num_events)
+        sampling_phase = self.sampling_phase(aeff)
+        count_spectrum = build_count_spectrum(self.energy_spectrum, aeff,
+                                              sampling_phase)
+        col_phase, col_time = self.rvs_times(count_spectrum.light_curve,
+                                             kwargs['tstart'], kwargs['tstop'],
+                                             rng)
+        num_events = len(col_time)
+        logger.info('About to generate %d events...' % num_events)
         event_list.set_column('PHASE', col_phase)
-        col_period = numpy.random.randint(0, num_periods, num_events)
-        col_time = (col_period + col_phase)*period
         event_list.set_column('TIME', col_time)
         # Extract the MC energies and smear them with the energy dispersion.
-        col_mc_energy = count_spectrum.rvs(col_phase)
+        col_mc_energy = count_spectrum.rvs(col_phase, rng)
         event_list.set_column('MC_ENERGY', col_mc_energy)
-        col_pha = edisp.matrix.rvs(col_mc_energy)
+        col_pha = edisp.matrix.rvs(col_mc_energy, rng)
         event_list.set_column('PHA', col_pha)
-        event_list.set_column('ENERGY', edisp.ebounds(col_pha))
+        event_list.set_column('ENERGY', edisp.ebounds.energy(col_pha))
         # Extract the MC sky positions and smear them with the PSF.
-        col_mc_ra, col_mc_dec = self.rvs_sky_coordinates(num_events)
+        col_mc_ra, col_mc_dec = self.rvs_sky_coordinates(num_events, rng)
         event_list.set_column('MC_RA', col_mc_ra)
         event_list.set_column('MC_DEC', col_mc_dec)
-        col_ra, col_dec = psf.smear(col_mc_ra, col_mc_dec)
+        col_ra, col_dec = psf.smear(col_mc_ra, col_mc_dec, rng)
         event_list.set_column('RA', col_ra)
         event_list.set_column('DEC', col_dec)
         # Extract the photoelectron emission directions.
-        pol_degree = self.polarization_degree(col_mc_energy, col_phase,
-                                              col_mc_ra, col_mc_dec)
-        pol_angle = self.polarization_angle(col_mc_energy, col_phase,
-                                            col_mc_ra, col_mc_dec)
-        col_pe_angle = modf.rvs_phi(col_mc_energy, pol_degree, pol_angle)
+        col_pe_angle = self.rvs_pe_angle(modf, col_mc_energy, col_phase,
+                                         col_mc_ra, col_mc_dec, rng)
         event_list.set_column('PE_ANGLE', col_pe_angle)
         # Set the source ID.
         event_list.set_column('MC_SRC_ID', self.identifier)
@@ -403,7 +601,7 @@ class xUniformDisk(xModelComponentBase):
         self.dec = dec
         self.radius = radius
 
-    def rvs_sky_coordinates(self, size=1):
+    def rvs_sky_coordinates(self, size=1, rng=None):
         """Generate random coordinates for the model component.
 
         This is returning an array of the proper length with identical values.
@@ -416,8 +614,10 @@ class xUniformDisk(xModelComponentBase):
         size : float
             The number of sky coordinate pairs to be generated.
         """
-        r = self.radius*numpy.sqrt(numpy.random.sample(size))
-        theta = numpy.random.uniform(0, 2*numpy.pi, size)
+        if rng is None:
+            rng = numpy.random
+        r = self.radius*numpy.sqrt(rng.uniform(size=size))
+        theta = rng.uniform(0, 2*numpy.pi, size)
         ra = self.ra + r*numpy.cos(theta)
         dec = self.dec + r*numpy.sin(theta)
         return (ra, dec)
@@ -463,7 +663,7 @@ class xGaussianDisk(xModelComponentBase):
         self.__mean = [self.ra, self.dec]
         self.__cov = [[sigma**2., 0.], [0., sigma**2.]]
 
-    def rvs_sky_coordinates(self, size=1):
+    def rvs_sky_coordinates(self, size=1, rng=None):
         """Generate random coordinates for the model component.
 
         This is returning an array of the proper length with identical values.
@@ -473,7 +673,9 @@ class xGaussianDisk(xModelComponentBase):
         size : float
             The number of sky coordinate pairs to be generated.
         """
-        rvs = numpy.random.multivariate_normal(self.__mean, self.__cov, size)
+        if rng is None:
+            rng = numpy.random
+        rvs = rng.multivariate_normal(self.__mean, self.__cov, size)
         ra, dec = rvs[:,0], rvs[:,1]
         return (ra, dec)
 
@@ -508,7 +710,7 @@ class xExtendedSource(xModelComponentBase):
                                      None, min_validity_time, max_validity_time)
         self.image = xFITSImage(img_file_path)
 
-    def rvs_sky_coordinates(self, size=1):
+    def rvs_sky_coordinates(self, size=1, rng=None):
         """Generate random coordinates for the model component.
 
         Arguments
@@ -516,7 +718,7 @@ class xExtendedSource(xModelComponentBase):
         size : float
             The number of sky coordinate pairs to be generated.
         """
-        return self.image.rvs_coordinates(size)
+        return self.image.rvs_coordinates(size, rng=rng)
 
     def __str__(self):
         """String formatting.
@@ -594,6 +796,15 @@ class xROIModel(OrderedDict):
             txt += '- %s\n' % source
         return txt.strip('\n')
 
+    def num_expected_events(self, aeff, tstart, tstop):
+        """Return the expected number of events from all the sources in the
+        ROI in the time interval [tstart, tstop].
+
+        This is handy, e.g., to size the time slices of a simulation.
+        """
+        return sum([source.num_expected_events(aeff, tstart, tstop) for\
+                    source in self.values()])
+
     def build_hdu(self):
         """Build a FITS HDU for the source model.
 
@@ -621,15 +832,151 @@ class xROIModel(OrderedDict):
         sampling_time : array
             The array to sample the source light curve.
 
+        seed : int, optional
+            If not None, the events for each source are generated with an
+            independent random number generator spawned from this seed and
+            the source identifier (see
+            `ximpol.core.rand.random_generator()`), so that the event list of
+            any source is reproducible, independently of the others.
+            Otherwise the global numpy random state is used.
+
+        jobs : int, optional
+            The number of worker processes for the event generation (default
+            1, i.e., the sources are processed serially). The components of
+            the ROI are generated concurrently, each with its own random
+            number generator, and the result does not depend on the number of
+            jobs. If no seed is given, one is drawn from the global numpy
+            random state. This requires the fork start method, and reverts to
+            serial generation where it is not available.
+
         Warning
         -------
         The sampling_time should not be the same for all sources, and each
         source should be able to decide its own in a sensible way.
         (See issue #44.)
         """
-        event_list = xMonteCarloEventList()
+        seed = kwargs.pop('seed', None)
+        jobs = kwargs.pop('jobs', 1)
+        event_lists = None
+        if jobs is not None and jobs > 1 and len(self) > 1:
+            if seed is None:
+                seed = numpy.random.randint(0, 2**31 - 1)
+            event_lists = self.__rvs_event_lists_parallel(aeff, psf, modf,
+                                                          edisp, seed, jobs,
+                                                          **kwargs)
+        if event_lists is None:
+            event_lists = []
+            for source in self.values():
+                if seed is None:
+                    rng = None
+                else:
+                    rng = random_generator(seed, (source.identifier,))
+                event_lists.append(source.rvs_event_list(aeff, psf, modf,
+                                                         edisp, rng, **kwargs))
+        return xMonteCarloEventList.merge(event_lists)
+
+    def __rvs_event_lists_parallel(self, aeff, psf, modf, edisp, seed, jobs,
+                                   **kwargs):
+        """Generate the event lists for all the sources in a pool of worker
+        processes.
+
+        Return a list of event lists (one per source), in the same order of
+        the sources in the ROI model, or None if the fork start method is not
+        available.
+        """
+        global _PARALLEL_CONTEXT
+        context = _fork_context()
+        if context is None:
+            return None
+        jobs = min(jobs, len(self))
+        logger.info('Generating the events for %d sources with %d jobs...' %\
+                    (len(self), jobs))
+        _PARALLEL_CONTEXT = (self, (aeff, psf, modf, edisp), kwargs)
+        pool = context.Pool(jobs)
+        try:
+            tasks = [(i, seed) for i in range(len(self))]
+            event_lists = pool.map(_rvs_source_event_list, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+            _PARALLEL_CONTEXT = None
+        return event_lists
+
+    def rvs_slice_event_list(self, aeff, psf, modf, edisp, tmin, tmax,
+                             seed=None, slice_id=0, **kwargs):
+        """Extract the event list for the full ROI in the time slice
+        [tmin, tmax).
+
+        All the sources are generated with tstart=tmin and tstop=tmax. If
+        a seed is given, each source gets its own random number generator
+        spawned from the seed, the slice identifier and the source
+        identifier, so that the slices are statistically independent of
+        each other. The returned event list is time-ordered.
+        """
+        kwargs['tstart'] = tmin
+        kwargs['tstop'] = tmax
+        event_lists = []
         for source in self.values():
-            event_list += source.rvs_event_list(aeff, psf, modf, edisp,
-                                                **kwargs)
-        event_list.sort()
-        return event_list
+            if seed is None:
+                rng = None
+            else:
+                rng = random_generator(seed, (slice_id, source.identifier))
+            event_lists.append(source.rvs_event_list(aeff, psf, modf, edisp,
+                                                     rng, **kwargs))
+        return xMonteCarloEventList.merge(event_lists)
+
+    def rvs_event_list_slices(self, aeff, psf, modf, edisp, num_slices,
+                              **kwargs):
+        """Generator yielding the event lists for num_slices consecutive
+        time slices of equal length between tstart and tstop.
+
+        Since the slices are disjoint and each one is time-ordered, the
+        event lists can be concatenated in the order they are yielded to
+        obtain the time-ordered event list for the full observation,
+        with no need for a global sort. The number of events in each slice
+        is an independent Poisson variate.
+
+        The arguments are the same as in `rvs_event_list()`. With jobs > 1 the
+        slices are generated in a pool of worker processes and passed back
+        to the parent through temporary chunk files, so that at most a
+        handful of slices is held in memory at any time. The result does
+        not depend on the number of jobs.
+        """
+        seed = kwargs.pop('seed', None)
+        jobs = kwargs.pop('jobs', 1)
+        if seed is None:
+            seed = numpy.random.randint(0, 2**31 - 1)
+        edges = numpy.linspace(kwargs.pop('tstart'), kwargs.pop('tstop'),
+                               num_slices + 1)
+        tasks = [(i, edges[i], edges[i + 1], seed) for i in range(num_slices)]
+        context = None
+        if jobs is not None and jobs > 1 and num_slices > 1:
+            context = _fork_context()
+        if context is None:
+            for i, tmin, tmax, _seed in tasks:
+                logger.info('Generating time slice %d/%d (%.3f--%.3f s)...' %\
+                            (i + 1, num_slices, tmin, tmax))
+                yield self.rvs_slice_event_list(aeff, psf, modf, edisp, tmin,
+                                                tmax, _seed, i, **kwargs)
+            return
+        global _PARALLEL_CONTEXT
+        jobs = min(jobs, num_slices)
+        logger.info('Generating %d time slices with %d jobs...' %\
+                    (num_slices, jobs))
+        chunk_folder = tempfile.mkdtemp(prefix='ximpol_slices_')
+        tasks = [task + (chunk_folder,) for task in tasks]
+        _PARALLEL_CONTEXT = (self, (aeff, psf, modf, edisp), kwargs)
+        try:
+            pool = context.Pool(jobs)
+            try:
+                for file_path in pool.imap(_rvs_slice_chunk, tasks):
+                    event_list = xMonteCarloEventList.read_chunk(file_path)
+                    os.remove(file_path)
+                    yield event_list
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        finally:
+            _PARALLEL_CONTEXT = None
+            shutil.rmtree(chunk_folder, ignore_errors=True)
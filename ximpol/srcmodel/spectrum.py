@@ -19,8 +19,11 @@
 
 import numpy
 from ximpol.core.rand import xUnivariateGenerator, xUnivariateAuxGenerator
+from ximpol.core.rand import linear_segment_ppf
 from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
 from ximpol.core.spline import xInterpolatedBivariateSplineLinear
+from ximpol.core.spline import meshgrid_eval, cumulative_trapz
+from ximpol.core.spline import optimize_grid_linear
 
 
 def power_law(C, Gamma):
@@ -38,6 +41,182 @@ def power_law(C, Gamma):
     return _function
 
 
+def time_independent(energy_spectrum):
+    """Decorator flagging an energy spectrum as time-independent, i.e.,
+    such that energy_spectrum(E, t) does not depend on t.
+
+    This is only needed for functions that do not broadcast their arguments,
+    as time-independent spectra are otherwise detected automatically (see
+    `is_time_independent()`).
+    """
+    energy_spectrum.time_independent = True
+    return energy_spectrum
+
+
+def is_time_independent(energy_spectrum, E, t):
+    """Return True if an energy spectrum is time-independent over the time
+    grid t.
+
+    This is the case for spectra explicitly flagged through the
+    `time_independent()` decorator and for spectra that, evaluated on the
+    broadcastable arrays E[newaxis, :] and t[:, newaxis], return a single row
+    (which happens automatically for any function of the energy only, e.g.,
+    `lambda E, t: spline(E)`).
+    """
+    if getattr(energy_spectrum, 'time_independent', False):
+        return True
+    if len(t) < 2:
+        return True
+    _t = numpy.array([t[0], t[-1]], dtype=float)[:, numpy.newaxis]
+    _E = numpy.asarray(E, dtype=float)[numpy.newaxis, :]
+    _S = numpy.asarray(energy_spectrum(_E, _t))
+    return _S.ndim == 0 or (_S.ndim == 2 and _S.shape[0] == 1)
+
+
+def build_count_spectrum(source_spectrum, aeff, t, scale=1.):
+    """Return the count spectrum for a given source spectrum and effective
+    area, on a given time (or phase) grid.
+
+    Time-independent spectra (see `is_time_independent()`) are factorized
+    into a one-dimensional energy generator and a constant rate
+    (`xStationaryCountSpectrum`), while all the others go through the full
+    time-energy grid (`xCountSpectrum`). The two classes share the interface
+    used for the event generation.
+    """
+    if is_time_independent(source_spectrum, aeff.x, t):
+        return xStationaryCountSpectrum(source_spectrum, aeff, t, scale)
+    return xCountSpectrum(source_spectrum, aeff, t, scale)
+
+
+def energy_integrated_rate(energy_spectrum, E, t, weights=None):
+    """Return the energy-integrated rate of a source spectrum (optionally
+    multiplied by a set of weights on the energy grid E, e.g., the values of
+    the effective area) at the times t.
+
+    The spectrum is evaluated in a single vectorized call over the whole
+    time-energy grid (see `ximpol.core.spline.meshgrid_eval()`).
+    """
+    _S = meshgrid_eval(energy_spectrum, E, t)
+    if weights is not None:
+        _S = _S*weights
+    return cumulative_trapz(numpy.asarray(E, dtype=float), _S)[:, -1]
+
+
+def adaptive_sampling_time(energy_spectrum, tmin, tmax, E, weights=None,
+                           rtol=1e-2, num_start_points=101,
+                           max_num_points=1000, min_step=None):
+    """Return a grid of times in [tmin, tmax] over which the energy-integrated
+    rate of a source spectrum (see `energy_integrated_rate()`) is
+    piecewise-linear within a given relative tolerance.
+
+    The grid starts out uniform, with num_start_points points (note that
+    features narrower than the starting step might fall between the probes
+    and go undetected, so this should not be too coarse), and at each
+    iteration the rate is evaluated (in a single vectorized batch) at the
+    midpoints of all the intervals. The intervals where the rate at the
+    midpoint deviates from the linear interpolation by more than rtol times
+    the rate itself are split in two, until either all the intervals meet
+    the tolerance, the grid has max_num_points points, or the intervals
+    to be split are shorter than min_step (defaulting to 1e-6 times the
+    length of the time interval).
+
+    Finally, the grid is coarsened with `optimize_grid_linear()`, dropping
+    all the nodes that are not needed to keep the linear interpolation
+    within rtol of the rate at the nodes and at the midpoints of the
+    intervals meeting the tolerance, so that slowly varying sources end up
+    with a handful of points.
+
+    Time-independent spectra (see `is_time_independent()`) are sampled at
+    the two ends of the interval only.
+    """
+    _t = numpy.array([tmin, tmax], dtype=float)
+    if is_time_independent(energy_spectrum, E, _t):
+        return _t
+    if min_step is None:
+        min_step = 1e-6*(tmax - tmin)
+    _t = numpy.linspace(tmin, tmax, num_start_points)
+    _r = energy_integrated_rate(energy_spectrum, E, _t, weights)
+    while True:
+        _tmid = 0.5*(_t[1:] + _t[:-1])
+        _rmid = energy_integrated_rate(energy_spectrum, E, _tmid, weights)
+        _err = abs(_rmid - 0.5*(_r[1:] + _r[:-1]))
+        _mask = (_err > rtol*abs(_rmid))
+        _idx = numpy.nonzero(_mask*(numpy.diff(_t) > min_step))[0]
+        if len(_idx) == 0 or len(_t) >= max_num_points:
+            break
+        # If we are running out of points, split the intervals with the
+        # largest contribution to the error on the integral first.
+        _room = max_num_points - len(_t)
+        if len(_idx) > _room:
+            _weight = (_err*numpy.diff(_t))[_idx]
+            _idx = numpy.sort(_idx[numpy.argsort(_weight)[-_room:]])
+        _t = numpy.insert(_t, _idx + 1, _tmid[_idx])
+        _r = numpy.insert(_r, _idx + 1, _rmid[_idx])
+    # Coarsen the grid, using the midpoints of the intervals meeting the
+    # tolerance as additional probes.
+    _idx = numpy.nonzero(~_mask)[0]
+    _tall = numpy.insert(_t, _idx + 1, _tmid[_idx])
+    _rall = numpy.insert(_r, _idx + 1, _rmid[_idx])
+    _tcoarse, _rcoarse = optimize_grid_linear(_tall, _rall, rtol)
+    if len(_tcoarse) < len(_t):
+        _t = _tcoarse
+    return _t
+
+
+class xStationaryCountSpectrum(xUnivariateGenerator):
+
+    """Class representing the count spectrum of a time-independent source
+    spectrum, i.e., a one-dimensional energy distribution times a constant
+    rate:
+
+    .. math::
+       \\mathcal{C}(E) = \\mathcal{S}(E) \\times A_{\\rm eff}(E)
+       \\quad [\\text{s}^{-1}~\\text{keV}^{-1}].
+
+    The energies are extracted independently of the time, inverting exactly
+    the cdf of the (piecewise-linear) count spectrum, in the same way as
+    `xUnivariateAuxGenerator.rvs_exact()` does for each row of the
+    time-energy table, and the light curve is flat over the time (or phase)
+    interval spanned by t.
+    """
+
+    def __init__(self, source_spectrum, aeff, t, scale=1.):
+        """Constructor.
+        """
+        _E = aeff.x
+        _y = scale*source_spectrum(_E, t[0])*aeff(_E)
+        fmt = dict(rvname='Energy', rvunits='keV',
+                   pdfname='dN/dE $\\times$ aeff',
+                   pdfunits='s$^{-1}$ keV$^{-1}$')
+        xUnivariateGenerator.__init__(self, _E, _y, **fmt)
+        self.cdf_values = cumulative_trapz(self.x, self.y)
+        self.rate = self.cdf_values[-1]
+        self.light_curve = self.build_light_curve(t)
+
+    def build_light_curve(self, t):
+        """Build the (flat) light curve.
+        """
+        _x = numpy.array([t[0], t[-1]], dtype=float)
+        fmt = dict(rvname='Time', rvunits='s',
+                   pdfname='Energy-integrated (%.2f--%.2f keV) spectrum' %\
+                   (self.xmin(), self.xmax()), pdfunits='Hz')
+        return xUnivariateGenerator(_x, numpy.full(2, self.rate), **fmt)
+
+    def rvs(self, t, rng=None):
+        """Return random energies for a given array of times (the energies
+        do not depend on the times, except for the size of the output).
+
+        (See `random_generator()` for the meaning of the `rng` argument.)
+        """
+        if rng is None:
+            rng = numpy.random
+        _u = rng.uniform(size=len(t))*self.cdf_values[-1]
+        _k = numpy.searchsorted(self.cdf_values, _u, side='right') - 1
+        _k = numpy.clip(_k, 0, len(self.x) - 2)
+        return linear_segment_ppf(self.x[_k], self.x[_k + 1], self.y[_k],
+                                  self.y[_k + 1], _u - self.cdf_values[_k])
+
+
 class xCountSpectrum(xUnivariateAuxGenerator):
 
     """Class representing a count spectrum, i.e., the convolution of the
@@ -53,6 +232,13 @@ class xCountSpectrum(xUnivariateAuxGenerator):
 
     Note that the light curve corresponding to the count spectrum is
     calculated when a class object is instantiated.
+
+    The spectrum is tabulated once on the time-energy grid, and the
+    cumulative integrals of its rows (i.e., along the energy axis) are
+    calculated once and for all. Both the light curve and the tables for
+    the exact extraction of the energy at any given time (see
+    `xUnivariateAuxGenerator.rvs_exact()`) come straight from these arrays,
+    with no need to build the vertical ppf of the underlying spline.
     """
 
     def __init__(self, source_spectrum, aeff, t, scale=1.):
@@ -72,10 +258,15 @@ class xCountSpectrum(xUnivariateAuxGenerator):
         def _pdf(E, t):
             """Return the convolution between the effective area and
             the input photon spectrum.
+
+            (This is evaluated on the broadcast time-energy grid, see
+            `ximpol.core.spline.meshgrid_eval()`, so that the effective area
+            is only evaluated once on the energy grid.)
             """
-            return scale*source_spectrum(E, t)*numpy.tile(aeff(E[0]), (t.shape[0], 1))
+            return scale*source_spectrum(E, t)*aeff(E)
 
-        xUnivariateAuxGenerator.__init__(self, t, aeff.x, _pdf, **fmt)
+        xUnivariateAuxGenerator.__init__(self, t, aeff.x, _pdf, exact=True,
+                                         **fmt)
         self.light_curve = self.build_light_curve()
 
     def build_time_integral(self, tmin=None, tmax=None):
@@ -94,7 +285,7 @@ class xCountSpectrum(xUnivariateAuxGenerator):
         if tmax is None:
             tmax = self.xmax()
         _x = self.y
-        _y = numpy.array([self.hslice(_E).integral(tmin, tmax) for _E in _x])
+        _y = self.integral_cols(tmin, tmax)
         fmt = dict(rvname=self.yname, rvunits=self.yunits,
                    pdfname='Time-integrated (%d--%d s) spectrum' %\
                    (tmin, tmax), pdfunits='keV$^{-1}$')
@@ -116,7 +307,7 @@ class xCountSpectrum(xUnivariateAuxGenerator):
         if emax is None:
             emax = self.ymax()
         _x = self.x
-        _y = numpy.array([self.vslice(_t).integral(emin, emax) for _t in _x])
+        _y = self.integral_rows(emin, emax)
         fmt = dict(rvname=self.xname, rvunits=self.xunits,
                    pdfname='Energy-integrated (%.2f--%.2f keV) spectrum' %\
                    (emin, emax), pdfunits='Hz')
@@ -126,7 +317,10 @@ class xCountSpectrum(xUnivariateAuxGenerator):
         """Build the light curve, i.e., the count spectrum, integrated over the
         entire energy range, as a function of time.
         """
-        return self.build_energy_integral(self.ymin(), self.ymax())
+        fmt = dict(rvname=self.xname, rvunits=self.xunits,
+                   pdfname='Energy-integrated (%.2f--%.2f keV) spectrum' %\
+                   (self.ymin(), self.ymax()), pdfunits='Hz')
+        return xUnivariateGenerator(self.x, self.row_norm, **fmt)
 
     def num_expected_counts(self, tmin=None, tmax=None, emin=None, emax=None):
         """Return the number of expected counts within a given time interval
@@ -0,0 +1,13 @@
+
+
+"""Point the IRF cache to a temporary folder, so that the unit tests never
+write to (or read from) the cache of the user.
+"""
+import os
+import atexit
+import shutil
+import tempfile
+
+XIMPOL_TEST_CACHE = tempfile.mkdtemp(prefix='ximpol_cache_')
+os.environ['XIMPOL_CACHE'] = XIMPOL_TEST_CACHE
+atexit.register(shutil.rmtree, XIMPOL_TEST_CACHE, True)
@@ -105,6 +105,45 @@ class TestAzimuthalResponse(unittest.TestCase):
         save_current_figure('test_azimuthal_resp_rvs.png',
                             show=self.interactive)
 
+    def test_rvs_chisquare(self, num_events=1000000):
+        """Test that the random angles are distributed according to the
+        underlying (analytic) cdf.
+        """
+        binning = numpy.linspace(0, 2*numpy.pi, 101)
+        for visibility, phase in [(0., 0.), (0.5, 0.25*numpy.pi), (1., 1.)]:
+            _v = numpy.full(num_events, visibility)
+            phi = self.generator.rvs_phi(_v, phase)
+            obs, _ = numpy.histogram(phi, bins=binning)
+            exp = num_events*numpy.diff(self.generator.cdf(binning - phase,
+                                                           visibility))
+            chisquare = ((obs - exp)**2/exp).sum()
+            ndof = len(exp) - 1
+            self.assertTrue(chisquare < ndof + 5*numpy.sqrt(2*ndof),
+                            'chisquare %.3f/%d' % (chisquare, ndof))
+
+    def test_fit_histograms(self, num_events=100000):
+        """Test the batched linear fit of azimuthal distributions.
+        """
+        binning = numpy.linspace(0, 2*numpy.pi, 101)
+        params = [(0.1, 0.5), (0.5, 0.25*numpy.pi), (0.9, 3.)]
+        counts = []
+        for visibility, phase in params:
+            _v = numpy.full(num_events, visibility)
+            phi = self.generator.rvs_phi(_v, phase)
+            counts.append(numpy.histogram(phi, bins=binning)[0])
+        fit_results = self.generator.fit_histograms(counts, binning)
+        self.assertEqual(len(fit_results), len(params))
+        for (visibility, phase), _fr, _counts in\
+            zip(params, fit_results, counts):
+            self.assertTrue(abs(_fr.visibility - visibility) <
+                            5*_fr.visibility_error, _fr)
+            self.assertTrue(abs(_fr.phase - phase) < 5*_fr.phase_error, _fr)
+            self.assertTrue(_fr.chisquare < _fr.ndof +\
+                            5*numpy.sqrt(2*_fr.ndof))
+            _single = self.generator.fit_histogram((_counts, binning, None))
+            self.assertTrue(numpy.allclose(_single.popt, _fr.popt))
+            self.assertTrue(numpy.allclose(_single.pcov, _fr.pcov))
+
 
 if __name__ == '__main__':
     unittest.main(exit=not sys.flags.interactive)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the evt.binning module.
+"""
+
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy
+import unittest
+
+from ximpol import XIMPOL_BIN, XIMPOL_CONFIG
+sys.path.append(XIMPOL_BIN)
+from xpobssim import xpobssim, PARSER as XPOBSSIM_PARSER
+from ximpol.evt.binning import xEventBinningBase, xEventBinningMCUBE
+from ximpol.evt.event import xEventFile
+from ximpol.irf import load_mrf
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+CONFIG_FILE_PATH = os.path.join(XIMPOL_CONFIG, 'single_point_source.py')
+
+
+class TestEventBinning(unittest.TestCase):
+
+    """Unit test for the event binning facilities.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.folder_path = tempfile.mkdtemp(prefix='ximpol_binning_')
+        outfile = os.path.join(cls.folder_path, 'events.fits')
+        args = ['--configfile', CONFIG_FILE_PATH, '--outfile', outfile,
+                '--duration', '10', '--seed', '3']
+        cls.evfile = xpobssim(**XPOBSSIM_PARSER.parse_args(args).__dict__)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Teardown.
+        """
+        shutil.rmtree(cls.folder_path, ignore_errors=True)
+
+    def test_digitize(self):
+        """Make sure that the bin indices follow the same convention as
+        numpy.histogram.
+        """
+        binning = numpy.linspace(1., 10., 11)
+        values = numpy.random.uniform(0., 11., 100000)
+        values = numpy.append(values, binning)
+        index = xEventBinningBase.digitize(values, binning)
+        _mask = index >= 0
+        counts = numpy.bincount(index[_mask], minlength=len(binning) - 1)
+        self.assertTrue(numpy.array_equal(counts,
+                                          numpy.histogram(values, binning)[0]))
+        _outside = (values < binning[0]) + (values > binning[-1])
+        self.assertTrue(numpy.array_equal(_outside, index < 0))
+
+    def test_mcube(self):
+        """Bin a small event file in a modulation cube, and compare the
+        content of each energy bin with a direct calculation.
+
+        Some of the energy bin edges are set to the energy of actual events,
+        in order to test the edge convention.
+        """
+        energy = xEventFile(self.evfile).event_data['ENERGY']
+        _e = numpy.sort(energy[(energy > 2.)*(energy < 8.)])
+        ebinning = [2., float(_e[len(_e)//3]), float(_e[2*len(_e)//3]),
+                    float(_e[-1])]
+        kwargs = dict(algorithm='MCUBE', ebinalg='LIST', ebinning=ebinning,
+                      phibins=30, outfile=os.path.join(self.folder_path,
+                                                       'events_mcube.fits'))
+        event_binning = xEventBinningMCUBE(self.evfile, **kwargs)
+        emin, emax, emean, effmu, counts, mdp, phi_hist =\
+            event_binning.make_data()
+        self.assertEqual(phi_hist.shape, (len(ebinning) - 1, 30))
+        self.assertTrue(numpy.array_equal(counts, phi_hist.sum(axis=1)))
+        modf = load_mrf(xEventFile(self.evfile).irf_name())
+        for i, (_emin, _emax) in enumerate(zip(emin, emax)):
+            if i == len(emin) - 1:
+                _mask = (energy >= _emin)*(energy <= _emax)
+            else:
+                _mask = (energy >= _emin)*(energy < _emax)
+            self.assertEqual(counts[i], _mask.sum())
+            self.assertAlmostEqual(emean[i], energy[_mask].mean(), 5)
+            self.assertAlmostEqual(effmu[i], modf(energy[_mask]).mean(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
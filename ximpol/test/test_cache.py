@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the irf.cache module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import numpy
+import unittest
+
+from ximpol.irf import irf_file_path
+from ximpol.irf.cache import cached_tables, cache_key, cache_folder
+from ximpol.irf.rmf import xEnergyDispersionSampler
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+class TestCache(unittest.TestCase):
+
+    """Unit test for the IRF cache.
+    """
+
+    def setUp(self):
+        """Create a temporary cache folder.
+        """
+        self.folder_path = tempfile.mkdtemp()
+        self.file_path = irf_file_path('xipe_baseline', 'rmf')
+        self.num_calls = 0
+
+    def tearDown(self):
+        """Remove the temporary cache folder.
+        """
+        shutil.rmtree(self.folder_path)
+
+    def builder(self):
+        """Dummy table builder, keeping track of the number of calls.
+        """
+        self.num_calls += 1
+        return dict(x=numpy.linspace(0., 1., 11), n=numpy.arange(5))
+
+    def test_cached_tables(self):
+        """Make sure that the tables are built once and loaded afterwards.
+        """
+        tables = cached_tables(self.file_path, 'test', self.builder,
+                               self.folder_path)
+        _tables = cached_tables(self.file_path, 'test', self.builder,
+                                self.folder_path)
+        self.assertEqual(self.num_calls, 1)
+        self.assertTrue(isinstance(_tables['x'], numpy.memmap))
+        for key in tables:
+            self.assertTrue(numpy.array_equal(tables[key], _tables[key]))
+        cached_tables(self.file_path, 'test2', self.builder, self.folder_path)
+        self.assertEqual(self.num_calls, 2)
+        cached_tables(self.file_path, 'test', self.builder, '')
+        self.assertEqual(self.num_calls, 3)
+        self.assertNotEqual(cache_key(self.file_path, 'test'),
+                            cache_key(self.file_path, 'test2'))
+        self.assertEqual(len(os.listdir(self.folder_path)), 2)
+
+    def test_corrupted_entry(self):
+        """Make sure that a truncated cache entry is rebuilt.
+        """
+        cached_tables(self.file_path, 'test', self.builder, self.folder_path)
+        dir_path = os.path.join(self.folder_path,
+                                cache_key(self.file_path, 'test'))
+        with open(os.path.join(dir_path, 'x.npy'), 'wb') as npy_file:
+            npy_file.write(b'\x93NUMPY')
+        tables = cached_tables(self.file_path, 'test', self.builder,
+                               self.folder_path)
+        self.assertEqual(self.num_calls, 2)
+        self.assertTrue(numpy.array_equal(tables['x'],
+                                          numpy.linspace(0., 1., 11)))
+        _tables = cached_tables(self.file_path, 'test', self.builder,
+                                self.folder_path)
+        self.assertEqual(self.num_calls, 2)
+        self.assertTrue(isinstance(_tables['x'], numpy.memmap))
+
+    def test_cache_folder(self):
+        """Make sure that the cache folder is resolved at call time.
+        """
+        _env = os.environ.get('XIMPOL_CACHE')
+        try:
+            os.environ['XIMPOL_CACHE'] = self.folder_path
+            self.assertEqual(cache_folder(), self.folder_path)
+            cached_tables(self.file_path, 'test', self.builder)
+            self.assertEqual(len(os.listdir(self.folder_path)), 1)
+            os.environ['XIMPOL_CACHE'] = ''
+            cached_tables(self.file_path, 'test', self.builder)
+            self.assertEqual(self.num_calls, 2)
+        finally:
+            if _env is None:
+                os.environ.pop('XIMPOL_CACHE')
+            else:
+                os.environ['XIMPOL_CACHE'] = _env
+
+    def test_rmf_sampler(self):
+        """Make sure that the cached rmf sampler is identical to the original
+        one.
+        """
+        from astropy.io import fits
+        hdu = fits.open(self.file_path)['MATRIX']
+        tables = xEnergyDispersionSampler.build_tables(hdu)
+        _tables = cached_tables(self.file_path,
+                                xEnergyDispersionSampler.CACHE_LABEL,
+                                lambda: tables, self.folder_path)
+        _tables = cached_tables(self.file_path,
+                                xEnergyDispersionSampler.CACHE_LABEL,
+                                self.builder, self.folder_path)
+        self.assertEqual(self.num_calls, 0)
+        for key in tables:
+            self.assertTrue(numpy.array_equal(tables[key], _tables[key]))
+
+
+if __name__ == '__main__':
+    unittest.main()
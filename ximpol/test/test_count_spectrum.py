@@ -27,8 +27,13 @@ import sys
 
 from ximpol import XIMPOL_IRF
 from ximpol.irf.arf import xEffectiveArea
-from ximpol.srcmodel.spectrum import xCountSpectrum
+from ximpol.srcmodel.spectrum import xCountSpectrum, xStationaryCountSpectrum
+from ximpol.srcmodel.spectrum import build_count_spectrum, time_independent
+from ximpol.srcmodel.spectrum import adaptive_sampling_time
+from ximpol.srcmodel.spectrum import energy_integrated_rate
 from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
+from ximpol.core.spline import cumulative_trapz
+from ximpol.core.rand import random_generator
 from ximpol.utils.matplotlib_ import pyplot as plt
 from ximpol.utils.matplotlib_ import overlay_tag, save_current_figure
 
@@ -323,6 +328,109 @@ class TestCountSpectrum(unittest.TestCase):
         save_current_figure('test_power_law_rvs_counts.png',
                             show=self.interactive)
 
+    def test_stationary_factorization(self):
+        """Test the one-dimensional fast path for time-independent spectra.
+
+        The count spectrum of a time-independent power law must be
+        factorized into an xStationaryCountSpectrum, with the same light
+        curve as the full time-energy xCountSpectrum, while time-dependent
+        spectra must still go through the full grid.
+        """
+        _t = numpy.linspace(0., 100., 10)
+
+        def stationary(E, t):
+            return numpy.power(E, -2.)
+
+        def variable(E, t):
+            return (1. + 0.01*t)*numpy.power(E, -2.)
+
+        @time_independent
+        def flagged(E, t):
+            return numpy.array([x**-2. for x in numpy.ravel(E)])
+
+        count_spectrum = build_count_spectrum(stationary, self.aeff, _t)
+        self.assertTrue(isinstance(count_spectrum, xStationaryCountSpectrum))
+        ref = xCountSpectrum(stationary, self.aeff, _t)
+        _norm = count_spectrum.light_curve.norm()
+        _ref_norm = ref.light_curve.norm()
+        self.assertTrue(abs(_norm - _ref_norm) < 1e-6*_ref_norm)
+        _energy = count_spectrum.rvs(_t)
+        self.assertEqual(len(_energy), len(_t))
+        self.assertTrue((_energy >= self.aeff.xmin()).all())
+        self.assertTrue((_energy <= self.aeff.xmax()).all())
+        # The energies must be extracted exactly from the piecewise-linear
+        # count spectrum, the same way as in the two-dimensional case, i.e.,
+        # the fraction of events below each node must match the cdf.
+        num_events = 200000
+        _tt = numpy.full(num_events, 50.)
+        _cdf = count_spectrum.cdf_values/count_spectrum.cdf_values[-1]
+        _delta = 5./numpy.sqrt(num_events)
+        for spectrum in (count_spectrum, ref):
+            _energy = numpy.sort(spectrum.rvs(_tt, random_generator(1)))
+            _frac = numpy.searchsorted(_energy, count_spectrum.x)/\
+                    float(num_events)
+            self.assertTrue(abs(_frac - _cdf).max() < _delta)
+        count_spectrum = build_count_spectrum(flagged, self.aeff, _t)
+        self.assertTrue(isinstance(count_spectrum, xStationaryCountSpectrum))
+        count_spectrum = build_count_spectrum(variable, self.aeff, _t)
+        self.assertTrue(isinstance(count_spectrum, xCountSpectrum))
+
+    def test_adaptive_sampling_time(self):
+        """Test the adaptive time grid for the count spectrum.
+
+        A time-independent spectrum is sampled at the two ends of the time
+        interval, a spectrum scaling linearly with time is coarsened down
+        to the two ends of the time interval, and a slowly varying spectrum
+        ends up with far fewer points than the starting grid. For a flaring
+        source (with the flare peaking in
+        between the nodes of the starting grid) the rate must be
+        piecewise-linear within the tolerance on the output grid, and the
+        integral of the rate must agree with that on a dense grid.
+        """
+        tmin = 0.
+        tmax = 1000.
+        _E = self.aeff.x
+        _w = self.aeff.y
+
+        def stationary(E, t):
+            return numpy.power(E, -2.)
+
+        def linear(E, t):
+            return (1. + 0.01*t)*numpy.power(E, -2.)
+
+        def quadratic(E, t):
+            return (1. + 1e-6*t**2)*numpy.power(E, -2.)
+
+        def flare(E, t):
+            return (1. + 10.*numpy.exp(-0.5*((t - 327.)/5.)**2))*\
+                numpy.power(E, -2.)
+
+        _t = adaptive_sampling_time(stationary, tmin, tmax, _E, _w)
+        self.assertTrue(numpy.allclose(_t, [tmin, tmax]))
+        _t = adaptive_sampling_time(linear, tmin, tmax, _E, _w)
+        self.assertTrue(numpy.allclose(_t, [tmin, tmax]))
+        rtol = 1e-2
+        _t = adaptive_sampling_time(quadratic, tmin, tmax, _E, _w, rtol=rtol)
+        self.assertTrue(len(_t) < 20, '%d points' % len(_t))
+        _tref = numpy.linspace(tmin, tmax, 1001)
+        _rref = energy_integrated_rate(quadratic, _E, _tref, _w)
+        _r = energy_integrated_rate(quadratic, _E, _t, _w)
+        _delta = abs(numpy.interp(_tref, _t, _r) - _rref)/_rref
+        self.assertTrue(_delta.max() < rtol)
+        _t = adaptive_sampling_time(flare, tmin, tmax, _E, _w, rtol=rtol)
+        self.assertTrue((numpy.diff(_t) > 0).all())
+        self.assertTrue(len(_t) < 1000)
+        _tmid = 0.5*(_t[1:] + _t[:-1])
+        _r = energy_integrated_rate(flare, _E, _t, _w)
+        _rmid = energy_integrated_rate(flare, _E, _tmid, _w)
+        _delta = abs(_rmid - 0.5*(_r[1:] + _r[:-1]))/_rmid
+        self.assertTrue(_delta.max() < rtol)
+        _tref = numpy.linspace(tmin, tmax, 100001)
+        _rref = energy_integrated_rate(flare, _E, _tref, _w)
+        _ref = cumulative_trapz(_tref, _rref)[-1]
+        _delta = abs(cumulative_trapz(_t, _r)[-1] - _ref)/_ref
+        self.assertTrue(_delta < rtol, 'integral diff. %.3e' % _delta)
+
 
 if __name__ == '__main__':
     unittest.main(exit=not sys.flags.interactive)
@@ -25,9 +25,10 @@ import numpy
 import unittest
 import sys
 
-from ximpol.core.rand import xUnivariateAuxGenerator
+from ximpol.core.rand import xUnivariateAuxGenerator, random_generator
+from ximpol.core.rand import xUnivariateGenerator
 from ximpol.config.crab_pulsar import energy_spectrum, pl_normalization_spline,\
-    pl_index_spline
+    pl_index_spline, crab_ephemeris, crab_pulsar
 from ximpol.utils.matplotlib_ import pyplot as plt
 from ximpol.utils.matplotlib_ import overlay_tag, save_current_figure
 
@@ -63,6 +64,39 @@ class TestCrabPulsarSpectrum(unittest.TestCase):
             delta = abs((_pl - _slice)/_pl).max()
             self.assertTrue(delta < 2.e-2, 'max deviation %.9f' % delta)
 
+    def test_ephemeris_inversion(self):
+        """Test the inversion of the ephemeris over a one-year baseline.
+        """
+        t = numpy.linspace(0., 3.15e7, 1000001)
+        phase = crab_ephemeris.phase(t)
+        _t = crab_ephemeris.time(phase)
+        delta = abs(_t - t).max()
+        self.assertTrue(delta < 1e-6, 'max deviation %.3e s' % delta)
+
+    def test_rvs_times(self):
+        """Test the generation of the event times over a long baseline.
+
+        The phases of the output times calculated from the ephemeris must
+        match the phases extracted from the light curve, and the number of
+        events must agree with the light curve integrated over the
+        (fractional) observation time.
+        """
+        _x = numpy.linspace(0., 1., 101)
+        _y = 1000.*(1. + numpy.cos(2*numpy.pi*_x))
+        light_curve = xUnivariateGenerator(_x, _y)
+        tstart = 1.e7 + 0.3/crab_ephemeris.nu0
+        tstop = tstart + 1000.25/crab_ephemeris.nu0
+        rng = random_generator(0)
+        phase, time = crab_pulsar.rvs_times(light_curve, tstart, tstop, rng)
+        self.assertTrue((time >= tstart).all() and (time < tstop).all())
+        _phase = crab_ephemeris.phase(time)
+        delta = abs(_phase - numpy.floor(_phase) - phase)
+        delta = numpy.minimum(delta, 1. - delta).max()
+        self.assertTrue(delta < 1e-5, 'max phase deviation %.3e' % delta)
+        num_expected = light_curve.norm()*(tstop - tstart)
+        self.assertTrue(abs(len(time) - num_expected) <\
+                        5.*numpy.sqrt(num_expected))
+
 
 
 if __name__ == '__main__':
@@ -56,9 +56,9 @@ class TestEnergyDispersion(unittest.TestCase):
         """
         """
         mc_energy = 10.
-        _ppf = self.edisp.matrix.vppf.vslice(mc_energy)
+        _ppf = self.edisp.matrix.generator.vppf.vslice(mc_energy)
         _e = numpy.full(num_events, mc_energy)
-        _slice = self.edisp.matrix.slice(mc_energy)
+        _slice = self.edisp.matrix.generator.slice(mc_energy)
         _ch = self.edisp.matrix.rvs(_e)
         n, bins, patches = plt.hist(_ch, bins=numpy.linspace(0, 255, 256),
                                     histtype='step')
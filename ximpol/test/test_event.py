@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Unit test for the evt.event module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import numpy
+import unittest
+
+from ximpol.evt.event import xMonteCarloEventList
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+def random_event_list(size, tmax=100.):
+    """Create a time-ordered event list with random content.
+    """
+    event_list = xMonteCarloEventList()
+    event_list.set_column('TIME', numpy.sort(numpy.random.uniform(0, tmax,
+                                                                  size)))
+    event_list.set_column('ENERGY', numpy.random.uniform(1, 10, size))
+    event_list.set_column('PHA', numpy.random.randint(0, 256, size))
+    event_list.set_column('MC_SRC_ID', size % 7)
+    return event_list
+
+
+class TestMonteCarloEventList(unittest.TestCase):
+
+    """Unit test for xMonteCarloEventList.
+    """
+
+    def test_columns(self):
+        """Test the basic column handling.
+        """
+        event_list = random_event_list(100)
+        self.assertEqual(len(event_list), 100)
+        self.assertEqual(event_list['TIME'].dtype, numpy.float64)
+        self.assertEqual(event_list['ENERGY'].dtype, numpy.float32)
+        self.assertTrue(numpy.all(event_list['MC_SRC_ID'] == 2))
+        self.assertTrue(numpy.all(event_list['PHASE'] == 0.))
+        self.assertEqual(sorted(event_list), sorted(event_list.keys()))
+
+    def test_append(self):
+        """Append many event lists and make sure that the capacity grows
+        geometrically.
+        """
+        event_list = xMonteCarloEventList()
+        _lists = [random_event_list(size) for size in range(50)]
+        num_reallocations = 0
+        for _list in _lists:
+            capacity = event_list.capacity()
+            event_list += _list
+            num_reallocations += (event_list.capacity() != capacity)
+        self.assertEqual(len(event_list), sum(range(50)))
+        self.assertTrue(num_reallocations < 15)
+        _time = numpy.concatenate([_list['TIME'] for _list in _lists])
+        self.assertTrue(numpy.array_equal(event_list['TIME'], _time))
+        _sum = _lists[10] + _lists[20]
+        self.assertEqual(len(_sum), 30)
+
+    def test_merge(self):
+        """The merge of time-ordered event lists must be identical to a stable
+        sort of the concatenated lists.
+        """
+        for num_lists in (1, 2, 5, 16):
+            _lists = [random_event_list(numpy.random.randint(0, 1000)) for\
+                      i in range(num_lists)]
+            # Force some ties, across different lists.
+            _lists[0].set_column('TIME', numpy.round(_lists[0]['TIME']))
+            _lists[-1].set_column('TIME', numpy.round(_lists[-1]['TIME']))
+            merged = xMonteCarloEventList.merge(_lists)
+            concatenated = xMonteCarloEventList.concatenate(_lists)
+            concatenated.sort()
+            self.assertEqual(len(merged), len(concatenated))
+            for name in merged:
+                self.assertTrue(numpy.array_equal(merged[name],
+                                                  concatenated[name]))
+        self.assertEqual(len(xMonteCarloEventList.merge([])), 0)
+
+    def test_chunk(self):
+        """Write an event list to a chunk file and read it back.
+        """
+        folder_path = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(folder_path, 'chunk.npy')
+            event_list = random_event_list(1000)
+            event_list.write_chunk(file_path)
+            _list = xMonteCarloEventList.read_chunk(file_path)
+            for name in event_list:
+                self.assertTrue(numpy.array_equal(event_list[name],
+                                                  _list[name]))
+        finally:
+            shutil.rmtree(folder_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
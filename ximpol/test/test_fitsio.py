@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Unit test for the core.fitsio module.
+"""
+
+
+import os
+import shutil
+import tempfile
+import numpy
+import unittest
+from astropy.io import fits
+
+from ximpol.core.fitsio import xPrimaryHDU, xBinTableHDUBase
+from ximpol.core.fitsio import xBinTableStreamWriter, write_header
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+class xBinTableHDUTest(xBinTableHDUBase):
+
+    NAME = 'TEST'
+    DATA_SPECS = [
+        ('TIME'   , 'D', 's'),
+        ('CHANNEL', 'I'),
+        ('ENERGY' , 'E', 'keV', 'the energy')
+    ]
+
+
+class TestStreamWriter(unittest.TestCase):
+
+    """Unit test for the streaming binary table writer.
+    """
+
+    def setUp(self):
+        """Create a temporary output folder.
+        """
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary output folder.
+        """
+        shutil.rmtree(self.folder_path)
+
+    def write(self, file_path, blocks, threaded):
+        """Write a file with a primary HDU and two test tables, the first
+        one in blocks.
+        """
+        with open(file_path, 'wb') as file_obj:
+            write_header(file_obj, xPrimaryHDU().header)
+            writer = xBinTableStreamWriter(file_obj, xBinTableHDUTest(),
+                                           threaded)
+            # The writing thread must only be started with the first block.
+            self.assertTrue(writer.thread is None)
+            for block in blocks:
+                writer.write(block)
+            writer.close()
+            writer = xBinTableStreamWriter(file_obj, xBinTableHDUTest())
+            writer.write(blocks[0])
+            writer.close()
+
+    def test_blocks(self):
+        """Write a table in blocks and make sure that astropy reads back the
+        concatenated columns.
+        """
+        blocks = []
+        for size in (1000, 0, 77, 2500):
+            blocks.append([numpy.sort(numpy.random.uniform(0, 10, size)),
+                           numpy.random.randint(0, 256, size),
+                           numpy.random.uniform(1, 10, size)])
+        for threaded in (False, True):
+            file_path = os.path.join(self.folder_path, 'test%d.fits' % threaded)
+            self.write(file_path, blocks, threaded)
+            hdu_list = fits.open(file_path)
+            hdu_list.verify('exception')
+            self.assertEqual(len(hdu_list), 3)
+            data = hdu_list[1].data
+            self.assertEqual(len(data), sum([len(b[0]) for b in blocks]))
+            for i, name in enumerate(xBinTableHDUTest.spec_names()):
+                _col = numpy.concatenate([b[i] for b in blocks])
+                self.assertTrue(numpy.allclose(data[name], _col))
+            self.assertEqual(len(hdu_list[2].data), len(blocks[0][0]))
+            hdu_list.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the irf.fold module.
+"""
+
+
+import numpy
+import unittest
+
+from ximpol.irf import load_irfs
+from ximpol.irf.fold import xForwardFolder
+from ximpol.srcmodel.spectrum import xCountSpectrum, power_law
+from ximpol.srcmodel.spectrum import time_independent
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+IRF_NAME = 'xipe_baseline'
+SPECTRUM = power_law(10., 2.)
+
+
+class TestForwardFolder(unittest.TestCase):
+
+    """Unit test for xForwardFolder.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        aeff, psf, modf, edisp = load_irfs(IRF_NAME)
+        cls.aeff = aeff
+        cls.folder = xForwardFolder(aeff, edisp, modf)
+        cls.t = numpy.linspace(0., 1000., 11)
+
+    def test_counts(self):
+        """Compare the folded counts with the integral of the count spectrum.
+        """
+        count_spectrum = xCountSpectrum(SPECTRUM, self.aeff, self.t)
+        ebinning = numpy.linspace(1., 10., 10)
+        counts, mu = self.folder.binned_counts(SPECTRUM, self.t,
+                                               ebinning, mc=True)
+        for _emin, _emax, _counts in zip(ebinning[:-1], ebinning[1:], counts):
+            _ref = count_spectrum.num_expected_counts(emin=_emin, emax=_emax)
+            self.assertTrue(abs(_counts/_ref - 1.) < 1e-3)
+        self.assertTrue(numpy.all((mu > 0.)*(mu < 1.)))
+        # The energy dispersion must preserve the total number of counts.
+        _true = self.folder.true_counts(SPECTRUM, self.t)
+        _pha = self.folder.channel_counts(SPECTRUM, self.t)
+        self.assertTrue(abs(_pha.sum()/_true.sum() - 1.) < 1e-9)
+
+    def test_slices(self):
+        """Make sure the counts scale with the width of the time slice.
+        """
+        _all = self.folder.true_counts(SPECTRUM, self.t).sum()
+        _slice = self.folder.true_counts(SPECTRUM, self.t, 120.,
+                                         370.).sum()
+        self.assertTrue(abs(_slice/_all - 0.25) < 1e-9)
+        counts, mu, mdp = self.folder.mdp99(SPECTRUM, self.t,
+                                            [2., 4., 8.])
+        self.assertTrue(numpy.allclose(mdp, 4.292/mu/numpy.sqrt(counts)))
+
+    def test_time_independent(self):
+        """Make sure that spectra flagged as time-independent, that do not
+        broadcast their arguments, are only evaluated on the energy grid and
+        integrated over time correctly.
+        """
+        num_points = []
+
+        @time_independent
+        def flagged(E, t):
+            num_points.append(numpy.size(E))
+            return numpy.array([SPECTRUM(_E, 0.) for _E in numpy.ravel(E)])
+
+        _ref = self.folder.true_counts(SPECTRUM, self.t, 120., 370.)
+        _counts = self.folder.true_counts(flagged, self.t, 120., 370.)
+        self.assertTrue(numpy.allclose(_counts, _ref, rtol=1e-9))
+        self.assertTrue(max(num_points) <= len(self.folder.energy))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU GengReral Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""Unit test for the srcmodel.img module.
+"""
+
+
+import os
+import numpy
+import unittest
+
+from ximpol import XIMPOL_CONFIG
+from ximpol.srcmodel.img import xFITSImage
+from ximpol.core.rand import random_generator
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+class TestFITSImage(unittest.TestCase):
+
+    """Unit test for xFITSImage.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup---here we read the image.
+        """
+        file_path = os.path.join(XIMPOL_CONFIG, 'fits', 'vela_2p0_8p0_keV.fits')
+        cls.image = xFITSImage(file_path)
+
+    def test_linear_wcs(self, num_points=10000):
+        """The linearized WCS transformation must agree with the full one
+        within the tolerance over the whole image.
+        """
+        self.assertTrue(self.image.linear_wcs is not None)
+        rng = random_generator(1)
+        _pix = rng.uniform(-0.5, 1., (num_points, 2))*self.image.data.shape
+        _ra, _dec = self.image.pix2world(_pix)
+        _world = self.image.wcs.wcs_pix2world(_pix, 1)
+        _dra = ((_ra - _world[:, 0] + 180.) % 360. - 180.)*\
+               numpy.cos(numpy.radians(_dec))
+        _err = numpy.sqrt(_dra**2 + (_dec - _world[:, 1])**2).max()
+        self.assertTrue(_err < 1./3600., 'max deviation %.3e deg' % _err)
+
+    def test_rvs_coordinates(self, num_points=100000):
+        """The random coordinates must fall in the pixels with non-zero
+        content, with the right frequencies.
+        """
+        rng = random_generator(2)
+        _ra, _dec = self.image.rvs_coordinates(num_points, rng=rng)
+        _world = numpy.vstack((_ra, _dec)).transpose()
+        _pix = numpy.rint(self.image.wcs.wcs_world2pix(_world, 1)).astype(int)
+        _data = self.image.data
+        _pix = numpy.clip(_pix, 0, numpy.array(_data.shape) - 1)
+        self.assertTrue((_data[_pix[:, 0], _pix[:, 1]] > 0).mean() > 0.99)
+        # Compare the fraction of events in the first half of the image.
+        _bright = _pix[:, 0] < _data.shape[0]//2
+        _exp = _data[:_data.shape[0]//2].sum()/_data.sum()
+        _sigma = numpy.sqrt(_exp*(1. - _exp)/num_points)
+        self.assertTrue(abs(_bright.mean() - _exp) < 5*_sigma + 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the IRF registry in the irf module.
+"""
+
+
+import unittest
+
+from ximpol.irf import load_mrf, load_irfs, xIrfSet, IRF_REGISTRY,\
+    clear_irf_registry
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+IRF_NAME = 'xipe_baseline'
+
+
+class TestIrfRegistry(unittest.TestCase):
+
+    """Unit test for the IRF registry.
+    """
+
+    def test_memoization(self):
+        """Make sure the IRFs are loaded once.
+        """
+        clear_irf_registry()
+        modf = load_mrf(IRF_NAME)
+        self.assertTrue(load_mrf(IRF_NAME) is modf)
+        self.assertEqual(len(IRF_REGISTRY), 1)
+        aeff, psf, _modf, edisp = load_irfs(IRF_NAME)
+        self.assertTrue(_modf is modf)
+        self.assertEqual(len(IRF_REGISTRY), 4)
+
+    def test_lazy_loading(self):
+        """Make sure the components of an IRF set are loaded on demand.
+        """
+        clear_irf_registry()
+        irfs = xIrfSet(IRF_NAME)
+        self.assertEqual(len(IRF_REGISTRY), 0)
+        modf = irfs.modf
+        self.assertEqual(len(IRF_REGISTRY), 1)
+        self.assertTrue(irfs.modf is modf)
+        self.assertTrue(load_mrf(IRF_NAME) is modf)
+        with self.assertRaises(AttributeError):
+            irfs.arf
+
+
+if __name__ == '__main__':
+    unittest.main()
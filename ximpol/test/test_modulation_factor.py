@@ -65,7 +65,7 @@ class TestModulationFactor(unittest.TestCase):
         """
         poldegree = numpy.full(num_events, polarization_degree)
         polangle = numpy.full(num_events, polarization_angle)
-        self.modf.generator.plot(show=False)
+        xAzimuthalResponseGenerator().plot(show=False)
         save_current_figure('test_modulation_constant_generator.png',
                             show=self.interactive)
         emin = self.modf.xmin()
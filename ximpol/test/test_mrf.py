@@ -27,6 +27,10 @@ import numpy
 from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
 from ximpol.detector.xipe import _full_path
 from ximpol.irf import load_mrf
+from ximpol.core.rand import random_generator
+from ximpol.srcmodel.roi import xPointSource
+from ximpol.srcmodel.spectrum import power_law
+from ximpol.srcmodel.polarization import constant, constant_value
 
 
 IRF_NAME = 'xipe_baseline'
@@ -54,6 +58,57 @@ class TestXipeMrf(unittest.TestCase):
         _delta = abs((_y - modf(_x))/_y)
         self.assertTrue(_delta.max() < 5e-3, 'max. diff. %.9f' % _delta.max())
 
+    def test_rvs_pe_angle(self, num_events=100000):
+        """Test the extraction of the photoelectron directions for constant
+        polarization.
+
+        The polarization degree and angle built with `constant()` are passed
+        to the modulation factor as scalars, and the output must be the same
+        as that obtained evaluating the polarization on each event. For an
+        unpolarized source the directions must be uniform.
+        """
+        modf = load_mrf(IRF_NAME)
+        energy = numpy.random.uniform(2., 8., num_events)
+        time = numpy.zeros(num_events)
+        ra = numpy.zeros(num_events)
+        dec = numpy.zeros(num_events)
+        self.assertEqual(constant_value(constant(0.3)), 0.3)
+        self.assertTrue(constant_value(lambda E, t, ra, dec: 0.3) is None)
+
+        def _per_event(value):
+            """Return a non-constant() function with a constant value.
+            """
+            return lambda E, t, ra, dec: numpy.full(len(E), value)
+
+        spectrum = power_law(10., 2.)
+        for degree in (0.5, 0.):
+            src = xPointSource('src', 0., 0., spectrum, constant(degree),
+                               constant(0.3))
+            ref = xPointSource('ref', 0., 0., spectrum, _per_event(degree),
+                               _per_event(0.3))
+            phi = src.rvs_pe_angle(modf, energy, time, ra, dec,
+                                   random_generator(1))
+            _phi = ref.rvs_pe_angle(modf, energy, time, ra, dec,
+                                    random_generator(2))
+            # Compare the modulation, in the form of the Stokes parameters.
+            _delta = 5./numpy.sqrt(num_events)
+            for f in (numpy.cos, numpy.sin):
+                _q = f(2*phi).mean()
+                self.assertTrue(abs(_q - f(2*_phi).mean()) < 2*_delta)
+            if degree > 0.:
+                _phi = ref.rvs_pe_angle(modf, energy, time, ra, dec,
+                                        random_generator(1))
+                self.assertTrue(numpy.allclose(phi, _phi))
+            else:
+                # Unpolarized source: plain uniform extraction.
+                _phi = random_generator(1).uniform(0., 2*numpy.pi,
+                                                   num_events)
+                self.assertTrue(numpy.allclose(phi, _phi))
+                self.assertTrue(abs(numpy.cos(2*phi).mean()) < _delta)
+                self.assertTrue(abs(numpy.sin(2*phi).mean()) < _delta)
+                self.assertTrue((phi >= 0.).all())
+                self.assertTrue((phi < 2*numpy.pi).all())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU GengReral Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+"""Unit test for the core.rand module.
+"""
+
+
+import numpy
+import unittest
+
+from ximpol.core.rand import xUnivariateAuxGenerator, random_generator
+from ximpol.core.rand import xAliasGenerator
+from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+def dNdE(E, t):
+    """Function defining a time-dependent energy spectrum.
+    """
+    return (1. + t)*numpy.power(E, (-1. - 0.1*t))
+
+
+class TestUnivariateAuxGenerator(unittest.TestCase):
+
+    """Unit test for xUnivariateAuxGenerator.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.t = numpy.linspace(0, 10, 11)
+        cls.E = numpy.linspace(1, 10, 50)
+        cls.generator = xUnivariateAuxGenerator(cls.t, cls.E, dNdE,
+                                                exact=True)
+
+    def test_rvs_exact(self, num_events=100000, t=3.4):
+        """The exact sampling must reproduce the pdf linearly interpolated
+        between the two bracketing rows of the table.
+        """
+        numpy.random.seed(1)
+        _E = self.generator.rvs(numpy.full(num_events, t))
+        self.assertTrue(_E.min() >= self.E[0] and _E.max() <= self.E[-1])
+        _w = t - numpy.floor(t)
+        _pdf = (1. - _w)*dNdE(self.E, numpy.floor(t)) +\
+               _w*dNdE(self.E, numpy.ceil(t))
+        _spline = xInterpolatedUnivariateSplineLinear(self.E, _pdf)
+        _exp = numpy.array([_spline.integral(_e1, _e2) for _e1, _e2 in\
+                            zip(self.E[:-1], self.E[1:])])
+        _exp *= num_events/_spline.norm()
+        _obs, _bins = numpy.histogram(_E, bins=self.E)
+        _chi2 = ((_obs - _exp)**2/_exp).sum()
+        _ndof = len(_exp) - 1
+        self.assertTrue(_chi2 < _ndof + 5*numpy.sqrt(2*_ndof),
+                        'chisquare %.3f/%d' % (_chi2, _ndof))
+
+
+class TestRandomGenerator(unittest.TestCase):
+
+    """Unit test for the random number generator factory.
+    """
+
+    def test_streams(self):
+        """Generators with the same seed and spawn key must produce the same
+        streams, and different spawn keys must produce different streams.
+        """
+        _u1 = random_generator(1, (0,)).uniform(size=100)
+        _u2 = random_generator(1, (0,)).uniform(size=100)
+        _u3 = random_generator(1, (1,)).uniform(size=100)
+        self.assertTrue(numpy.array_equal(_u1, _u2))
+        self.assertFalse(numpy.array_equal(_u1, _u3))
+
+
+class TestAliasGenerator(unittest.TestCase):
+
+    """Unit test for xAliasGenerator.
+    """
+
+    def test_table(self):
+        """The alias table must encode the input probabilities exactly (up
+        to round-off errors), including for zero and dominant weights.
+        """
+        rng = random_generator(1)
+        for _w in [numpy.array([0., 1., 2., 3.]), rng.uniform(size=1000),
+                   numpy.append(numpy.zeros(10), 1.),
+                   numpy.append(1000., numpy.ones(1000))]:
+            generator = xAliasGenerator(_w)
+            _n = generator.size
+            _p = generator.prob/_n + numpy.bincount(generator.alias,
+                                                    (1. - generator.prob)/_n,
+                                                    _n)
+            self.assertTrue(numpy.allclose(_p, _w/_w.sum(), rtol=1e-9,
+                                           atol=1e-12))
+
+    def test_rvs(self, num_events=100000):
+        """The random indices must follow the input probabilities.
+        """
+        _w = numpy.array([0., 1., 2., 3., 4.])
+        _idx = xAliasGenerator(_w).rvs(num_events, random_generator(2))
+        _obs = numpy.bincount(_idx, minlength=len(_w))
+        self.assertEqual(_obs[0], 0)
+        _exp = (num_events*_w/_w.sum())[1:]
+        _chi2 = ((_obs[1:] - _exp)**2/_exp).sum()
+        _ndof = len(_exp) - 1
+        self.assertTrue(_chi2 < _ndof + 5*numpy.sqrt(2*_ndof),
+                        'chisquare %.3f/%d' % (_chi2, _ndof))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,7 +26,8 @@ import numpy
 
 from ximpol.core.spline import xInterpolatedUnivariateSplineLinear
 from ximpol.detector.xipe import _full_path
-from ximpol.irf import load_rmf
+from ximpol.irf import load_rmf, irf_file_path
+from ximpol.irf.rmf import xEnergyDispersion, xEnergyDispersionSampler
 
 
 IRF_NAME = 'xipe_baseline'
@@ -52,11 +53,11 @@ class TestXipeRmf(unittest.TestCase):
         Take a number of vertical slices of the energy dispersion matrix
         and make sure they are normalized to unity.
         """
-        emin = self.edisp.matrix.xmin()
-        emax = self.edisp.matrix.xmax()
+        emin = self.edisp.matrix.generator.xmin()
+        emax = self.edisp.matrix.generator.xmax()
         de = emax - emin
         for energy in numpy.linspace(emin + 0.2*de, emax - 0.2*de, 10):
-            _delta = abs(self.edisp.matrix.vslice(energy).norm() - 1)
+            _delta = abs(self.edisp.matrix.generator.vslice(energy).norm() - 1)
             self.assertTrue(_delta < 1e-3, 'diff. %.9f' % _delta)
 
     def test_xipe_rmf_matrix_sigma(self):
@@ -69,7 +70,7 @@ class TestXipeRmf(unittest.TestCase):
         """
         _x, _y = numpy.loadtxt(GPD_ERES_FILE_PATH, unpack=True)
         for energy, fwhm in zip(_x, _y):
-            _slice = self.edisp.matrix.vslice(energy)
+            _slice = self.edisp.matrix.generator.vslice(energy)
             _ppf = _slice.build_ppf()
             _sigma = 0.5*(self.edisp.ebounds(_ppf(0.8413)) -\
                           self.edisp.ebounds(_ppf(0.1586)))
@@ -77,5 +78,78 @@ class TestXipeRmf(unittest.TestCase):
             self.assertTrue(_delta < 2e-2, 'diff. %.9f' % _delta)
 
 
+    def test_xipe_rmf_rvs(self, num_events=200000):
+        """Test the exact channel extraction.
+
+        Extract the channels for a few values of the true energy and
+        compare the resulting distribution with the corresponding row of the
+        response matrix.
+        """
+        _matrix = self.edisp.hdu_list['MATRIX'].data
+        sampler = self.edisp.matrix.sampler
+        for energy in [2., 5., 8.]:
+            _row = sampler.row_index(numpy.array([energy]))[0]
+            _pdf = _matrix['MATRIX'][_row]/_matrix['MATRIX'][_row].sum()
+            _ch = self.edisp.matrix.rvs(numpy.full(num_events, energy))
+            obs = numpy.bincount(_ch, minlength=len(_pdf))
+            exp = num_events*_pdf
+            _mask = exp > 5.
+            chisquare = ((obs - exp)[_mask]**2/exp[_mask]).sum()
+            ndof = _mask.sum()
+            self.assertTrue(chisquare < ndof + 5*numpy.sqrt(2*ndof),
+                            'chisquare %.3f/%d' % (chisquare, ndof))
+        _ch = numpy.arange(256)
+        self.assertTrue(numpy.allclose(self.edisp.ebounds.energy(_ch),
+                                       self.edisp.ebounds(_ch)))
+
+    def test_xipe_rmf_lazy_generator(self):
+        """Make sure that the generator underlying the energy dispersion
+        matrix is only built when needed, and only once.
+        """
+        edisp = xEnergyDispersion(irf_file_path(IRF_NAME, 'rmf'))
+        builds = []
+        build_generator = edisp.matrix.build_generator
+        def _build():
+            builds.append(None)
+            if len(builds) == 1:
+                raise RuntimeError('Build failure')
+            return build_generator()
+        edisp.matrix.build_generator = _build
+        edisp.matrix.rvs(numpy.full(10, 5.))
+        self.assertEqual(len(builds), 0)
+        # A failed build should be retried at the next access.
+        self.assertRaises(RuntimeError, lambda: edisp.matrix.generator)
+        generator = edisp.matrix.generator
+        self.assertEqual(len(builds), 2)
+        self.assertAlmostEqual(generator.xmin(),
+                               self.edisp.matrix.generator.xmin())
+        self.assertTrue(edisp.matrix.generator is generator)
+        self.assertEqual(len(builds), 2)
+
+    def test_rmf_first_channel(self):
+        """Make sure that the sampler returns absolute channel numbers
+        (i.e., the F_CHAN values) when the channel numbering does not start
+        from zero.
+        """
+        from astropy.io import fits
+        cols = [
+            fits.Column(name='ENERG_LO', format='E', array=[1., 2.]),
+            fits.Column(name='ENERG_HI', format='E', array=[2., 3.]),
+            fits.Column(name='N_GRP', format='I', array=[1, 1]),
+            fits.Column(name='F_CHAN', format='I', array=[2, 1]),
+            fits.Column(name='N_CHAN', format='I', array=[2, 1]),
+            fits.Column(name='MATRIX', format='3E',
+                        array=[[0.5, 0.5, 0.], [1., 0., 0.]])
+        ]
+        hdu = fits.BinTableHDU.from_columns(cols, name='MATRIX')
+        hdu.header['TLMIN4'] = 1
+        sampler = xEnergyDispersionSampler(hdu)
+        self.assertEqual(sampler.first_channel, 1)
+        _ch = sampler.rvs(numpy.full(1000, 1.5))
+        self.assertEqual(set(_ch), set([2, 3]))
+        _ch = sampler.rvs(numpy.full(1000, 2.5))
+        self.assertEqual(set(_ch), set([1]))
+
+
 if __name__ == '__main__':
     unittest.main()
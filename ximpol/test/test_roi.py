@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the event generation in the srcmodel.roi module.
+"""
+
+
+import numpy
+import unittest
+
+from ximpol.irf import load_irfs
+from ximpol.srcmodel import roi
+from ximpol.srcmodel.roi import xPointSource, xROIModel
+from ximpol.srcmodel.spectrum import power_law
+from ximpol.srcmodel.polarization import constant
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+IRF_NAME = 'xipe_baseline'
+TSTART = 0.
+TSTOP = 100.
+SEED = 13
+COLUMNS = ['TIME', 'ENERGY', 'PE_ANGLE']
+
+
+def build_roi_model():
+    """Build a ROI model with a steady and a linearly rising point source.
+    """
+    roi_model = xROIModel(10., 10.)
+    spectrum1 = power_law(lambda t: 0.1*(1. + t/10.), lambda t: 2.)
+    src1 = xPointSource('Rising source', 10., 10., spectrum1,
+                        constant(0.5), constant(numpy.radians(30.)))
+    spectrum2 = power_law(0.1, 2.)
+    src2 = xPointSource('Steady source', 10.01, 10., spectrum2,
+                        constant(0.), constant(0.))
+    roi_model.add_sources(src1, src2)
+    return roi_model
+
+
+class TestROIModel(unittest.TestCase):
+
+    """Unit test for the event generation of xROIModel.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.irfs = load_irfs(IRF_NAME)
+        cls.roi_model = build_roi_model()
+
+    def rvs_slices(self, num_slices, jobs):
+        """Generate the event lists for a given number of time slices.
+        """
+        return list(self.roi_model.rvs_event_list_slices(*self.irfs,
+                                                         num_slices=num_slices,
+                                                         tstart=TSTART,
+                                                         tstop=TSTOP,
+                                                         seed=SEED, jobs=jobs))
+
+    def assert_same_events(self, event_list1, event_list2):
+        """Make sure that two event lists have the same content.
+        """
+        self.assertEqual(len(event_list1), len(event_list2))
+        for col_name in COLUMNS:
+            self.assertTrue(numpy.array_equal(event_list1[col_name],
+                                              event_list2[col_name]))
+
+    def rvs_event_list(self, jobs):
+        """Generate the event list for the full observation.
+        """
+        return self.roi_model.rvs_event_list(*self.irfs, tstart=TSTART,
+                                             tstop=TSTOP, seed=SEED, jobs=jobs)
+
+    def test_event_list_jobs(self):
+        """Make sure that the event list does not depend on the number of
+        jobs, and that the merged list is time-ordered.
+        """
+        event_list1 = self.rvs_event_list(jobs=1)
+        event_list2 = self.rvs_event_list(jobs=2)
+        self.assertTrue(len(event_list1) > 0)
+        self.assert_same_events(event_list1, event_list2)
+        self.assertTrue(numpy.all(numpy.diff(event_list2['TIME']) >= 0))
+        _src_id = set(numpy.unique(event_list2['MC_SRC_ID']))
+        self.assertEqual(_src_id, set(source.identifier for source in\
+                                      self.roi_model.values()))
+        self.assertTrue(roi._PARALLEL_CONTEXT is None)
+
+    def test_event_list_serial_fallback(self):
+        """Make sure that the generation reverts to the serial mode (with the
+        same result) when the fork start method is not available.
+        """
+        _fork_context = roi._fork_context
+        roi._fork_context = lambda: None
+        try:
+            event_list = self.rvs_event_list(jobs=2)
+            event_lists = self.rvs_slices(3, jobs=2)
+        finally:
+            roi._fork_context = _fork_context
+        self.assert_same_events(event_list, self.rvs_event_list(jobs=1))
+        for event_list1, event_list2 in zip(self.rvs_slices(3, jobs=1),
+                                            event_lists):
+            self.assert_same_events(event_list1, event_list2)
+
+    def test_slices_time_ordered(self):
+        """Make sure that the concatenation of the time slices is
+        time-ordered, and that each slice is within its bounds.
+        """
+        num_slices = 5
+        edges = numpy.linspace(TSTART, TSTOP, num_slices + 1)
+        event_lists = self.rvs_slices(num_slices, jobs=1)
+        self.assertEqual(len(event_lists), num_slices)
+        for i, event_list in enumerate(event_lists):
+            self.assertTrue(len(event_list) > 0)
+            self.assertTrue(event_list['TIME'].min() >= edges[i])
+            self.assertTrue(event_list['TIME'].max() <= edges[i + 1])
+        _time = numpy.concatenate([_list['TIME'] for _list in event_lists])
+        self.assertTrue(numpy.all(numpy.diff(_time) >= 0))
+
+    def test_slices_jobs(self):
+        """Make sure that the time slices do not depend on the number of jobs.
+        """
+        num_slices = 5
+        event_lists1 = self.rvs_slices(num_slices, jobs=1)
+        event_lists2 = self.rvs_slices(num_slices, jobs=2)
+        self.assertEqual(len(event_lists2), num_slices)
+        for event_list1, event_list2 in zip(event_lists1, event_lists2):
+            self.assert_same_events(event_list1, event_list2)
+
+    def test_slices_context(self):
+        """Make sure that the context for the worker processes is kept for
+        the whole lifetime of the pool, and cleared afterwards.
+        """
+        event_lists = self.roi_model.rvs_event_list_slices(*self.irfs,
+                                                           num_slices=3,
+                                                           tstart=TSTART,
+                                                           tstop=TSTOP,
+                                                           seed=SEED, jobs=2)
+        next(event_lists)
+        self.assertTrue(roi._PARALLEL_CONTEXT is not None)
+        list(event_lists)
+        self.assertTrue(roi._PARALLEL_CONTEXT is None)
+        event_lists = self.roi_model.rvs_event_list_slices(*self.irfs,
+                                                           num_slices=3,
+                                                           tstart=TSTART,
+                                                           tstop=TSTOP,
+                                                           seed=SEED, jobs=2)
+        next(event_lists)
+        event_lists.close()
+        self.assertTrue(roi._PARALLEL_CONTEXT is None)
+
+    def test_slices_counts(self):
+        """Compare the number of events in each time slice with the integral
+        of the light curve over the slice.
+
+        The counts are independent Poisson variates, and we test the
+        chisquare against its expectation value (the number of slices).
+        """
+        num_slices = 20
+        edges = numpy.linspace(TSTART, TSTOP, num_slices + 1)
+        event_lists = self.rvs_slices(num_slices, jobs=1)
+        aeff = self.irfs[0]
+        obs = numpy.array([len(_list) for _list in event_lists])
+        exp = numpy.array([self.roi_model.num_expected_events(aeff, tmin, tmax)
+                           for tmin, tmax in zip(edges[:-1], edges[1:])])
+        # Make sure the test is sensitive to the time profile.
+        self.assertTrue(exp[-1] > 3*exp[0])
+        chisquare = ((obs - exp)**2/exp).sum()
+        self.assertTrue(chisquare < 2.5*num_slices,
+                        'chisquare %.3f/%d' % (chisquare, num_slices))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -127,6 +127,16 @@ class TestSplineLinear(unittest.TestCase):
         _delta = abs(cdf(self.s3.xmax()) - 1.)
         self.assertTrue(_delta < 1e-3, 'ppf(xmax) - 1 %.9f' % _delta)
 
+    def test_cdf_values(self):
+        """The cdf, calculated with the trapezoidal rule, must agree with
+        the (normalized) spline integral on the grid points.
+        """
+        cdf = self.s2.build_cdf()
+        _y = numpy.array([self.s2.integral(self.s2.xmin(), _x) for _x in\
+                          self.x2])/self.s2.norm()
+        _delta = abs(cdf(self.x2) - _y).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+
     def test_ppf(self):
         """ The ppf must be defined between 0 and 1 (where is equal to the
         xmin and xmax values of the original spline).
@@ -141,6 +151,201 @@ class TestSplineLinear(unittest.TestCase):
         _delta = abs(ppf(1) - self.s3.xmax())
         self.assertTrue(_delta < 1e-3, 'ppf(1) - xmax %.9f' % _delta)
 
+    def test_optimize(self):
+        """The optimized grid must approximate the original one within the
+        tolerance, with (many) less points.
+        """
+        _x = numpy.linspace(1, 10, 10000)
+        _y = numpy.power(_x, -2.)*(1. + 0.1*numpy.sin(_x))
+        for _tolerance, _relative in [(1e-4, True), (1e-5, False)]:
+            _ox, _oy = optimize_grid_linear(_x, _y, _tolerance, _relative)
+            self.assertTrue(len(_ox) < len(_x)/10)
+            self.assertEqual((_ox[0], _ox[-1]), (_x[0], _x[-1]))
+            _delta = abs(numpy.interp(_x, _ox, _oy) - _y)
+            if _relative:
+                _delta /= _y
+            self.assertTrue(_delta.max() <= _tolerance,
+                            'max. diff. %.9f' % _delta.max())
+        # A straight line should be reduced to its end points.
+        _ox, _oy = optimize_grid_linear(_x, 3*_x)
+        self.assertEqual(len(_ox), 2)
+
+    def test_backend(self):
+        """The numpy and the FITPACK backends must agree on the spline values
+        (including the extrapolation) and on the integrals.
+        """
+        set_linear_spline_backend('fitpack')
+        try:
+            _s = xInterpolatedUnivariateSplineLinear(self.x1, self.y1)
+        finally:
+            set_linear_spline_backend('numpy')
+        self.assertFalse(_s.numpy_backend)
+        self.assertTrue(self.s1.numpy_backend)
+        _x = numpy.linspace(-1, 2*numpy.pi + 1, 1000)
+        _delta = abs(self.s1(_x) - _s(_x)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        for _a, _b in [(-1., 2.), (0.5, 3.), (2., 0.5), (1., 10.)]:
+            _delta = abs(self.s1.integral(_a, _b) - _s.integral(_a, _b))
+            self.assertTrue(_delta < 1e-9, 'integral diff. %.9f' % _delta)
+        # And the integrals over arrays of intervals.
+        _a = numpy.linspace(-1., 6., 20)
+        for _spline in (self.s1, _s):
+            _delta = abs(_spline.integral(_a, _a + 1.) - numpy.array(\
+                [_spline.integral(_x, _x + 1.) for _x in _a])).max()
+            self.assertTrue(_delta < 1e-9, 'integral diff. %.9f' % _delta)
+
+    def test_fitpack_fallback(self):
+        """The functionalities not implemented by the numpy backend must be
+        delegated to FITPACK, and give the same results as a spline created
+        with the FITPACK backend.
+        """
+        set_linear_spline_backend('fitpack')
+        try:
+            _s = xInterpolatedUnivariateSplineLinear(self.x1, self.y1)
+        finally:
+            set_linear_spline_backend('numpy')
+        _x = numpy.linspace(-1, 2*numpy.pi + 1, 1000)
+        _s1 = xInterpolatedUnivariateSplineLinear(self.x1, self.y1)
+        # (FITPACK only finds the roots of cubic splines.)
+        self.assertRaises(NotImplementedError, _s1.roots)
+        self.assertTrue(numpy.allclose(_s1.get_knots(), _s.get_knots()))
+        self.assertTrue(numpy.allclose(_s1.get_coeffs(), _s.get_coeffs()))
+        self.assertTrue(numpy.allclose(_s1.derivative()(_x),
+                                       _s.derivative()(_x)))
+        self.assertTrue(numpy.allclose(_s1(_x, ext=3), _s(_x, ext=3)))
+        # And the numpy backend is still used for the rest.
+        self.assertTrue(_s1.numpy_backend)
+        # Weights are not supported by the numpy backend.
+        _s2 = xInterpolatedUnivariateSpline(self.x1, self.y1, k=1,
+                                            w=numpy.ones(self.num_points))
+        self.assertFalse(_s2.numpy_backend)
+
+    def test_uniform_grid(self):
+        """The index arithmetic on equally spaced grids must give the same
+        values as the binary search, also for slightly irregular grids.
+        """
+        self.assertTrue(self.s1.step is not None)
+        _x = (1. + 0.01*numpy.arange(1000)).astype(numpy.float32)
+        _y = numpy.sin(_x)
+        _s = xInterpolatedUnivariateSplineLinear(_x, _y)
+        self.assertTrue(_s.step is not None)
+        _xx = numpy.linspace(_x[0], _x[-1], 100000)
+        _delta = abs(_s(_xx) - numpy.interp(_xx, _x, _y)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        _delta = abs(_s(_x) - _y).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        # A grid whose spacings are all close to the average step, but
+        # drifting away from the uniform grid by several steps.
+        _n = 10000
+        _dx = numpy.where(numpy.arange(_n - 1) < _n//2, 1. + 9e-4, 1. - 9e-4)
+        _x = numpy.append(0., numpy.cumsum(_dx))
+        _y = numpy.sin(2*_x)
+        _s = xInterpolatedUnivariateSplineLinear(_x, _y)
+        self.assertTrue(_s.step is None)
+        _xx = numpy.linspace(_x[0], _x[-1], 100000)
+        _delta = abs(_s(_xx) - numpy.interp(_xx, _x, _y)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        _s = xInterpolatedUnivariateSplineLinear(_x, _x**2)
+        _ref = ((_x[1:]**2 + _x[:-1]**2)*_dx).sum()/2.
+        _delta = abs(_s.integral(_x[0], _x[-1]) - _ref)/_ref
+        self.assertTrue(_delta < 1e-9, 'integral diff. %.9f' % _delta)
+
+    def test_ppf_rows(self):
+        """The batched inversion of a table of cdfs must agree with the
+        row-by-row linear interpolation.
+        """
+        _x = numpy.linspace(0, 1, 50)
+        _cdf = numpy.vstack([_x**_p for _p in (0.5, 1., 2., 3.)])
+        _q = numpy.linspace(0, 1, 33)
+        _ppf = ppf_rows(_cdf, _x, _q)
+        for _row, _c in zip(_ppf, _cdf):
+            _delta = abs(_row - numpy.interp(_q, _c, _x)).max()
+            self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+
+    def test_meshgrid_eval(self):
+        """The evaluation on the broadcast grid must agree with the evaluation
+        on the full meshgrid, also for functions of one variable only and
+        for functions that do not broadcast.
+        """
+        _x = numpy.linspace(1, 10, 30)
+        _y = numpy.linspace(0, 5, 20)
+        _functions = [lambda x, y: numpy.power(x, -2. + 0.1*y),
+                      lambda x, y: numpy.power(x, -2.),
+                      lambda x, y: numpy.array([xx*yy for xx, yy in\
+                                                zip(x.ravel(), y.ravel())])]
+        for _f in _functions[:2]:
+            _z = meshgrid_eval(_f, _x, _y)
+            self.assertEqual(_z.shape, (len(_y), len(_x)))
+            _delta = abs(_z - _f(*numpy.meshgrid(_x, _y))).max()
+            self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        _z = meshgrid_eval(_functions[2], _x, _y)
+        _delta = abs(_z - numpy.outer(_y, _x)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+
+
+class TestBivariateSplineLinear(unittest.TestCase):
+
+    """Unit test for xInterpolatedBivariateSplineLinear.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.x = numpy.linspace(0, 1, 50)
+        cls.y = numpy.linspace(0, 2*numpy.pi, 60)
+        _y, _x = numpy.meshgrid(cls.y, cls.x)
+        cls.z = (1. + _x)*(1.5 + numpy.cos(_y))
+        cls.s1 = xInterpolatedBivariateSplineLinear(cls.x, cls.y, cls.z)
+        set_linear_spline_backend('fitpack')
+        try:
+            cls.s2 = xInterpolatedBivariateSplineLinear(cls.x, cls.y, cls.z)
+        finally:
+            set_linear_spline_backend('numpy')
+
+    def test_backend(self):
+        """The numpy and the FITPACK backends must agree on the spline values
+        (including points outside the grid) and on the integrals.
+        """
+        self.assertTrue(self.s1.numpy_backend)
+        self.assertFalse(self.s2.numpy_backend)
+        _x = numpy.random.uniform(-0.1, 1.1, 1000)
+        _y = numpy.random.uniform(-1, 7, 1000)
+        _delta = abs(self.s1(_x, _y) - self.s2(_x, _y)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        _delta = abs(self.s1(self.x, self.y, grid=True) - self.z).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        for _limits in [(-1., 2., -1., 8.), (0.2, 0.7, 1., 3.),
+                        (0.7, 0.2, 1., 3.)]:
+            _delta = abs(self.s1.integral(*_limits) -\
+                         self.s2.integral(*_limits))
+            self.assertTrue(_delta < 1e-9, 'integral diff. %.9f' % _delta)
+
+    def test_fitpack_fallback(self):
+        """The FITPACK-specific methods must work with the numpy backend as
+        well.
+        """
+        _s = xInterpolatedBivariateSplineLinear(self.x, self.y, self.z)
+        _x = numpy.random.uniform(0.1, 0.9, 100)
+        _y = numpy.random.uniform(1., 5., 100)
+        self.assertTrue(numpy.allclose(_s.ev(_x, _y), self.s2.ev(_x, _y)))
+        for _a, _b in zip(_s.get_knots(), self.s2.get_knots()):
+            self.assertTrue(numpy.allclose(_a, _b))
+        self.assertTrue(_s.numpy_backend)
+
+    def test_integral_rows_cols(self):
+        """The batch integrals must agree with the integrals of the
+        corresponding slices.
+        """
+        _rows = self.s1.integral_rows(1., 3.)
+        _ref = [self.s1.vslice(_x).integral(1., 3.) for _x in self.x]
+        _delta = abs(_rows - numpy.array(_ref)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+        _cols = self.s1.integral_cols(0.2, 0.7)
+        _ref = [self.s1.hslice(_y).integral(0.2, 0.7) for _y in self.y]
+        _delta = abs(_cols - numpy.array(_ref)).max()
+        self.assertTrue(_delta < 1e-9, 'max. diff. %.9f' % _delta)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the evt.stokes module.
+"""
+
+
+import numpy
+import unittest
+
+from ximpol.evt.stokes import xStokesAccumulator
+from ximpol.irf import load_mrf
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+class TestStokesAccumulator(unittest.TestCase):
+
+    """Unit test for xStokesAccumulator.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.modf = load_mrf('xipe_baseline')
+        cls.rng = numpy.random.RandomState(1)
+
+    def test_polarization(self):
+        """Recover the input polarization in a few energy bins.
+        """
+        num_events = 500000
+        pd = 0.3
+        pa = numpy.radians(30.)
+        energy = self.rng.uniform(2., 8., num_events)
+        mu = self.modf(energy)
+        phi = self.modf.rvs_phi(energy, pd, pa, self.rng)
+        index = numpy.digitize(energy, [2., 4., 6., 8.]) - 1
+        acc = xStokesAccumulator(3)
+        acc.fill(phi, mu, energy, index)
+        self.assertEqual(acc.counts().sum(), num_events)
+        _pd = acc.polarization_degree()
+        _pa = acc.polarization_angle()
+        self.assertTrue(numpy.all(abs(_pd - pd) <
+                                  5*acc.polarization_degree_error()))
+        self.assertTrue(numpy.all(abs(_pa - pa) <
+                                  5*acc.polarization_angle_error()))
+        self.assertTrue(numpy.all(acc.mdp99() < 0.05))
+
+    def test_merge(self):
+        """Make sure that merging two accumulators is equivalent to filling
+        a single one with all the events.
+        """
+        num_events = 10000
+        energy = self.rng.uniform(2., 8., num_events)
+        mu = self.modf(energy)
+        phi = self.modf.rvs_phi(energy, 0.5, 0., self.rng)
+        index = self.rng.randint(-1, 3, num_events)
+        acc = xStokesAccumulator(2)
+        acc.fill(phi, mu, energy, index)
+        acc1 = xStokesAccumulator(2)
+        acc1.fill(phi[:5000], mu[:5000], energy[:5000], index[:5000])
+        acc2 = xStokesAccumulator(2)
+        acc2.fill(phi[5000:], mu[5000:], energy[5000:], index[5000:])
+        merged = acc1 + acc2
+        self.assertEqual(merged.counts().sum(),
+                         numpy.sum((index >= 0)*(index < 2)))
+        for field in xStokesAccumulator.FIELDS:
+            self.assertTrue(numpy.allclose(getattr(merged, field),
+                                           getattr(acc, field)))
+        acc1 += acc2
+        self.assertTrue(numpy.allclose(acc1.stokes(), acc.stokes()))
+
+
+if __name__ == '__main__':
+    unittest.main()
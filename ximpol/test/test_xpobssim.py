@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016, the ximpol team.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+
+
+"""Unit test for the chunked (streaming) mode of xpobssim.
+"""
+
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy
+import unittest
+from astropy.io import fits
+
+from ximpol import XIMPOL_BIN, XIMPOL_CONFIG
+sys.path.append(XIMPOL_BIN)
+import xpobssim
+from ximpol.srcmodel import roi
+from ximpol.evt.event import xMonteCarloEventList
+from ximpol.config.multiple_point_sources import ROI_MODEL
+from ximpol.utils.logging_ import suppress_logging
+suppress_logging()
+
+
+CONFIG_FILE_PATH = os.path.join(XIMPOL_CONFIG, 'multiple_point_sources.py')
+DURATION = 10.
+SEED = 7
+CHUNK_SIZE = 500
+
+
+class TestXpobssim(unittest.TestCase):
+
+    """Unit test for xpobssim.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup.
+        """
+        cls.folder_path = tempfile.mkdtemp(prefix='ximpol_xpobssim_')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Teardown.
+        """
+        shutil.rmtree(cls.folder_path, ignore_errors=True)
+
+    def kwargs(self, file_name, *args):
+        """Return the keyword arguments for a given xpobssim command line.
+        """
+        outfile = os.path.join(self.folder_path, file_name)
+        args = ['--configfile', CONFIG_FILE_PATH, '--outfile', outfile,
+                '--duration', '%s' % DURATION, '--seed', '%d' % SEED] +\
+               list(args)
+        return xpobssim.PARSER.parse_args(args).__dict__
+
+    def test_chunk_size_from_args(self):
+        """Test the chunk size implied by the chunk_size and max_memory
+        switches.
+        """
+        kwargs = self.kwargs('dummy.fits')
+        self.assertTrue(xpobssim.chunk_size_from_args(**kwargs) is None)
+        kwargs = self.kwargs('dummy.fits', '--chunk-size', '1000')
+        self.assertEqual(xpobssim.chunk_size_from_args(**kwargs), 1000)
+        kwargs = self.kwargs('dummy.fits', '--chunk-size', '0')
+        self.assertEqual(xpobssim.chunk_size_from_args(**kwargs), 1)
+        # The memory budget is shared among the slices being generated (one
+        # per job) and three more, being written or waiting to be.
+        kwargs = self.kwargs('dummy.fits', '--max-memory', '100',
+                             '--jobs', '3')
+        chunk_size = int(1.e8/(6*xpobssim.MEMORY_PER_EVENT))
+        self.assertEqual(xpobssim.chunk_size_from_args(**kwargs), chunk_size)
+        # The tighter constraint wins.
+        kwargs = self.kwargs('dummy.fits', '--max-memory', '100',
+                             '--jobs', '3', '--chunk-size', '1000')
+        self.assertEqual(xpobssim.chunk_size_from_args(**kwargs), 1000)
+        kwargs = self.kwargs('dummy.fits', '--max-memory', '100',
+                             '--jobs', '3', '--chunk-size', '10000000')
+        self.assertEqual(xpobssim.chunk_size_from_args(**kwargs), chunk_size)
+
+    def test_num_slices_from_args(self):
+        """Test the number of time slices implied by the chunk size.
+        """
+        aeff = xpobssim.load_irfs('xipe_baseline')[0]
+        kwargs = self.kwargs('dummy.fits')
+        kwargs['tstop'] = kwargs['tstart'] + DURATION
+        num_events = ROI_MODEL.num_expected_events(aeff, kwargs['tstart'],
+                                                   kwargs['tstop'])
+        self.assertEqual(xpobssim.num_slices_from_args(ROI_MODEL, aeff,
+                                                       **kwargs), 1)
+        kwargs['chunk_size'] = CHUNK_SIZE
+        num_slices = xpobssim.num_slices_from_args(ROI_MODEL, aeff, **kwargs)
+        self.assertEqual(num_slices, int(numpy.ceil(num_events/CHUNK_SIZE)))
+        self.assertTrue(num_slices > 1)
+        kwargs['time_slices'] = 1000
+        self.assertEqual(xpobssim.num_slices_from_args(ROI_MODEL, aeff,
+                                                       **kwargs), 1000)
+
+    def test_chunked_simulation(self):
+        """Run the simulation in chunked mode with two jobs, and compare the
+        output file with the one written in one go with write_fits() from
+        the same time slices.
+        """
+        writer_class = xpobssim.xMonteCarloEventFileWriter
+        forked = []
+        class _writer_class(writer_class):
+            def __init__(self, *args, **kwargs):
+                # The worker processes must be forked before the writer
+                # opens the output file and starts its thread.
+                forked.append(roi._PARALLEL_CONTEXT is not None)
+                writer_class.__init__(self, *args, **kwargs)
+        kwargs = self.kwargs('chunked.fits', '--chunk-size', '%d' % CHUNK_SIZE,
+                             '--jobs', '2')
+        xpobssim.xMonteCarloEventFileWriter = _writer_class
+        try:
+            outfile = xpobssim.xpobssim(**kwargs)
+        finally:
+            xpobssim.xMonteCarloEventFileWriter = writer_class
+        self.assertEqual(forked, [True])
+        # Generate the reference file from the same time slices.
+        kwargs['tstop'] = kwargs['tstart'] + DURATION
+        aeff, psf, modf, edisp = xpobssim.load_irfs(kwargs['irfname'])
+        num_slices = xpobssim.num_slices_from_args(ROI_MODEL, aeff, **kwargs)
+        self.assertTrue(num_slices > 1)
+        event_lists = ROI_MODEL.rvs_event_list_slices(aeff, psf, modf, edisp,
+                                                      num_slices,
+                                                      tstart=kwargs['tstart'],
+                                                      tstop=kwargs['tstop'],
+                                                      seed=SEED)
+        event_list = xMonteCarloEventList.concatenate(list(event_lists))
+        simulation_info = xpobssim.xSimulationInfo()
+        simulation_info.gti_list = [(kwargs['tstart'], kwargs['tstop'])]
+        simulation_info.roi_model = ROI_MODEL
+        simulation_info.irf_name = kwargs['irfname']
+        simulation_info.edisp = edisp
+        reffile = os.path.join(self.folder_path, 'reference.fits')
+        event_list.write_fits(reffile, simulation_info)
+        hdu_list = fits.open(outfile)
+        ref_hdu_list = fits.open(reffile)
+        events = hdu_list['EVENTS']
+        ref_events = ref_hdu_list['EVENTS']
+        self.assertTrue(len(event_list) > num_slices)
+        self.assertEqual(events.header['NAXIS2'], len(event_list))
+        self.assertEqual(len(events.data), len(event_list))
+        self.assertTrue(numpy.all(numpy.diff(events.data['TIME']) >= 0))
+        self.assertEqual(events.columns.names, ref_events.columns.names)
+        for col_name in events.columns.names:
+            self.assertTrue(numpy.array_equal(events.data[col_name],
+                                              ref_events.data[col_name]))
+        for ext_name in ['GTI', 'ROITABLE']:
+            self.assertEqual(len(hdu_list[ext_name].data),
+                             len(ref_hdu_list[ext_name].data))
+        hdu_list.close()
+        ref_hdu_list.close()
+
+
+if __name__ == '__main__':
+    unittest.main()